@@ -5,20 +5,37 @@ Author: Daniel Busarello
 import matplotlib.pyplot as plt
 import networkx as nx
 from tkinter import simpledialog, messagebox
-import time
 import logging
 import easygui
 import json
 
 from utils.resource_allocation_graph_builder import ResourceAllocationGraph
+from utils.deadlock_resolver import ReductionResult
+from utils.online_detector import OnlineDeadlockDetector
+from utils.graph_snapshot import node_attributes, read_snapshot_content, write_binary_snapshot
+from utils.delta_snapshot import DeltaWriter
+from utils.graph_canvas import GraphCanvas
+from utils.reduction_replay import ReductionReplay
+from utils.result_cache import ReductionCache
+
+# Reductions with more steps than this are shown without the animation
+ANIMATION_LIMIT = 200
 
 class GraphResolver():
-    def __init__(self):
+    def __init__(self, path: str = None):
+        """
+        :param path: Graph file opened at startup (optional).
+        """
         # Graph configurations
         self.init()
+        self.animate = True
+        # Verdicts of recent states, reducing the same graph again is answered without building it
+        self.result_cache = ReductionCache()
         self.unbind_default_keymap('keymap.pan', 'p')
         self.unbind_default_keymap('keymap.save', 's')
         self.unbind_default_keymap('keymap.legends', 'l')
+        self.unbind_default_keymap('keymap.back', 'left')
+        self.unbind_default_keymap('keymap.forward', 'right')
 
         # Logging configuration
         self.logger = logging.getLogger(__name__)
@@ -28,8 +45,10 @@ class GraphResolver():
         self.fig, self.ax = plt.subplots(figsize=(9, 7))
         self.fig.suptitle('Grafo de Alocação de Recursos', fontsize=12, fontweight='bold')
         self.ax.set_title(self.get_keys_legends(), {'fontsize': 10})
+        self.fig.subplots_adjust(top=0.85)
         
         self.legend = self.fig.text(0.1, 0.02, "Adicionando Processos (P)", ha='left', va='center', fontsize=14, color='gray')
+        self.canvas = GraphCanvas(self.fig, self.ax)
         
         plt.gcf().canvas.mpl_connect('button_press_event', self.on_click)
         plt.gcf().canvas.mpl_connect('key_press_event', self.key_press)
@@ -37,11 +56,15 @@ class GraphResolver():
         plt.xlim(0, 10)
         plt.ylim(0, 10)
 
+        if path is not None:
+            self.load_graph(path)
+
         plt.ioff()
         plt.show()
         
     def init(self):
-        self.G = nx.MultiDiGraph()
+        # Nodes carry their kind and capacity, edges the number of requested or allocated units
+        self.G = nx.DiGraph()
         self.pos = {}
         self.edge_label_pos = {}
         self.process_node_counter = 1
@@ -51,7 +74,8 @@ class GraphResolver():
         self.node_colors = {}
         self.node_shapes = {}
         self.element_type = "P"
-        self.legend = None
+        self.detector = OnlineDeadlockDetector()
+        self.replay = None
         
     def unbind_default_keymap(self, keymap_name, key):   
         keymap = plt.rcParams.get(keymap_name, [])
@@ -61,44 +85,9 @@ class GraphResolver():
         
     def draw_graph(self):
         """
-        Draws the graph.
+        Rebuilds every artist of the graph. Only used on load and reset, other changes update the canvas in place.
         """
-        plt.cla()
-        self.ax.set_title(self.get_keys_legends(), {'fontsize': 10})
-        
-        plt.xlim(0, 10)
-        plt.ylim(0, 10)
-               
-        process_nodes = [node for node in self.G.nodes() if node.startswith('P')]
-        resource_nodes = [node for node in self.G.nodes() if node.startswith('R')]
-        
-        # Processes as squares
-        nx.draw_networkx_nodes(self.G, self.pos, nodelist=process_nodes, node_size=500, 
-                            node_color=[self.node_colors.get(node, 'skyblue') for node in process_nodes], 
-                            node_shape='s')
-        
-        # Resources as circles
-        nx.draw_networkx_nodes(self.G, self.pos, nodelist=resource_nodes, node_size=500, 
-                            node_color=[self.node_colors.get(node, 'skyblue') for node in resource_nodes], 
-                            node_shape='o')
-        
-        label_pos_custom = {node: (x, y - 0.45) if 'R' in node else (x, y) for node, (x, y) in self.pos.items()}
-        nx.draw_networkx_labels(self.G, label_pos_custom, font_size=10)
-        nx.draw_networkx_edges(self.G, self.pos, edgelist=self.G.edges(), arrowstyle='->', arrowsize=20, connectionstyle='arc3,rad=0.2')
-
-        # Parallel edges 
-        edge_counts = {}
-        for u, v in self.G.edges():
-            if (u, v) not in edge_counts:
-                edge_counts[(u, v)] = 0
-            edge_counts[(u, v)] += 1
-        
-        edge_labels = {edge: count for edge, count in edge_counts.items()}
-        
-        nx.draw_networkx_edge_labels(self.G, self.pos, label_pos=0.15, font_size=6, verticalalignment="center_baseline", edge_labels=edge_labels)
-
-        self.fig.canvas.draw_idle()
-        plt.pause(0.2)
+        self.canvas.rebuild(self.G, self.pos, self.node_colors)
 
     def create_node(self, x, y):
         """
@@ -109,10 +98,12 @@ class GraphResolver():
         """
         if self.element_type == "P":
             node_name = f'P{self.process_node_counter}'
-            self.G.add_node(node_name)
+            self.G.add_node(node_name, kind="process")
+            self.detector.add_process(node_name)
             self.pos[node_name] = (x, y)
             self.process_node_counter += 1
-            self.draw_graph()
+            self.canvas.add_node(node_name, (x, y))
+            self.canvas.refresh()
            
         elif self.element_type == "R":
             resource_capacity = simpledialog.askinteger("Capacidade do Recurso", "Informe a capacidade do recurso:")
@@ -120,14 +111,16 @@ class GraphResolver():
                 return
                 
             node_name = f'R{self.resource_node_counter} ({resource_capacity})'
-            self.G.add_node(node_name)
+            self.G.add_node(node_name, kind="resource", capacity=resource_capacity)
+            self.detector.add_resource(node_name, resource_capacity)
             self.pos[node_name] = (x, y)
             self.resource_node_counter += 1
-            self.draw_graph()
+            self.canvas.add_node(node_name, (x, y))
+            self.canvas.refresh()
             
     def update_legend(self, message):
-        self.legend = self.fig.text(0.1, 0.02, message, ha='left', va='center', fontsize=14, color='gray')
-        self.draw_graph()
+        self.legend.set_text(message)
+        self.canvas.refresh()
             
     def on_click(self, event):
         """
@@ -135,69 +128,100 @@ class GraphResolver():
         """
         if event.xdata is None or event.ydata is None:
             return  # Ignore clicks outside the plot
+        if self.replay is not None:
+            return  # The graph can't change during the reduction replay
         
         if event.button == 1:  # Left mouse button click
             self.create_node(x=event.xdata, y=event.ydata)
         
         elif event.button == 3:  # Right mouse button click
-            self.clicked_node = None
-            min_distance = float('inf')
-            for node, (x, y) in self.pos.items():
-                distance = ((x - event.xdata)**2 + (y - event.ydata)**2)**0.5
-                if distance < min_distance and distance < 0.5:  # Adjust sensitivity for node selection
-                    min_distance = distance
-                    self.clicked_node = node
+            self.clicked_node = self.canvas.node_at(event.xdata, event.ydata, 0.5)  # Adjust sensitivity for node selection
 
             if self.clicked_node:
                 if self.edge_start is None:
                     self.edge_start = self.clicked_node
                     self.node_colors[self.clicked_node] = 'green'
                     self.logger.info(f"Start node selected: {self.edge_start}")
-                    self.draw_graph()
+                    self.canvas.set_highlight(self.clicked_node, 'green')
                 else:
                     if self.edge_start[0] == self.clicked_node[0] or self.edge_start == self.clicked_node:
                         self.node_colors[self.edge_start] = 'skyblue'
+                        self.canvas.set_highlight(self.edge_start, 'skyblue', highlighted=False)
                         self.edge_start = None
                         self.clicked_node = None
-                        self.draw_graph()
                         return
                     
                     self.node_colors[self.edge_start] = 'skyblue'
+                    self.canvas.set_highlight(self.edge_start, 'skyblue', highlighted=False)
                     edge_end = self.clicked_node
-                    self.G.add_edge(self.edge_start, edge_end)
+                    self.add_units(self.edge_start, edge_end, 1)
+                    self.canvas.add_edge(self.edge_start, edge_end)
+                    if self.edge_start.startswith('P'):
+                        self.detector.request(self.edge_start, edge_end)
+                    else:
+                        # The grant turns a pending request of the process into the allocation, as in the detector
+                        if self.G.has_edge(edge_end, self.edge_start):
+                            self.remove_units(edge_end, self.edge_start, 1)
+                        self.detector.grant(edge_end, self.edge_start)
                     self.edge_start = None
-                    self.draw_graph()
+                    self.update_deadlock_colors()
+                    self.canvas.refresh()
 
         elif event.button == 2 and self.clicked_node:  # Middle mouse button click
             # Delete the node and its edges
             self.logger.info(f"Deleting node: {self.clicked_node}")
             self.G.remove_node(self.clicked_node)
             self.pos.pop(self.clicked_node)
+            self.node_colors.pop(self.clicked_node, None)
+            self.canvas.remove_node(self.clicked_node)
+            if self.clicked_node.startswith('P'):
+                self.detector.remove_process(self.clicked_node)
+            else:
+                self.detector.remove_resource(self.clicked_node)
             self.edge_start = None
             self.clicked_node = None
-            self.draw_graph()
+            self.update_deadlock_colors()
+            self.canvas.refresh()
             
+    def update_deadlock_colors(self):
+        """
+        Colors the processes deadlocked according to the online detector.
+        """
+        for node in self.G.nodes():
+            if node in self.detector.deadlocked and self.node_colors.get(node) != 'red':
+                self.node_colors[node] = 'red'
+                self.canvas.set_color(node, 'red')
+            elif node not in self.detector.deadlocked and self.node_colors.get(node) == 'red':
+                self.node_colors[node] = 'skyblue'
+                self.canvas.set_color(node, 'skyblue')
+    
+    def reset_detector(self):
+        """
+        Rebuilds the online detector from the current graph.
+        """
+        self.detector = OnlineDeadlockDetector.from_graph(ResourceAllocationGraph(*self.extract_graph_information()))
+        
     def get_keys_legends(self):
         return "\n".join([
             "P - Adicionar processo | R - Adicionar recurso | M - Mover nó | I - Informações do grafo",
-            "X - Resolver grafo | S - Salvar grafo | L - Ler grafo | Z - Reiniciar | A - Instruções"])
+            "X - Resolver grafo | S - Salvar grafo | L - Ler grafo | Z - Reiniciar | A - Instruções",
+            "Redução: Espaço - Pausar | ←/→ - Passo | +/- - Velocidade | E - Fim | N - Liga/desliga animação"])
         
     def key_press(self, event):
         """
         Handles keys interactions.
         """
-        if event.key.lower() == 'p':
+        if self.replay is not None:
+            self.replay_key_press(event)
+        elif event.key.lower() == 'p':
             self.element_type = "P"
-            self.legend.remove()
             self.update_legend('Adicionando Processos (P)')
         elif event.key.lower() == 'r':
             self.element_type = "R"
-            self.legend.remove()
             self.update_legend('Adicionando Recursos (R)')
         elif event.key.lower() == 'i':
             self.print_graph_information()
         elif event.key.lower() == 'x':
-            self.legend.remove()
             self.update_legend('Executando...')
             self.finalize()
         elif event.key.lower() == 's':
@@ -205,36 +229,92 @@ class GraphResolver():
         elif event.key.lower() == 'l':
             self.read_graph()
         elif event.key.lower() == 'z':
-            if self.legend is not None:
-                self.legend.remove()
             self.init()
-            self.update_legend("Adicionando Processos (P)") if self.element_type == "P" else self.update_legend("Adicionando Recursos (R)")
             self.draw_graph()
+            self.update_legend("Adicionando Processos (P)") if self.element_type == "P" else self.update_legend("Adicionando Recursos (R)")
         elif event.key.lower() == 'm':
             self.on_move(event)
         elif event.key.lower() == 'a':
             self.print_instructions()
+        elif event.key.lower() == 'n':
+            self.animate = not self.animate
+            self.update_legend("Animação ligada" if self.animate else "Animação desligada")
+
+    def replay_key_press(self, event):
+        """
+        Handles the playback keys while the reduction is replayed. Other keys are ignored until it finishes.
+        """
+        if event.key == ' ':
+            self.replay.toggle_pause()
+        elif event.key == 'right':
+            self.replay.step_forward()
+        elif event.key == 'left':
+            self.replay.step_back()
+        elif event.key == '+':
+            self.replay.change_speed(2)
+        elif event.key == '-':
+            self.replay.change_speed(0.5)
+        elif event.key.lower() == 'e':
+            self.replay.skip_to_end()
+
+        if self.replay is not None:
+            self.update_replay_legend()
     
+    def add_units(self, source, target, units):
+        """
+        Adds units to an edge, creating it if needed.
+
+        :param source: Source node.
+        :param target: Target node.
+        :param units: Number of units.
+        """
+        if self.G.has_edge(source, target):
+            self.G[source][target]["units"] += units
+        else:
+            self.G.add_edge(source, target, units=units)
+
+    def remove_units(self, source, target, units):
+        """
+        Removes units from an edge, removing it with the last one.
+
+        :param source: Source node.
+        :param target: Target node.
+        :param units: Number of units.
+        """
+        if self.G[source][target]["units"] > units:
+            self.G[source][target]["units"] -= units
+        else:
+            self.G.remove_edge(source, target)
+        self.canvas.remove_edge(source, target, units)
+
+    def node_edges(self, node):
+        """
+        Lists the edges of a node with their units.
+
+        :param node: Node name.
+        :return: List of (source, target, units).
+        """
+        return list(self.G.in_edges(node, data="units")) + list(self.G.out_edges(node, data="units"))
+
     def remove_edge(self, node):
         """
         Removes the edges from the graph, based on the node relation.
         
         :param node: The node to remove edges.
         """
-        edges = list(self.G.edges())
+        edges = [(source, target) for source, target, _ in self.node_edges(node)]
         
-        for edge in edges:
-            if node in edge:
-                self.logger.info(f"Removendo aresta {edge}")
-                self.G.remove_edge(edge[0], edge[1])
-                
-        self.draw_graph()
+        self.logger.info(f"Removendo arestas de {node}")
+        self.G.remove_edges_from(edges)
+        self.canvas.remove_edges(node)
         
     def print_graph_information(self):
-        easygui.msgbox(f"Graph nodes: {self.G.nodes()}\nGraph edges: {self.G.edges()}\nGraph edges | Total: {len(self.G.edges())}: {self.G.edges()}")
+        edges = list(self.G.edges(data="units"))
+        units = sum(edge[2] for edge in edges)
+        easygui.msgbox(f"Graph nodes: {self.G.nodes()}\nGraph edges | Total: {len(edges)} ({units} units): {edges}")
 
         self.logger.info(f"Graph nodes: {self.G.nodes()}")
-        self.logger.info(f"Graph edges | Total: {len(self.G.edges())}: {self.G.edges()}")
+        self.logger.info(f"Graph edges | Total: {len(edges)} ({units} units): {edges}")
 
     def print_instructions(self):
         easygui.msgbox(
@@ -251,6 +331,8 @@ class GraphResolver():
             9.Pressione S para salvar o grafo.\n
             10.Pressione L para ler um grafo salvo.\n
             11.Pressione Z para reiniciar o grafo.\n
+            12.Durante a redução, pressione Espaço para pausar, as setas para avançar ou voltar um passo, + e - para mudar a velocidade e E para ir ao final.\n
+            13.Pressione N para ligar ou desligar a animação da redução. Grafos grandes são exibidos sem animação.\n
             """
         )
        
@@ -258,23 +340,20 @@ class GraphResolver():
         """
         Extracts the graph information.
 
-        :return (processes nodes, resources nodes, resources availability and edges).
+        :return (processes nodes, resources nodes, resources availability and edges with their units).
         """
         processes_nodes = []
         resources_nodes = []
         resources_availability = {}
         
-        for node in self.G.nodes():
-            if 'P' in node:
+        for node, attributes in self.G.nodes(data=True):
+            if attributes["kind"] == "process":
                 processes_nodes.append(node)  
             else:
                 resources_nodes.append(node)
-                key = node.split('(')
-                resources_availability[node] = int(key[1].replace(')', ''))
+                resources_availability[node] = attributes["capacity"]
         
-        edges = []
-        for edge in self.G.edges():
-            edges.append((edge[0], edge[1]))
+        edges = list(self.G.edges(data="units"))
         
         return processes_nodes, resources_nodes, resources_availability, edges
         
@@ -291,58 +370,119 @@ class GraphResolver():
         
         if (edges == []):
             self.logger.info(f"Nenhuma aresta encontrada")
-            self.legend.remove()
             self.update_legend("Adicionando Processos (P)") if self.element_type == "P" else self.update_legend("Adicionando Recursos (R)")
             return
         
-        rag = ResourceAllocationGraph(processes_nodes, resources_nodes, resources_availability, edges)
-        request_list = rag.create_request_list()
-        allocation_list = rag.create_allocation_list()
+        result = self.result_cache.reduce(processes_nodes, resources_nodes, resources_availability, edges)
+        self.logger.info(f"Reduction order: {result.reduction_order}")
+        self.logger.info(f"Result cache: {self.result_cache.stats()['graphs']}")
+        
+        # The whole trace is computed up front: each step is a reduced process and the edges it releases
+        steps = [(process, self.node_edges(process)) for process in result.reduction_order]
+        self.replay = ReductionReplay(self.fig, steps, self.apply_reduction_step, self.undo_reduction_step,
+                                      lambda: self.show_reduction_result(result))
         
-        self.detect_and_resolve_deadlock(allocation_list, request_list, resources_availability)
+        if self.animate and len(steps) <= ANIMATION_LIMIT:
+            self.update_replay_legend()
+            self.replay.start()
+        else:
+            self.replay.skip_to_end()
+
+    def apply_reduction_step(self, step):
+        """
+        Shows a step of the reduction: the edges of the process are removed and it is colored as reduced.
+
+        :param step: (process, edges) tuple.
+        """
+        process, _ = step
+        self.remove_edge(process)
+        self.canvas.set_color(process, 'lightgreen')
+        self.update_replay_legend()
+
+    def undo_reduction_step(self, step):
+        """
+        Reverts a step of the reduction, restoring the edges of the process.
+
+        :param step: (process, edges) tuple.
+        """
+        process, edges = step
+        for source, target, units in edges:
+            self.add_units(source, target, units)
+            self.canvas.add_edge(source, target, units)
+        self.canvas.set_color(process, self.node_colors.get(process, 'skyblue'))
+        self.update_replay_legend()
+
+    def update_replay_legend(self):
+        state = "Pausado" if self.replay.paused else f"{self.replay.speed:g}x"
+        self.update_legend(f"Redução {self.replay.position}/{len(self.replay.steps)} ({state})")
     
     def save_graph(self):
         """
-        Saves the current graph to a txt/json file.
+        Saves the current graph to a txt/json file, to the binary format if the file ends with .rag,
+        or appends it to a delta log if the file ends with .ragd.
         """
-        processes_nodes, resources_nodes, _, edges = self.extract_graph_information()
+        processes_nodes, resources_nodes, resources_availability, edges = self.extract_graph_information()
+        node_indexes = {
+            "process": self.process_node_counter,
+            "resource": self.resource_node_counter
+        }
         
         file_path = easygui.filesavebox(default='*.txt')
+        # The dialog was cancelled
+        if not file_path:
+            return
+        
+        if file_path.endswith('.rag'):
+            rag = ResourceAllocationGraph(processes_nodes, resources_nodes, resources_availability, edges)
+            write_binary_snapshot(file_path, rag, self.pos, node_indexes)
+            return
                 
+        content = {}
+        content["nodes"] = processes_nodes + resources_nodes
+        content["node_attributes"] = dict(self.G.nodes(data=True))
+        content["edges"] = edges
+        content["node_positions"] = self.pos
+        content["node_indexes"] = node_indexes
+        
+        # Delta logs get a new sample with the changes since the last one
+        if file_path.endswith('.ragd'):
+            DeltaWriter(file_path).write(content)
+            return
+        
         with open(f'{file_path}', 'w') as file:
-            content = {}
-            content["nodes"] = processes_nodes + resources_nodes
-            content["edges"] = edges
-            content["node_positions"] = self.pos
-            content["node_indexes"] = {
-                "process": self.process_node_counter,
-                "resource": self.resource_node_counter
-            }
-            
             json.dump(content, file, indent=4)
     
     def read_graph(self):
         """
-        Reads a graph from a txt/json file.
+        Reads a graph from a txt/json file or from a binary .rag snapshot.
+        """
+        self.load_graph(easygui.fileopenbox(default='*.txt'))
+    
+    def load_graph(self, file_path):
         """
-        file_path = easygui.fileopenbox(default='*.txt')
+        Replaces the current graph with the one in a file.
         
+        :param file_path: txt/json file or binary .rag snapshot.
+        """
         try:
-            with open(file_path, 'r') as file:
-                content = json.loads(file.read())
-                self.init()
-                
-                for node in content["nodes"]:
-                    self.G.add_node(node)
-                    self.pos[node] = (content["node_positions"][node][0], content["node_positions"][node][1])
-                
-                self.process_node_counter = content["node_indexes"]["process"] + 1
-                self.resource_node_counter = content["node_indexes"]["resource"] + 1
-                
-                for edge in content["edges"]:
-                    self.G.add_edge(edge[0], edge[1])
-                
-                self.draw_graph()
+            content = read_snapshot_content(file_path)
+            self.init()
+            
+            attributes = node_attributes(content)
+            for node in content["nodes"]:
+                self.G.add_node(node, **attributes[node])
+                self.pos[node] = (content["node_positions"][node][0], content["node_positions"][node][1])
+            
+            self.process_node_counter = content["node_indexes"]["process"] + 1
+            self.resource_node_counter = content["node_indexes"]["resource"] + 1
+            
+            # Old files repeat [source, target] once per unit
+            for edge in content["edges"]:
+                self.add_units(edge[0], edge[1], edge[2] if len(edge) > 2 else 1)
+            
+            self.reset_detector()
+            self.draw_graph()
+            self.update_deadlock_colors()
         except Exception as error:
             self.logger.exception(error)
     
@@ -355,136 +495,33 @@ class GraphResolver():
         if self.clicked_node is not None and event.inaxes:
             x, y = event.xdata, event.ydata
             self.pos[self.clicked_node] = (x, y)
-            self.draw_graph()
+            self.canvas.move_node(self.clicked_node, (x, y))
+            self.canvas.refresh()
             self.logger.info(f"New {self.clicked_node} position: {x, y}")
     
-    # Graph resolver functions
-    def choose_process_to_remove(self, request: dict[str, list[str]], resource_capacity: dict[str, int]) -> str:
-        """
-        Chooses a process to remove based on which removal would free the most capacity
-        and unlock the execution of other processes.
-        
-        :param request: Dictionary of processes with waiting requested resources.
-        :param resource_capacity: Dictionary with the available capacity of each resource.
-        :return: The process name to be removed.
-        """
-        
-        candidates = []
-        process_to_remove = None
-        
-        # Verifies if a requested resource has capacity to be allocated
-        for process in request.keys():
-            for res in request[process]:
-                if resource_capacity[res] > 0 and resource_capacity[res] >= sum(1 for r in request[process] if r == res and resource_capacity[res] > 0):
-                    candidates.append(process)
-        
-        # If any process has all the requested resources, choose to be removed
-        for process in candidates:
-            if all(resource_capacity[r] > 0 for r in request[process]):
-                process_to_remove = process
-                break
-
-        # If no process has all the requested resources, it has a Deadlock
-        if candidates == [] or (process_to_remove == None and len(candidates) > 0):
-            return None
-
-        return process_to_remove
-
-    def calculate_remaining_capacity(self, allocation: dict[str, dict[str, int]], resource_capacity: dict[str, int]):
-        """
-        Verifies the remaining capacity of resources based on the allocation list.
-        
-        :param allocation: Dictionary of processes with the allocated resources and their quantities.
-        :param resource_capacity: Dictionary with the total capacity of each resource.
-        :return: Dictionary of remaining capacity.
+    def show_reduction_result(self, result: ReductionResult):
         """
+        Displays the result computed by the reduction engine.
         
-        resource_capacity_remaining = resource_capacity.copy()
-        
-        for process in allocation:
-            for resource in allocation[process]:
-                resource_capacity_remaining[resource] -= 1
-
-        return resource_capacity_remaining
-
-    def detect_and_resolve_deadlock(self, allocation: dict[str, dict[str, int]], request: dict[str, list[str]], resource_capacity: dict[str, int]) -> list[str]:
+        :param result: ReductionResult returned by the engine.
         """
-        Detects and removes a deadlock in a Resource Allocation Graph (RAG) using graph reduction.
-        
-        :param allocation: Dictionary of processes with the allocated resources and their quantities {process: {resource: allocated_quantity}}.
-        :param request: Dictionary of processes with the waiting requested resources {process: [requested_resource]}.
-        :param resource_capacity: Dictionary with the total capacity of each resource {resource: available_capacity}.
-        :return: List of processes that were removed.
-        """
-        processes = list(allocation.keys())
-        removed_processes = []
-        
-        resource_capacity_copy = self.calculate_remaining_capacity(allocation, resource_capacity)
-        
-        while True:
-            removable_process = None
-            
-            # Find processes that can be removed (those that don't have pending requests)
-            for process in processes:
-                if request[process] == []:
-                    removable_process = process
-                    break
-            
-            if removable_process is None:
-                break
-            
-            processes.remove(removable_process)
-            self.free_allocation(allocation, request, removable_process, resource_capacity_copy)
-
-        while processes:
-            # Call to the heuristic function to choose a process to be removed
-            process_to_remove = self.choose_process_to_remove(request, resource_capacity_copy)
-            
-            # If deadlock was found
-            if process_to_remove is None:
-                for process in processes:
-                    self.node_colors[process] = "red"
-                self.draw_graph()
-                messagebox.showwarning(title="Deadlock", message=f"Deadlock encontrado nos processos {processes}")
-                self.legend.remove()
-                self.update_legend("Adicionando Processos (P)") if self.element_type == "P" else self.update_legend("Adicionando Recursos (R)")
-                break
-            
-            print(f"Removendo o processo {process_to_remove}")
-            removed_processes.append(process_to_remove)
-            
-            # Remove the process from processes list and free the resource allocation
-            processes.remove(process_to_remove)
-            self.free_allocation(allocation, request, process_to_remove, resource_capacity_copy) 
-            
-        if processes == []:
-            self.legend.remove()
+        self.replay = None
+        for process in result.reduction_order:
+            self.canvas.set_color(process, self.node_colors.get(process, 'skyblue'))
+        
+        # If deadlock was found
+        if result.deadlocked:
+            for process in result.deadlocked_processes:
+                self.node_colors[process] = "red"
+                self.canvas.set_color(process, "red")
+            self.canvas.refresh(now=True)
+            messagebox.showwarning(title="Deadlock", message=f"Deadlock encontrado nos processos {result.deadlocked_processes}")
+        else:
             self.update_legend("Processo finalizado.")
-            time.sleep(1)
 
         self.logger.info("Processo finalizado.")
-        self.legend.remove()
         self.update_legend("Adicionando Processos (P)") if self.element_type == "P" else self.update_legend("Adicionando Recursos (R)")
-        return removed_processes
-
-    def free_allocation(self, allocation: dict[str, list[str]], request: dict[str, list[str]], process_to_remove: str, resource_capacity: dict[str, int]) -> None:
-        """
-        Releases the allocated resources of a removed process and updates resource capacities.
-        
-        :param allocation: Dictionary of processes with allocated resources (as lists).
-        :param request: Dictionary of processes with waiting requested resources.
-        :param processes: List of process names.
-        :param process_to_remove: Name of the process to be removed.
-        :param resource_capacity: Dictionary with the total capacity of each resource.
-        """
-        for resource in allocation[process_to_remove]:
-            resource_capacity[resource] += 1  # Release one unit of the resource
-
-        del allocation[process_to_remove]
-        del request[process_to_remove]
-        
-        self.remove_edge(process_to_remove)
-        time.sleep(3)
+        self.reset_detector()
     
 if __name__ == "__main__":
     app = GraphResolver()
\ No newline at end of file
@@ -0,0 +1,293 @@
+import asyncio
+import json
+import random
+from collections import Counter
+
+import pytest
+
+from utils.bankers import BankersAllocator
+from utils.deadlock_resolver import reduce_allocation_graph, scan_reduce_graph, scc_reduce_allocation_graph
+from utils.delta_snapshot import DeltaWriter, iter_delta_log, read_delta_log
+from utils.detection_service import DetectionService
+from utils.graph_generators import GENERATORS, generate_graph
+from utils.graph_snapshot import binary_positions, content_to_graph, graph_to_content, load_binary_snapshot, read_snapshot_graph, write_binary_snapshot
+from utils.lock_order import LockOrderAnalyzer
+from utils.matrix_detector import matrix_reduce_graph
+from utils.online_detector import OnlineDeadlockDetector
+from utils.parallel_reduction import parallel_reduce_allocation_graph
+from utils.resource_allocation_graph_builder import ResourceAllocationGraph
+from utils.result_cache import LRUCache
+from utils.victim_solver import solve_minimum_victims
+from utils.workload_simulator import WorkloadSimulator
+
+SEEDS = range(40)
+
+
+def random_graph(seed: int, processes: int = 12, resources: int = 8) -> tuple[dict, dict, dict]:
+    """Random multi-unit graph: every unit is held at most once and requests never exceed a capacity."""
+    rnd = random.Random(seed)
+    capacity = {f"R{index} ({units})": units for index, units in
+                ((index, rnd.randint(1, 3)) for index in range(1, resources + 1))}
+    free = dict(capacity)
+
+    allocation, request = {}, {}
+    for index in range(1, processes + 1):
+        process = f"P{index}"
+        allocation[process] = []
+        for resource in rnd.sample(list(capacity), rnd.randint(0, 3)):
+            units = rnd.randint(0, free[resource])
+            allocation[process] += [resource] * units
+            free[resource] -= units
+        request[process] = []
+        for resource in rnd.sample(list(capacity), rnd.randint(0, 2)):
+            request[process] += [resource] * rnd.randint(1, capacity[resource])
+
+    return allocation, request, capacity
+
+def graphs():
+    for seed in SEEDS:
+        yield pytest.param(random_graph(seed), id=f"random-{seed}")
+    for shape in GENERATORS:
+        for seed in range(3):
+            yield pytest.param(generate_graph(shape, 60, seed), id=f"{shape}-{seed}")
+
+def online_events(allocation: dict, request: dict, capacity: dict) -> set[str]:
+    """Replays the graph as events on an incremental detector: grants first, then the blocking requests."""
+    detector = OnlineDeadlockDetector(incremental=True)
+    for resource, units in capacity.items():
+        detector.add_resource(resource, units)
+    for process in allocation:
+        detector.add_process(process)
+    for process, resources in allocation.items():
+        for resource, units in Counter(resources).items():
+            detector.grant(process, resource, units)
+    for process, resources in request.items():
+        for resource, units in Counter(resources).items():
+            detector.request(process, resource, units)
+
+    return set(detector.deadlocked)
+
+
+@pytest.mark.parametrize("graph", list(graphs()))
+def test_engines_match_scan_reduction(graph):
+    allocation, request, capacity = graph
+    expected = set(scan_reduce_graph(allocation, request, capacity).deadlocked_processes)
+
+    def rag():
+        return ResourceAllocationGraph.from_lists(allocation, request, capacity)
+
+    assert set(reduce_allocation_graph(rag()).deadlocked_processes) == expected
+    assert set(scc_reduce_allocation_graph(rag()).deadlocked_processes) == expected
+    assert set(parallel_reduce_allocation_graph(rag(), workers=2, executor="thread", chunk_size=8).deadlocked_processes) == expected
+    assert OnlineDeadlockDetector.from_graph(rag()).detect() == expected
+    assert online_events(allocation, request, capacity) == expected
+    assert set(matrix_reduce_graph(rag()).deadlocked_processes) == expected
+
+@pytest.mark.parametrize("seed", range(5))
+def test_resolution_reduces_every_process(seed):
+    allocation, request, capacity = random_graph(seed)
+    rag = ResourceAllocationGraph.from_lists(allocation, request, capacity)
+    result = reduce_allocation_graph(rag, resolve=True)
+
+    assert sorted(result.reduction_order) == sorted(allocation)
+    assert bool(result.removed_processes) == result.deadlocked
+
+def two_process_deadlock() -> ResourceAllocationGraph:
+    """P1 holds both units of R1 (2) and waits on R2, P2 holds R2 and waits on a unit of R1 (2)."""
+    return ResourceAllocationGraph.from_lists({"P1": ["R1 (2)", "R1 (2)"], "P2": ["R2"]}, {"P1": ["R2"], "P2": ["R1 (2)"]},
+                                              {"R1 (2)": 2, "R2": 1})
+
+@pytest.mark.parametrize("cost_model, victim", [("fewest_held", "P2"), ("most_freed", "P1"), ("most_unblocked", "P1"), ("cost", "P1")])
+def test_cost_models_choose_victims(cost_model, victim):
+    result = reduce_allocation_graph(two_process_deadlock(), resolve=True, cost_model=cost_model, process_costs={"P1": 1, "P2": 5})
+    assert result.removed_processes == [victim]
+
+    with pytest.raises(ValueError):
+        reduce_allocation_graph(two_process_deadlock(), resolve=True, cost_model="unknown")
+
+def test_minimum_victims():
+    # P1 waits on both P2 and P3, which wait on P1: removing P1 alone resolves the deadlock
+    rag = ResourceAllocationGraph.from_lists({"P1": ["R1"], "P2": ["R2"], "P3": ["R3"]}, {"P1": ["R2", "R3"], "P2": ["R1"], "P3": ["R1"]},
+                                             {"R1": 1, "R2": 1, "R3": 1})
+    solution = solve_minimum_victims(rag)
+    assert (solution.victims, solution.cost, solution.optimal) == (["P1"], 1, True)
+
+    solution = solve_minimum_victims(rag, {"P1": 3})
+    assert (solution.victims, solution.cost, solution.lower_bound) == (["P2", "P3"], 2, 2)
+
+def test_bankers_refuses_unsafe_grants():
+    allocator = BankersAllocator()
+    allocator.add_resource("R1", 3)
+    allocator.add_process("P1", {"R1": 3})
+    allocator.add_process("P2", {"R1": 2})
+
+    assert allocator.request("P1", "R1") and allocator.request("P2", "R1")
+    # One unit left: P1 and P2 could both need it to finish
+    assert not allocator.is_safe_grant("P1", "R1")
+    assert not allocator.request("P1", "R1")
+    assert allocator.request("P2", "R1")
+
+@pytest.mark.parametrize("seed", range(5))
+def test_bankers_incremental_check_matches_full_check(seed):
+    rnd = random.Random(seed)
+    allocators = [BankersAllocator(incremental=True), BankersAllocator(incremental=False)]
+    capacity = {f"R{index}": rnd.randint(1, 4) for index in range(4)}
+    claims = {f"P{index}": {resource: rnd.randint(0, units) for resource, units in capacity.items()} for index in range(6)}
+    for allocator in allocators:
+        for resource, units in capacity.items():
+            allocator.add_resource(resource, units)
+        for process, claim in claims.items():
+            allocator.add_process(process, claim)
+
+    held = Counter()
+    for _ in range(300):
+        process, resource = rnd.choice(list(claims)), rnd.choice(list(capacity))
+        if held[process, resource] and rnd.random() < 0.3:
+            for allocator in allocators:
+                allocator.release(process, resource)
+            held[process, resource] -= 1
+        elif held[process, resource] < claims[process][resource]:
+            granted = [allocator.request(process, resource) for allocator in allocators]
+            assert granted[0] == granted[1]
+            held[process, resource] += granted[0]
+
+def test_lru_cache_evicts_and_expires():
+    now = [0.0]
+    cache = LRUCache(max_entries=2, ttl=10, clock=lambda: now[0])
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None and cache.get("c") == 3
+
+    now[0] = 10.0
+    assert cache.get("a") is None
+    assert cache.stats() == {"entries": 1, "hits": 2, "misses": 2, "evictions": 1, "expirations": 1}
+
+def test_detection_service(tmp_path):
+    async def exchange(path: str, requests: list[dict]) -> list[dict]:
+        reader, writer = await asyncio.open_unix_connection(path)
+        for request in requests:
+            writer.write(json.dumps(request).encode() + b"\n")
+        await writer.drain()
+        responses = [json.loads(await reader.readline()) for _ in requests]
+        writer.close()
+        return sorted(responses, key=lambda response: response["id"])
+
+    async def run() -> list[dict]:
+        service = DetectionService(workers=1, executor="thread")
+        path = str(tmp_path / "service.sock")
+        try:
+            await service.start(path=path)
+            responses = await exchange(path, [
+                {"id": 1, "snapshot": graph_to_content(two_process_deadlock())},
+                {"id": 2, "session": "s1", "events": [{"event": "add_resource", "resource": "R1"},
+                                                      {"event": "grant", "process": "P1", "resource": "R1"},
+                                                      {"event": "request", "process": "P2", "resource": "R1"}]},
+                {"id": 3, "session": "s1", "events": [{"event": "release", "process": "P1", "resource": "R1", "quantity": 0}]},
+            ])
+            return responses + await exchange(path, [{"id": 4, "stats": True}])
+        finally:
+            service.close()
+
+    snapshot, session, invalid, stats = asyncio.run(run())
+    assert snapshot["deadlocked_processes"] == ["P1", "P2"]
+    assert session["deadlocked"] is False
+    assert invalid["applied"] == 0 and "error" in invalid
+    assert stats["stats"]["requests"] == 3 and stats["stats"]["errors"] == 1 and stats["stats"]["sessions"] == 1
+
+def test_lock_order_cycles():
+    def acquire(process, resource):
+        return {"event": "acquire", "process": process, "resource": resource}
+
+    def release(process, resource):
+        return {"event": "release", "process": process, "resource": resource}
+
+    events = [acquire("T1", "A"), acquire("T1", "B"), release("T1", "B"), release("T1", "A"),
+              acquire("T2", "B"), acquire("T2", "A"), release("T2", "A"), release("T2", "B"),
+              acquire("T1", "A"), acquire("T1", "B"),
+              acquire("T3", "R1 (2)"), acquire("T3", "R1 (2)")]
+    cycles = list(LockOrderAnalyzer().run(events))
+
+    assert [(sorted(cycle.resources), cycle.offset, cycle.single_unit) for cycle in cycles] == [(["A", "B"], 5, True)]
+    assert [example["process"] for example in cycles[0].examples] in (["T1", "T2"], ["T2", "T1"])
+
+def test_simulator_detects_deadlocks_when_processes_block():
+    summaries = [WorkloadSimulator("on_block", duration=10, arrival_rate=20, resources=4, exact_delays=exact_delays, seed=1).run()
+                 for exact_delays in (True, False)]
+
+    assert summaries[0]["detections"] > 0 and summaries[0]["victims"] > 0
+    # Deadlocks are found on the block that closes them, and exact delays don't change the simulation
+    assert summaries[0]["mean_delay"] == 0.0 and summaries[0]["deadlocked_at_end"] == 0
+    keys = ("events", "completed", "detections", "deadlocked", "victims")
+    assert [summaries[0][key] for key in keys] == [summaries[1][key] for key in keys]
+
+
+def sample_contents(count: int = 6) -> list[dict]:
+    """
+    Snapshot contents of a graph edited step by step, like successive GUI saves: each step removes a
+    process, adds a request unit, changes a capacity or moves a node, and the other nodes keep their place.
+    """
+    allocation, request, capacity = random_graph(0)
+    nodes = list(allocation) + list(capacity)
+    positions = {node: [float(index), 0.0] for index, node in enumerate(nodes)}
+    resources = list(capacity)
+
+    contents = []
+    for step in range(count):
+        rag = ResourceAllocationGraph.from_lists(allocation, request, capacity)
+        contents.append(graph_to_content(rag, {node: positions[node] for node in rag.processes + rag.resources}))
+
+        edit = step % 4
+        if edit == 0:
+            allocation.pop(f"P{step + 1}")
+        elif edit == 1:
+            request[f"P{step + 2}"].append(resources[step % len(resources)])
+        elif edit == 2:
+            capacity[resources[step]] += 1
+        else:
+            positions[f"P{step + 3}"] = [-1.0, float(step)]
+    return contents
+
+def canonical(content: dict) -> dict:
+    """Content with its nodes and edges sorted, applying deltas can change their order."""
+    return {**content, "nodes": sorted(content["nodes"]), "edges": sorted(map(tuple, content["edges"]))}
+
+def test_binary_snapshot_round_trip(tmp_path):
+    content = sample_contents(1)[0]
+    path = tmp_path / "graph.rag"
+    write_binary_snapshot(str(path), content_to_graph(content), content["node_positions"], content["node_indexes"])
+
+    with load_binary_snapshot(str(path)) as snapshot:
+        assert graph_to_content(snapshot.rag, binary_positions(snapshot), snapshot.node_indexes) == content
+
+def test_binary_snapshot_rejects_short_files(tmp_path):
+    path = tmp_path / "empty.rag"
+    path.write_bytes(b"")
+    with pytest.raises(ValueError):
+        load_binary_snapshot(str(path))
+
+    content = sample_contents(1)[0]
+    write_binary_snapshot(str(path), content_to_graph(content), content["node_positions"])
+    path.write_bytes(path.read_bytes()[:-12])
+    with pytest.raises(ValueError, match="truncated"):
+        read_snapshot_graph(str(path))
+
+def test_delta_log_round_trip(tmp_path):
+    contents = sample_contents()
+    path = str(tmp_path / "graph.ragd")
+    writer = DeltaWriter(path, keyframe_interval=3)
+    assert [writer.write(content) for content in contents] == ["keyframe", "delta", "delta"] * 2
+
+    # The contents collected while iterating are not changed by the following deltas
+    assert [canonical(state.to_content()) for state in iter_delta_log(path)] == list(map(canonical, contents))
+    for index, content in enumerate(contents):
+        assert canonical(read_delta_log(path, index).to_content()) == canonical(content)
+
+    # A new writer resumes the chain of the log: two deltas were written since the last keyframe
+    resumed = DeltaWriter(path, keyframe_interval=3)
+    assert [resumed.write(contents[-2]), resumed.write(contents[-1])] == ["keyframe", "delta"]
+    assert canonical(read_delta_log(path, 6).to_content()) == canonical(contents[-2])
+    assert canonical(read_delta_log(path).to_content()) == canonical(contents[-1])
+    with open(path) as file:
+        assert json.loads(file.readline())["type"] == "keyframe"
@@ -0,0 +1,267 @@
+from collections import Counter
+
+from utils.online_detector import reduce_region
+from utils.resource_allocation_graph_builder import ResourceAllocationGraph
+
+
+class BankersAllocator:
+    def __init__(self, incremental: bool = True):
+        """
+        Deadlock avoidance with the Banker's algorithm. Each process declares the maximum number of units it
+        may still need (its claim) and a grant is only made if the state stays safe, i.e. there is an order
+        in which every process can get its whole claim and finish.
+
+        The last safe sequence is kept between checks. Granting q units of a resource to the process at
+        position k only lowers the units that the processes before it can count on, and only for that
+        resource, so the check only walks the processes before k that claim or hold that resource. A full safety check (a
+        worklist reduction of the claims, in O(P + R + E)) only runs when that prefix is no longer valid.
+
+        :param incremental: If False, every check runs the full safety check.
+        """
+        self.incremental = incremental
+        self.capacity = {}
+        self.available = {}
+        self.allocations = {}
+        self.needs = {}
+        self.users = {}
+        self.sequence = []
+        self.position = {}
+        self.next_position = 0
+
+        # Grants that were unsafe stay unsafe until units are released
+        self.unsafe = set()
+
+        self.checks = 0
+        self.repairs = 0
+        self.full_checks = 0
+
+    @classmethod
+    def from_graph(cls, rag: ResourceAllocationGraph, max_claims: dict[str, dict[str, int]] = None, incremental: bool = True):
+        """
+        Creates an allocator with the allocations of a ResourceAllocationGraph.
+
+        :param rag: ResourceAllocationGraph instance.
+        :param max_claims: Maximum units of each resource each process may hold {process: {resource: units}}.
+                           Without it the pending requests of the graph are the remaining claims.
+        :param incremental: If False, every check runs the full safety check.
+        :return: BankersAllocator instance.
+        """
+        allocator = cls(incremental)
+        for resource, capacity in zip(rag.resources, rag.capacity):
+            allocator.add_resource(resource, capacity)
+
+        for process_id, process in enumerate(rag.processes):
+            allocation = Counter({rag.resources[r]: quantity for r, quantity in rag.allocation_quantities(process_id)})
+            if max_claims is None:
+                need = Counter({rag.resources[r]: quantity for r, quantity in rag.request_quantities(process_id)})
+            else:
+                need = Counter(max_claims.get(process, {}))
+                need.subtract(allocation)
+                if any(quantity < 0 for quantity in need.values()):
+                    raise ValueError(f"Process {process} holds more than its claim")
+
+            allocator.allocations[process] = +allocation
+            allocator.needs[process] = +need
+            for resource in allocator.allocations[process] | allocator.needs[process]:
+                allocator.users[resource].add(process)
+            for resource, quantity in allocation.items():
+                allocator.available[resource] -= quantity
+
+        sequence = allocator.safe_sequence()
+        if sequence is None:
+            raise ValueError("The initial state is not safe")
+
+        allocator.set_sequence(sequence)
+        return allocator
+
+    def add_resource(self, resource: str, capacity: int) -> None:
+        """
+        Adds a resource.
+
+        :param resource: Resource name.
+        :param capacity: Total capacity of the resource.
+        """
+        if resource in self.capacity:
+            raise ValueError(f"Resource {resource} already exists")
+
+        self.capacity[resource] = capacity
+        self.available[resource] = capacity
+        self.users[resource] = set()
+
+    def add_process(self, process: str, max_claim: dict[str, int]) -> None:
+        """
+        Admits a process with its maximum claim. A process without allocations can always finish last,
+        so it is appended to the safe sequence.
+
+        :param process: Process name.
+        :param max_claim: Maximum units of each resource the process may hold.
+        """
+        if process in self.allocations:
+            raise ValueError(f"Process {process} already exists")
+        for resource, quantity in max_claim.items():
+            if quantity > self.capacity[resource]:
+                raise ValueError(f"Claim of {process} on {resource} exceeds its capacity")
+
+        self.allocations[process] = Counter()
+        self.needs[process] = +Counter(max_claim)
+        for resource in self.needs[process]:
+            self.users[resource].add(process)
+
+        self.position[process] = self.next_position
+        self.next_position += 1
+        self.sequence.append(process)
+
+    def remove_process(self, process: str) -> None:
+        """
+        Removes a finished process, releasing its allocations. The order of the others stays safe,
+        and only the relative order of the positions matters, so they are kept.
+
+        :param process: Process name.
+        """
+        for resource in self.allocations[process] | self.needs[process]:
+            self.users[resource].discard(process)
+        for resource, quantity in self.allocations.pop(process).items():
+            self.available[resource] += quantity
+        del self.needs[process]
+
+        self.sequence.remove(process)
+        del self.position[process]
+        self.unsafe.clear()
+
+    def is_safe_grant(self, process: str, resource: str, quantity: int = 1) -> bool:
+        """
+        Answers if granting the units now keeps the state safe, without changing the state.
+
+        :param process: Process name.
+        :param resource: Requested resource name.
+        :param quantity: Number of requested units.
+        :return: True if the grant is safe.
+        """
+        return self.check_grant(process, resource, quantity) is not None
+
+    def request(self, process: str, resource: str, quantity: int = 1) -> bool:
+        """
+        Grants the units if the state stays safe. Otherwise nothing changes and the process must wait.
+
+        :param process: Process name.
+        :param resource: Requested resource name.
+        :param quantity: Number of requested units.
+        :return: True if the units were granted.
+        """
+        sequence = self.check_grant(process, resource, quantity)
+        if sequence is None:
+            return False
+
+        self.apply_grant(process, resource, quantity)
+        if sequence is not self.sequence:
+            self.set_sequence(sequence)
+        return True
+
+    def release(self, process: str, resource: str, quantity: int = 1) -> None:
+        """
+        Releases allocated units, which return to the claim of the process. The safe sequence stays valid:
+        the process needs the units back, but every process up to it can count on them.
+
+        :param process: Process name.
+        :param resource: Released resource name.
+        :param quantity: Number of released units.
+        """
+        if self.allocations[process][resource] < quantity:
+            raise ValueError(f"Process {process} has only {self.allocations[process][resource]} unit(s) of {resource}")
+
+        self.allocations[process][resource] -= quantity
+        self.needs[process][resource] += quantity
+        self.available[resource] += quantity
+        self.unsafe.clear()
+
+    def check_grant(self, process: str, resource: str, quantity: int) -> list[str]:
+        """
+        Checks a grant, re-verifying the prefix of the safe sequence before the process on the granted resource.
+
+        :param process: Process name.
+        :param resource: Requested resource name.
+        :param quantity: Number of requested units.
+        :return: A safe sequence after the grant (the current one if it is still valid), or None if the grant is unsafe.
+        """
+        self.checks += 1
+        if quantity > self.needs[process][resource]:
+            raise ValueError(f"Process {process} requested more than its claim of {resource}")
+        if quantity > self.available[resource] or (process, resource, quantity) in self.unsafe:
+            return None
+
+        if self.incremental and self.prefix_is_safe(process, resource, quantity):
+            return self.sequence
+
+        # The order is broken, try to find another one
+        self.apply_grant(process, resource, quantity)
+        sequence = self.repair_sequence(process) if self.incremental else self.safe_sequence()
+        self.apply_grant(process, resource, -quantity)
+
+        # Other grants only take units away, so the grant can only become safe after a release
+        if sequence is None:
+            self.unsafe.add((process, resource, quantity))
+        return sequence
+
+    def prefix_is_safe(self, process: str, resource: str, quantity: int) -> bool:
+        """
+        Checks if the processes before the requesting one in the safe sequence can still finish after the grant.
+        Processes after it get the units back when it finishes, so they are not affected.
+
+        :param process: Process name.
+        :param resource: Requested resource name.
+        :param quantity: Number of requested units.
+        :return: True if the current safe sequence stays valid.
+        """
+        position = self.position[process]
+        work = self.available[resource] - quantity
+
+        # Processes that never use the resource can't fail and don't change the work
+        before = [other for other in self.users[resource] if self.position[other] < position]
+        for other in sorted(before, key=self.position.__getitem__):
+            if self.needs[other].get(resource, 0) > work:
+                return False
+            work += self.allocations[other].get(resource, 0)
+
+        return True
+
+    def apply_grant(self, process: str, resource: str, quantity: int) -> None:
+        """Moves units from the available capacity to the allocation of a process (negative quantities undo it)."""
+        self.available[resource] -= quantity
+        self.allocations[process][resource] += quantity
+        self.needs[process][resource] -= quantity
+
+    def repair_sequence(self, process: str) -> list[str]:
+        """
+        Looks for a new safe sequence after a grant broke the current one. When the requesting process and
+        the processes before it can finish on their own, the processes after it keep their order, since they
+        get back the same units as before. Otherwise the full safety check runs.
+
+        :param process: Process that received the grant.
+        :return: A safe sequence, or None if the state is not safe.
+        """
+        self.repairs += 1
+        index = self.sequence.index(process)
+        prefix = []
+        reduce_region(set(self.sequence[:index + 1]), self.allocations, self.needs, self.available, prefix)
+
+        if len(prefix) == index + 1:
+            return prefix + self.sequence[index + 1:]
+        return self.safe_sequence()
+
+    def safe_sequence(self) -> list[str]:
+        """
+        Runs the full safety check: a worklist reduction where the claims are the requests.
+
+        :return: A safe sequence, or None if the state is not safe.
+        """
+        self.full_checks += 1
+        sequence = []
+        reduce_region(set(self.allocations), self.allocations, self.needs, self.available, sequence)
+
+        return sequence if len(sequence) == len(self.allocations) else None
+
+    def set_sequence(self, sequence: list[str]) -> None:
+        """Stores a safe sequence and the position of each process in it."""
+        self.sequence = sequence
+        self.position = {process: index for index, process in enumerate(sequence)}
+        self.next_position = len(sequence)
@@ -0,0 +1,118 @@
+import glob
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from utils.cli import analyze_file
+
+
+def find_snapshots(pattern: str) -> list[str]:
+    """
+    Lists the files of a directory (not recursive) or the files matching a glob pattern.
+
+    :param pattern: Directory or glob pattern (** matches subdirectories).
+    :return: Sorted list of file paths.
+    """
+    if os.path.isdir(pattern):
+        pattern = os.path.join(pattern, '*')
+
+    return sorted(path for path in glob.glob(pattern, recursive=True) if os.path.isfile(path))
+
+def analyze_files(paths: list[str], engine: str = "worklist", resolve: bool = True, cost_model: str = "fewest_held") -> list[dict]:
+    """
+    Analyzes a chunk of files in a worker. A file that can't be read or analyzed gives a result with the error
+    instead of stopping the chunk.
+
+    :param paths: File paths.
+    :param engine: Detection engine (see utils.cli.ENGINES).
+    :param resolve: If True, the victims that resolve each deadlock are also chosen.
+    :param cost_model: Victim cost model.
+    :return: One verdict dictionary per file.
+    """
+    results = []
+    for path in paths:
+        try:
+            results.append(analyze_file(path, engine, resolve, cost_model))
+        except Exception as error:
+            results.append({"path": path, "error": f"{type(error).__name__}: {error}"})
+
+    return results
+
+
+class BatchAnalyzer:
+    def __init__(self, workers: int = None, chunk_size: int = 8, max_in_flight: int = None, engine: str = "worklist",
+                 resolve: bool = True, cost_model: str = "fewest_held"):
+        """
+        Analyzes many snapshot files on a process pool. Each worker reads its own files, so the file I/O of one
+        worker overlaps with the detection of the others and no graph is pickled between processes; only the
+        paths and the verdicts are. Files are sent in chunks to amortize the cost of each task and at most
+        max_in_flight chunks are queued, so the memory stays bounded however many files there are.
+
+        :param workers: Number of worker processes (defaults to the number of CPUs).
+        :param chunk_size: Files analyzed by a worker per task.
+        :param max_in_flight: Chunks submitted and not finished yet (defaults to twice the workers).
+        :param engine: Detection engine (see utils.cli.ENGINES).
+        :param resolve: If True, the victims that resolve each deadlock are also chosen.
+        :param cost_model: Victim cost model.
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.max_in_flight = max_in_flight or 2 * self.workers
+        self.engine = engine
+        self.resolve = resolve
+        self.cost_model = cost_model
+
+        self.files = 0
+        self.deadlocked = 0
+        self.errors = 0
+        self.elapsed = 0.0
+
+    @property
+    def files_per_second(self) -> float:
+        return self.files / self.elapsed if self.elapsed else 0.0
+
+    def chunks(self, paths):
+        """Groups the paths in lists of chunk_size."""
+        chunk = []
+        for path in paths:
+            chunk.append(path)
+            if len(chunk) == self.chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def run(self, paths):
+        """
+        Analyzes the files and yields the verdict of each one as soon as its chunk finishes (not in input order).
+
+        :param paths: Iterable of file paths, consumed only as fast as the workers progress.
+        :return: Generator of verdict dictionaries.
+        """
+        start = time.perf_counter()
+        chunks = self.chunks(paths)
+        pending = set()
+
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            while True:
+                for chunk in chunks:
+                    pending.add(pool.submit(analyze_files, chunk, self.engine, self.resolve, self.cost_model))
+                    if len(pending) >= self.max_in_flight:
+                        break
+
+                if not pending:
+                    break
+
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    for result in future.result():
+                        self.files += 1
+                        self.errors += "error" in result
+                        self.deadlocked += bool(result.get("deadlocked"))
+                        yield result
+
+        self.elapsed = time.perf_counter() - start
+
+    def summary(self) -> dict:
+        return {"files": self.files, "deadlocked": self.deadlocked, "errors": self.errors, "workers": self.workers,
+                "seconds": round(self.elapsed, 6), "files_per_second": round(self.files_per_second, 1)}
@@ -0,0 +1,325 @@
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from utils.bankers import BankersAllocator
+from utils.deadlock_resolver import detect_and_resolve_deadlock, reduce_allocation_graph
+from utils.graph_generators import GENERATORS, generate_graph
+from utils.instrumentation import metrics
+from utils.parallel_reduction import chunk_components, parallel_reduce_allocation_graph, reduce_chunk
+from utils.resource_allocation_graph_builder import ResourceAllocationGraph
+
+PHASES = ("construction", "lists", "detection", "victim_selection", "resolution")
+# Modules the command-line entry point must not import, checked by benchmark_startup
+HEAVY_MODULES = ("matplotlib", "networkx", "tkinter", "easygui", "numpy")
+
+
+def measure(function, repeat: int = 1) -> tuple[object, float, int]:
+    """
+    Measures a function: the best wall-clock time of repeat runs and the peak memory of one more traced run.
+    Output printed by the function is discarded.
+
+    :param function: Function without arguments.
+    :param repeat: Number of timed runs.
+    :return: (result, seconds, peak memory in bytes).
+    """
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        seconds = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = function()
+            seconds = min(seconds, time.perf_counter() - start)
+
+        tracemalloc.start()
+        try:
+            function()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    return result, seconds, peak
+
+def measure_victim_selection(rag: ResourceAllocationGraph, repeat: int = 1) -> tuple[object, float, int]:
+    """
+    Measures only the victim selection of a resolution (VictimQueue.pop, through the instrumentation): the best
+    total selection time of repeat resolutions and the peak memory of the selections in one more traced run.
+    The reduction itself is not a phase here, so the selections are the outermost phases that get traced.
+
+    :param rag: ResourceAllocationGraph instance.
+    :param repeat: Number of timed resolutions.
+    :return: (ReductionResult of the resolution, seconds, peak memory in bytes).
+    """
+    reduce_untimed = reduce_allocation_graph.__wrapped__
+    seconds = float('inf')
+    try:
+        for _ in range(repeat):
+            metrics.enable()
+            result = reduce_untimed(rag, resolve=True)
+            seconds = min(seconds, metrics.seconds.get("victim_selection", 0.0))
+
+        metrics.enable(trace_memory=True)
+        reduce_untimed(rag, resolve=True)
+        peak = metrics.peak_bytes.get("victim_selection", 0)
+    finally:
+        metrics.disable()
+        metrics.reset()
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    return result, seconds, peak
+
+def benchmark_graph(shape: str, size: int, seed: int = 0, repeat: int = 1) -> dict:
+    """
+    Benchmarks each phase of the deadlock detection on a synthetic graph.
+
+    :param shape: Graph shape (see utils.graph_generators).
+    :param size: Number of processes.
+    :param seed: Random seed.
+    :param repeat: Number of timed runs of each phase.
+    :return: Dictionary with the graph size and the time and peak memory of each phase.
+    """
+    allocation, request, resource_capacity = generate_graph(shape, size, seed)
+    phases = {}
+
+    def record(phase, function):
+        result, seconds, peak = measure(function, repeat)
+        phases[phase] = {"seconds": round(seconds, 6), "peak_bytes": peak}
+        return result
+
+    rag = record("construction", lambda: ResourceAllocationGraph.from_lists(allocation, request, resource_capacity))
+    record("lists", lambda: (rag.create_request_list(), rag.create_allocation_list()))
+    detection = record("detection", lambda: reduce_allocation_graph(rag))
+    resolution, seconds, peak = measure_victim_selection(rag, repeat)
+    phases["victim_selection"] = {"seconds": round(seconds, 6), "peak_bytes": peak}
+    record("resolution", lambda: detect_and_resolve_deadlock(allocation, request, resource_capacity))
+
+    return {
+        "shape": shape,
+        "size": size,
+        "seed": seed,
+        "processes": len(rag.processes),
+        "resources": len(rag.resources),
+        "edges": len(rag.request_targets) + len(rag.allocation_targets),
+        "units": sum(rag.request_units) + sum(rag.allocation_units),
+        "deadlocked": len(detection.deadlocked_processes),
+        "victims": len(resolution.removed_processes),
+        "phases": phases,
+    }
+
+def benchmark_admission(size: int, seed: int = 0, checks: int = 100000, incremental: bool = True) -> dict:
+    """
+    Measures the throughput of the Banker's admission checks. Processes claim units of two random resources
+    and request them one at a time; a process that gets its whole claim finishes and a new one takes its place.
+
+    :param size: Number of processes.
+    :param seed: Random seed.
+    :param checks: Number of admission checks.
+    :param incremental: If False, every check runs the full safety check.
+    :return: Dictionary with the number of checks, grants, repaired sequences, full safety checks and checks per second.
+    """
+    rnd = random.Random(seed)
+    resources = [f"R{i}" for i in range(max(2, size // 10))]
+    claims = [{resource: rnd.randint(1, 3) for resource in rnd.sample(resources, 2)} for _ in range(size)]
+
+    allocator = BankersAllocator(incremental)
+    for resource in resources:
+        allocator.add_resource(resource, max(3, sum(claim.get(resource, 0) for claim in claims) // 2))
+    for index, claim in enumerate(claims):
+        allocator.add_process(f"P{index}", claim)
+
+    processes = list(allocator.allocations)
+    next_index = size
+    grants = 0
+
+    start = time.perf_counter()
+    for _ in range(checks):
+        slot = rnd.randrange(size)
+        process = processes[slot]
+        resource = next(resource for resource, quantity in allocator.needs[process].items() if quantity > 0)
+
+        if allocator.request(process, resource):
+            grants += 1
+            if not any(allocator.needs[process].values()):
+                allocator.remove_process(process)
+                processes[slot] = f"P{next_index}"
+                allocator.add_process(processes[slot], {resource: rnd.randint(1, 3) for resource in rnd.sample(resources, 2)})
+                next_index += 1
+    seconds = time.perf_counter() - start
+
+    return {
+        "processes": size,
+        "resources": len(resources),
+        "incremental": incremental,
+        "checks": checks,
+        "grants": grants,
+        "repairs": allocator.repairs,
+        "full_checks": allocator.full_checks,
+        "seconds": round(seconds, 6),
+        "checks_per_second": round(checks / seconds, 1),
+    }
+
+def benchmark_parallel(shape: str, size: int, workers: int, seed: int = 0, repeat: int = 1) -> dict:
+    """
+    Compares the parallel reduction on a process pool with the serial reduction. The partition and packing done
+    by the calling process and the reduction of the chunks one after the other are measured too, so the share
+    of the work the workers take over is known even when the machine has fewer cores than workers.
+
+    :param shape: Graph shape (see utils.graph_generators).
+    :param size: Number of processes.
+    :param workers: Number of worker processes.
+    :param seed: Random seed.
+    :param repeat: Number of timed runs of each phase.
+    :return: Dictionary with the graph size, the number of chunks, the seconds of each phase and the speedup.
+    """
+    rag = ResourceAllocationGraph.from_lists(*generate_graph(shape, size, seed))
+    graph_size = len(rag.processes) + len(rag.resources) + len(rag.request_targets) + len(rag.allocation_targets)
+    chunk_size = min(50000, max(1, graph_size // workers))
+
+    _, serial, _ = measure(lambda: reduce_allocation_graph(rag), repeat)
+    (_, chunks), partition, _ = measure(lambda: chunk_components(rag, chunk_size), repeat)
+    _, chunk_seconds, _ = measure(lambda: [reduce_chunk(chunk) for chunk in chunks], repeat)
+    _, parallel, _ = measure(lambda: parallel_reduce_allocation_graph(rag, workers=workers, executor="process", chunk_size=chunk_size), repeat)
+
+    return {
+        "shape": shape,
+        "size": size,
+        "workers": workers,
+        "cpus": os.cpu_count(),
+        "graph_size": graph_size,
+        "chunks": len(chunks),
+        "serial_seconds": round(serial, 6),
+        "partition_seconds": round(partition, 6),
+        "chunk_seconds": round(chunk_seconds, 6),
+        "parallel_seconds": round(parallel, 6),
+        "speedup": round(serial / parallel, 2),
+    }
+
+def benchmark_startup(module: str, repeat: int = 5) -> dict:
+    """
+    Measures the startup of a fresh interpreter that imports a module, and which heavy modules it loads.
+
+    :param module: Module name (e.g. "utils.cli" or "main").
+    :param repeat: Number of timed runs (the best one is kept).
+    :return: Dictionary with the module, the seconds and the heavy modules loaded, or the error if the import fails.
+    """
+    code = f"import sys, {module}; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    seconds = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        process = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True)
+        seconds = min(seconds, time.perf_counter() - start)
+        if process.returncode != 0:
+            return {"module": module, "error": process.stderr.strip().splitlines()[-1]}
+
+    loaded = process.stdout.strip()
+    return {"module": module, "seconds": round(seconds, 6), "heavy_modules": loaded.split(',') if loaded else []}
+
+def run_benchmarks(shapes: list[str], sizes: list[int], seed: int = 0, repeat: int = 1) -> dict:
+    """
+    Runs the benchmark of every shape at every size.
+
+    :param shapes: Graph shapes.
+    :param sizes: Numbers of processes.
+    :param seed: Random seed.
+    :param repeat: Number of timed runs of each phase.
+    :return: Dictionary with the environment and the results, ready to be saved as JSON.
+    """
+    results = []
+    for shape in shapes:
+        for size in sizes:
+            result = benchmark_graph(shape, size, seed, repeat)
+            results.append(result)
+            print_result(result)
+
+    return {
+        "created": datetime.datetime.now().isoformat(timespec='seconds'),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+def print_result(result: dict) -> None:
+    """Prints the time and peak memory of each phase of a benchmark result."""
+    print(f"{result['shape']} size={result['size']} edges={result['edges']} "
+          f"deadlocked={result['deadlocked']} victims={result['victims']}")
+    for phase, values in result["phases"].items():
+        print(f"    {phase:<17}{values['seconds']:>12.6f} s {values['peak_bytes'] / 2 ** 20:>10.2f} MiB")
+
+def compare_results(baseline: dict, current: dict) -> None:
+    """
+    Prints the speedup of each phase of the current run against a baseline run.
+
+    :param baseline: Results loaded from a previous run.
+    :param current: Results of the current run.
+    """
+    previous = {(result["shape"], result["size"]): result for result in baseline["results"]}
+
+    for result in current["results"]:
+        old = previous.get((result["shape"], result["size"]))
+        if old is None:
+            continue
+
+        print(f"{result['shape']} size={result['size']}")
+        for phase, values in result["phases"].items():
+            if phase in old["phases"] and values["seconds"]:
+                print(f"    {phase:<17}{old['phases'][phase]['seconds'] / values['seconds']:>8.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks the deadlock detection on synthetic graphs.")
+    parser.add_argument("--shapes", nargs="+", default=list(GENERATORS), choices=list(GENERATORS))
+    parser.add_argument("--sizes", nargs="+", type=int, default=[1000, 10000])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=1, help="Timed runs of each phase (the best one is kept)")
+    parser.add_argument("--output", help="Saves the results to a JSON file")
+    parser.add_argument("--compare", help="Compares the results with a previous JSON file")
+    parser.add_argument("--admission", type=int, metavar="CHECKS", help="Also measures CHECKS Banker's admission checks per size")
+    parser.add_argument("--parallel", type=int, metavar="WORKERS", help="Also compares the parallel reduction on WORKERS processes with the serial one")
+    parser.add_argument("--startup", action="store_true", help="Also measures the startup of the CLI and of the GUI")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.shapes, args.sizes, args.seed, args.repeat)
+
+    if args.admission:
+        results["admission"] = []
+        for size in args.sizes:
+            for incremental in (True, False):
+                result = benchmark_admission(size, args.seed, args.admission, incremental)
+                results["admission"].append(result)
+                print(f"admission size={size} incremental={incremental} grants={result['grants']} repairs={result['repairs']} "
+                      f"full_checks={result['full_checks']} {result['checks_per_second']:.0f} checks/s")
+
+    if args.parallel:
+        results["parallel"] = []
+        for shape in args.shapes:
+            for size in args.sizes:
+                result = benchmark_parallel(shape, size, args.parallel, args.seed, args.repeat)
+                results["parallel"].append(result)
+                print(f"parallel {shape} size={size} workers={result['workers']} cpus={result['cpus']} chunks={result['chunks']} "
+                      f"serial={result['serial_seconds']:.3f} s partition={result['partition_seconds']:.3f} s "
+                      f"chunks={result['chunk_seconds']:.3f} s parallel={result['parallel_seconds']:.3f} s speedup={result['speedup']:.2f}x")
+
+    if args.startup:
+        results["startup"] = [benchmark_startup(module, args.repeat) for module in ("utils.cli", "main")]
+        for result in results["startup"]:
+            if "error" in result:
+                print(f"startup {result['module']} failed: {result['error']}")
+            else:
+                print(f"startup {result['module']} {result['seconds']:.6f} s heavy modules: {', '.join(result['heavy_modules']) or 'none'}")
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=4)
+    if args.compare:
+        with open(args.compare, 'r') as file:
+            compare_results(json.load(file), results)
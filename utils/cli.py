@@ -0,0 +1,171 @@
+import argparse
+import json
+import sys
+import time
+
+from utils.deadlock_resolver import COST_MODELS
+from utils.delta_snapshot import is_delta_log
+from utils.graph_snapshot import is_binary_snapshot, read_snapshot_graph
+
+# Only the engine modules are imported here: the GUI (matplotlib, networkx, tkinter, easygui) and numpy are
+# imported by the commands that need them, so the analysis starts fast and runs on workers without Tk
+ENGINES = ("worklist", "scc", "parallel", "matrix")
+
+
+def reduce_with_engine(rag, engine: str = "worklist", resolve: bool = False, cost_model: str = "fewest_held"):
+    """
+    Reduces a graph with one of the detection engines, importing only the module of that engine.
+
+    :param rag: ResourceAllocationGraph instance.
+    :param engine: One of ENGINES.
+    :param resolve: If True, victims are removed until the whole graph is reduced.
+    :param cost_model: Victim cost model (see utils.deadlock_resolver.VictimQueue).
+    :return: ReductionResult.
+    """
+    if engine == "worklist":
+        from utils.deadlock_resolver import reduce_allocation_graph
+        return reduce_allocation_graph(rag, resolve, cost_model=cost_model)
+    if engine == "scc":
+        from utils.deadlock_resolver import scc_reduce_allocation_graph
+        return scc_reduce_allocation_graph(rag, resolve, cost_model)
+    if engine == "parallel":
+        from utils.parallel_reduction import parallel_reduce_allocation_graph
+        return parallel_reduce_allocation_graph(rag, resolve, cost_model=cost_model)
+    if engine == "matrix":
+        if resolve:
+            raise ValueError("The matrix engine only detects deadlocks")
+        from utils.matrix_detector import matrix_reduce_graph
+        return matrix_reduce_graph(rag)
+
+    raise ValueError(f"Unknown engine {engine}")
+
+def analyze_file(path: str, engine: str = "worklist", resolve: bool = False, cost_model: str = "fewest_held") -> dict:
+    """
+    Reads a graph file (JSON or binary snapshot, or the last sample of a delta log) and runs the deadlock detection on it.
+
+    :param path: File path.
+    :param engine: One of ENGINES.
+    :param resolve: If True, the victims that resolve the deadlock are also chosen.
+    :param cost_model: Victim cost model.
+    :return: Verdict dictionary, ready to be printed as JSON, with the time of each phase.
+    """
+    start = time.perf_counter()
+    rag = read_snapshot_graph(path)
+    loaded = time.perf_counter()
+    result = reduce_with_engine(rag, engine, resolve, cost_model)
+    detected = time.perf_counter()
+
+    verdict = {
+        "path": path,
+        "format": "binary" if is_binary_snapshot(path) else "delta" if is_delta_log(path) else "json",
+        "engine": engine,
+        "processes": len(rag.processes),
+        "resources": len(rag.resources),
+        "edges": len(rag.request_targets) + len(rag.allocation_targets),
+        "deadlocked": result.deadlocked,
+        "deadlocked_processes": result.deadlocked_processes,
+    }
+    if resolve:
+        verdict["victims"] = result.removed_processes
+    verdict["seconds"] = {"load": round(loaded - start, 6), "detection": round(detected - loaded, 6)}
+
+    return verdict
+
+def enable_metrics(args) -> bool:
+    """
+    Enables the instrumentation with the sinks chosen on the command line.
+
+    :param args: Parsed arguments.
+    :return: True if it was enabled.
+    """
+    from utils.instrumentation import JsonLinesSink, LoggingSink, PrometheusSink, metrics
+
+    sinks = []
+    if args.metrics_log:
+        import logging
+        logging.basicConfig(level=logging.INFO, format="%(message)s")
+        sinks.append(LoggingSink())
+    if args.metrics_json:
+        sinks.append(JsonLinesSink(args.metrics_json))
+    if args.metrics_prometheus:
+        sinks.append(PrometheusSink(args.metrics_prometheus))
+    if not (sinks or args.profile or args.trace_memory):
+        return False
+
+    metrics.enable(*sinks, profile=bool(args.profile), trace_memory=args.trace_memory)
+    return True
+
+def flush_metrics(args) -> None:
+    """Sends the collected metrics to the sinks and saves the profile."""
+    from utils.instrumentation import metrics
+
+    metrics.flush()
+    if args.profile:
+        metrics.profiler.dump_stats(args.profile)
+
+def run_gui(path: str = None) -> None:
+    """Opens the interactive editor, optionally with a graph file loaded."""
+    from main import GraphResolver
+    GraphResolver(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analyzes resource allocation graphs without the GUI.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    analyze = subparsers.add_parser("analyze", help="Prints the deadlock verdict of a graph file as JSON")
+    analyze.add_argument("path", help="Graph file (JSON or .rag binary snapshot)")
+    analyze.add_argument("--engine", default="worklist", choices=ENGINES)
+    analyze.add_argument("--resolve", action="store_true", help="Also chooses the victims that resolve the deadlock")
+    analyze.add_argument("--cost-model", default="fewest_held", choices=COST_MODELS, help="Victim cost model (see utils.deadlock_resolver)")
+    analyze.add_argument("--metrics-log", action="store_true", help="Logs the phase times and counters to stderr")
+    analyze.add_argument("--metrics-json", metavar="PATH", help="Appends the phase times and counters to a JSON lines file")
+    analyze.add_argument("--metrics-prometheus", metavar="PATH", help="Writes the phase times and counters in the Prometheus text format")
+    analyze.add_argument("--profile", metavar="PATH", help="Saves a cProfile of the phases (open it with pstats or snakeviz)")
+    analyze.add_argument("--trace-memory", action="store_true", help="Records the peak memory of each phase")
+
+    batch = subparsers.add_parser("batch", help="Analyzes many files on a process pool, printing one JSON line per file")
+    batch.add_argument("pattern", help="Directory or glob pattern (quote it so the shell doesn't expand it)")
+    batch.add_argument("--engine", default="worklist", choices=ENGINES)
+    batch.add_argument("--detect-only", action="store_true", help="Doesn't choose victims (always the case with the matrix engine)")
+    batch.add_argument("--cost-model", default="fewest_held", choices=COST_MODELS, help="Victim cost model (see utils.deadlock_resolver)")
+    batch.add_argument("--workers", type=int, help="Worker processes (default: number of CPUs)")
+    batch.add_argument("--chunk-size", type=int, default=8, help="Files per task")
+    batch.add_argument("--max-in-flight", type=int, help="Tasks queued at once (default: twice the workers)")
+
+    gui = subparsers.add_parser("gui", help="Opens the interactive editor")
+    gui.add_argument("path", nargs="?", help="Graph file to open")
+    args = parser.parse_args()
+
+    if args.command == "analyze" and args.engine == "matrix" and args.resolve:
+        parser.error("the matrix engine only detects deadlocks, --resolve needs another engine")
+
+    if args.command == "gui":
+        run_gui(args.path)
+        sys.exit(0)
+
+    if args.command == "batch":
+        from utils.batch_analyzer import BatchAnalyzer, find_snapshots
+
+        # The matrix engine can't choose victims, so its batches only detect
+        resolve = not args.detect_only and args.engine != "matrix"
+        analyzer = BatchAnalyzer(args.workers, args.chunk_size, args.max_in_flight, args.engine, resolve, args.cost_model)
+        for result in analyzer.run(find_snapshots(args.pattern)):
+            print(json.dumps(result), flush=True)
+
+        print(json.dumps(analyzer.summary()), file=sys.stderr)
+        sys.exit(1 if analyzer.deadlocked else 0)
+
+    instrumented = enable_metrics(args)
+    try:
+        verdict = analyze_file(args.path, args.engine, args.resolve, args.cost_model)
+    except (OSError, ValueError, KeyError) as error:
+        print(json.dumps({"path": args.path, "error": str(error)}))
+        sys.exit(2)
+
+    if instrumented:
+        flush_metrics(args)
+
+    print(json.dumps(verdict))
+    # Exit status 1 when a deadlock was found, so shell scripts can branch on it
+    sys.exit(1 if verdict["deadlocked"] else 0)
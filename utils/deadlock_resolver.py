@@ -1,105 +1,459 @@
-def choose_process_to_remove(allocation: dict[str, list[str]], request: dict[str, list[str]], resource_capacity: dict[str, int]) -> str:
+import heapq
+import logging
+from array import array
+from bisect import bisect_right
+from collections import Counter, deque
+
+from utils.instrumentation import metrics, timed
+from utils.resource_allocation_graph_builder import ResourceAllocationGraph
+from utils.wait_for_graph import build_bipartite_graph, build_wait_for_graph, find_blocked_nodes
+
+logger = logging.getLogger(__name__)
+
+
+class ReductionResult:
+    def __init__(self, reduction_order: list[str], deadlocked_processes: list[str], removed_processes: list[str]):
+        """
+        Stores the outcome of a graph reduction, independent of any GUI.
+
+        :param reduction_order: Processes in the order they were reduced (victims included).
+        :param deadlocked_processes: Processes that could not be reduced when the reduction first stalled.
+        :param removed_processes: Processes chosen as victims to resolve the deadlock.
+        """
+        self.reduction_order = reduction_order
+        self.deadlocked_processes = deadlocked_processes
+        self.removed_processes = removed_processes
+
+    @property
+    def deadlocked(self) -> bool:
+        """Verdict of the reduction: True if a deadlock was found."""
+        return len(self.deadlocked_processes) > 0
+
+    def __repr__(self):
+        return (f"ReductionResult(deadlocked={self.deadlocked}, reduction_order={self.reduction_order}, "
+                f"deadlocked_processes={self.deadlocked_processes}, removed_processes={self.removed_processes})")
+
+
+COST_MODELS = ("fewest_held", "most_freed", "most_unblocked", "cost")
+
+
+class VictimQueue:
+    def __init__(self, rag: ResourceAllocationGraph, cost_model: str = "fewest_held", process_costs: dict[str, float] = None):
+        """
+        Priority queue of deadlock victims, the process with the lowest cost is removed first (ties by process id).
+        The heap is only built when the reduction first stalls and stale entries are skipped when popped,
+        so choosing k victims costs O(P + k log P).
+
+        Cost models:
+            "fewest_held": fewest allocated units.
+            "most_freed": most allocated units.
+            "most_unblocked": most pending requests that become satisfiable with the released units.
+            "cost": lowest user-supplied cost in process_costs (processes without a cost count as 0).
+
+        :param rag: ResourceAllocationGraph being reduced.
+        :param cost_model: One of COST_MODELS.
+        :param process_costs: Cost of removing each process, used by the "cost" model.
+        """
+        if cost_model not in COST_MODELS:
+            raise ValueError(f"Unknown cost model: {cost_model}")
+
+        self.rag = rag
+        self.cost_model = cost_model
+        self.process_costs = process_costs or {}
+        self.heap = None
+        self.version = None
+        self.changed_resources = set()
+
+    def cost(self, process: int, available: array, waiters: list[list[tuple[int, int]]], cursor: list[int]) -> float:
+        """
+        Computes the cost of removing a process in the current state of the reduction.
+
+        :param process: Process id.
+        :param available: Available units of each resource.
+        :param waiters: Blocked requests (quantity, process) of each resource, sorted by quantity.
+        :param cursor: Index of the first request of each resource that is still blocked.
+        :return: Cost of the process.
+        """
+        rag = self.rag
+        if self.cost_model == "fewest_held":
+            return rag.held_units(process)
+        if self.cost_model == "most_freed":
+            return -rag.held_units(process)
+        if self.cost_model == "cost":
+            return self.process_costs.get(rag.processes[process], 0)
+
+        unblocked = 0
+        for resource, quantity in rag.allocation_quantities(process):
+            resource_waiters = waiters[resource]
+            unblocked += bisect_right(resource_waiters, (available[resource] + quantity, len(rag.processes))) - cursor[resource]
+        return -unblocked
+
+    def released(self, resource: int) -> None:
+        """Registers units released on a resource, the costs of its holders may change ("most_unblocked" only)."""
+        if self.heap is not None and self.cost_model == "most_unblocked":
+            self.changed_resources.add(resource)
+
+    @timed("victim_selection")
+    def pop(self, reduced: bytearray, available: array, waiters: list[list[tuple[int, int]]], cursor: list[int]) -> int:
+        """
+        Removes the cheapest process that is not reduced yet from the queue.
+
+        :param reduced: Processes already reduced.
+        :param available: Available units of each resource.
+        :param waiters: Blocked requests (quantity, process) of each resource, sorted by quantity.
+        :param cursor: Index of the first request of each resource that is still blocked.
+        :return: Process id of the victim.
+        """
+        if self.heap is None:
+            self.version = [0] * len(self.rag.processes)
+            self.heap = [(self.cost(process, available, waiters, cursor), process, 0)
+                         for process in range(len(self.rag.processes)) if not reduced[process]]
+            heapq.heapify(self.heap)
+
+        # Holders of the released resources get a new entry, their old entries become stale
+        for resource in self.changed_resources:
+            for holder in self.rag.holder_view(resource):
+                if not reduced[holder]:
+                    self.version[holder] += 1
+                    heapq.heappush(self.heap, (self.cost(holder, available, waiters, cursor), holder, self.version[holder]))
+        self.changed_resources.clear()
+
+        while True:
+            _, process, version = heapq.heappop(self.heap)
+            if not reduced[process] and version == self.version[process]:
+                return process
+
+
+def is_request_satisfiable(requested: list[str], resource_capacity: dict[str, int]) -> bool:
+    """
+    Verifies if every requested unit can be granted with the remaining capacity.
+
+    :param requested: List of requested resources of a process (one entry per unit).
+    :param resource_capacity: Dictionary with the available capacity of each resource.
+    :return: True if the whole request fits in the available capacity.
+    """
+    return all(resource_capacity[resource] >= quantity for resource, quantity in Counter(requested).items())
+
+
+def choose_process_to_remove(allocation: dict[str, list[str]], request: dict[str, list[str]], resource_capacity: dict[str, int],
+                             cost_model: str = "fewest_held", process_costs: dict[str, float] = None) -> str:
     """
     Chooses a process to remove based on which removal would free the most capacity
-    and unlock the execution of other processes.
-    
+    and unlock the execution of other processes. Scans every process, see VictimQueue for the heap version.
+
     :param allocation: Dictionary of processes with allocated resources (as lists).
     :param request: Dictionary of processes with waiting requested resources.
     :param resource_capacity: Dictionary with the available capacity of each resource.
+    :param cost_model: One of COST_MODELS (see VictimQueue).
+    :param process_costs: Cost of removing each process, used by the "cost" model.
     :return: The process name to be removed.
     """
-    
-    candidates = []
-    process_to_remove = None
-    
-    # Verifies if a requested resource has capacity to be allocated
-    for process in request.keys():
-        for res in request[process]:
-            if resource_capacity[res] > 0 and resource_capacity[res] >= sum(1 for r in request[process] if r == res and resource_capacity[res] > 0):
-                candidates.append(process)
-    
+
     # If any process has all the requested resources, choose to be removed
-    for process in candidates:
-        if all(resource_capacity[r] > 0 for r in request[process]):
-            process_to_remove = process
-            break
+    for process in request.keys():
+        if is_request_satisfiable(request[process], resource_capacity):
+            return process
 
-    # If no process has all the requested resources, it has a Deadlock,then choose the process with the lowest allocation
-    if candidates == [] or (process_to_remove == None and len(candidates) > 0):
-        process_to_remove = min(allocation.keys(), key=lambda p: len(allocation[p]))
+    # If no process has all the requested resources, it has a Deadlock, then choose the process with the lowest cost
+    if cost_model == "fewest_held":
+        return min(allocation.keys(), key=lambda p: len(allocation[p]))
+    if cost_model == "most_freed":
+        return min(allocation.keys(), key=lambda p: -len(allocation[p]))
+    if cost_model == "cost":
+        process_costs = process_costs or {}
+        return min(allocation.keys(), key=lambda p: process_costs.get(p, 0))
+    if cost_model != "most_unblocked":
+        raise ValueError(f"Unknown cost model: {cost_model}")
 
-    return process_to_remove
+    requested = {process: Counter(resources) for process, resources in request.items()}
+
+    def unblocked(process):
+        freed = Counter(allocation[process])
+        return -sum(1 for waiter in allocation if waiter != process for resource, quantity in requested[waiter].items()
+                    if resource in freed and resource_capacity[resource] < quantity <= resource_capacity[resource] + freed[resource])
+
+    return min(allocation.keys(), key=unblocked)
 
 def calculate_remaining_capacity(allocation: dict[str, dict[str, int]], resource_capacity: dict[str, int]):
     """
     Verifies the remaining capacity of resources based on the allocation list.
-    
+
     :param allocation: Dictionary of processes with the allocated resources and their quantities.
     :param resource_capacity: Dictionary with the total capacity of each resource.
     :return: Dictionary of remaining capacity.
     """
-    
+
     resource_capacity_remaining = resource_capacity.copy()
-    
+
     for process in allocation:
         for resource in allocation[process]:
             resource_capacity_remaining[resource] -= 1
 
     return resource_capacity_remaining
 
-def detect_and_resolve_deadlock(allocation: dict[str, dict[str, int]], request: dict[str, list[str]], resource_capacity: dict[str, int]) -> list[str]:
+def reduce_graph(allocation: dict[str, list[str]], request: dict[str, list[str]], resource_capacity: dict[str, int], resolve: bool = False, method: str = "worklist",
+                 cost_model: str = "fewest_held", process_costs: dict[str, float] = None) -> ReductionResult:
     """
-    Detects and removes a deadlock in a Resource Allocation Graph (RAG) using graph reduction.
-    
-    :param allocation: Dictionary of processes with the allocated resources and their quantities {process: {resource: allocated_quantity}}.
+    Reduces a Resource Allocation Graph (RAG) without any drawing or waiting, so it can be used headless.
+    The input dictionaries are not modified.
+
+    :param allocation: Dictionary of processes with the allocated resources {process: [allocated_resource]}.
     :param request: Dictionary of processes with the waiting requested resources {process: [requested_resource]}.
-    :param resource_capacity: Dictionary with the total capacity of each resource {resource: available_capacity}.
-    :return: List of processes that were removed.
+    :param resource_capacity: Dictionary with the total capacity of each resource {resource: total_capacity}.
+    :param resolve: If True, victims are removed until the whole graph is reduced.
+    :param method: "worklist" for the linear-time reduction, "scc" to prune acyclic processes with a
+                   strongly connected components pass first or "scan" for the original quadratic one.
+    :param cost_model: Victim cost model, one of COST_MODELS (see VictimQueue).
+    :param process_costs: Cost of removing each process, used by the "cost" model.
+    :return: ReductionResult with the verdict, the deadlocked processes and the reduction order.
+    """
+    if method == "scc":
+        rag = ResourceAllocationGraph.from_lists(allocation, request, resource_capacity)
+        return scc_reduce_allocation_graph(rag, resolve, cost_model, process_costs)
+    if method == "worklist":
+        return worklist_reduce_graph(allocation, request, resource_capacity, resolve, cost_model, process_costs)
+    if method == "scan":
+        return scan_reduce_graph(allocation, request, resource_capacity, resolve, cost_model, process_costs)
+
+    raise ValueError(f"Unknown reduction method: {method}")
+
+@timed("scan_reduction")
+def scan_reduce_graph(allocation: dict[str, list[str]], request: dict[str, list[str]], resource_capacity: dict[str, int], resolve: bool = False,
+                      cost_model: str = "fewest_held", process_costs: dict[str, float] = None) -> ReductionResult:
     """
+    Reduces the graph rescanning every remaining process after each removal (O(P^2)).
+
+    :param allocation: Dictionary of processes with the allocated resources {process: [allocated_resource]}.
+    :param request: Dictionary of processes with the waiting requested resources {process: [requested_resource]}.
+    :param resource_capacity: Dictionary with the total capacity of each resource {resource: total_capacity}.
+    :param resolve: If True, victims are removed until the whole graph is reduced.
+    :param cost_model: Victim cost model, one of COST_MODELS (see VictimQueue).
+    :param process_costs: Cost of removing each process, used by the "cost" model.
+    :return: ReductionResult with the verdict, the deadlocked processes and the reduction order.
+    """
+    allocation = {process: list(resources) for process, resources in allocation.items()}
+    request = {process: list(request.get(process, [])) for process in allocation}
     processes = list(allocation.keys())
+    reduction_order = []
+    deadlocked_processes = []
     removed_processes = []
-    
+
     resource_capacity_copy = calculate_remaining_capacity(allocation, resource_capacity)
-    
-    while True:
+    passes = 0
+
+    while processes:
         removable_process = None
-        
-        # Find processes that can be removed (those that don't have pending requests)
+        passes += 1
+
+        # Find processes that can be removed (those whose requests can be granted)
         for process in processes:
-            if request[process] == []:
+            if is_request_satisfiable(request[process], resource_capacity_copy):
                 removable_process = process
-                print(f"Removendo o processo {removable_process}")
                 break
-        
+
+        # Deadlock case
         if removable_process is None:
-            break
-        
-        processes.remove(removable_process)
-        free_allocation(allocation, request, processes, removable_process, resource_capacity_copy)
+            if not deadlocked_processes:
+                deadlocked_processes = list(processes)
+            if not resolve:
+                break
+
+            # Call to the heuristic function to choose a process to be removed
+            removable_process = choose_process_to_remove(allocation, request, resource_capacity_copy, cost_model, process_costs)
+            removed_processes.append(removable_process)
 
-    # Deadlock case
-    while processes:
-        print(f"Deadlock detectado nos processos: {processes}")
-        
-        # Call to the heuristic function to choose a process to be removed
-        process_to_remove = choose_process_to_remove(allocation, request, resource_capacity_copy)
-        print(f"Removendo o processo {process_to_remove}")
-        removed_processes.append(process_to_remove)
-        
         # Remove the process from processes list and free the resource allocation
-        processes.remove(process_to_remove)
-        free_allocation(allocation, request, processes, process_to_remove, resource_capacity_copy) 
+        processes.remove(removable_process)
+        reduction_order.append(removable_process)
+        free_allocation(allocation, request, removable_process, resource_capacity_copy)
+
+    metrics.count("passes", passes)
+    return ReductionResult(reduction_order, deadlocked_processes, removed_processes)
+
+def worklist_reduce_graph(allocation: dict[str, list[str]], request: dict[str, list[str]], resource_capacity: dict[str, int], resolve: bool = False,
+                          cost_model: str = "fewest_held", process_costs: dict[str, float] = None) -> ReductionResult:
+    """
+    Reduces the graph with a worklist over the integer ids of a ResourceAllocationGraph.
+
+    :param allocation: Dictionary of processes with the allocated resources {process: [allocated_resource]}.
+    :param request: Dictionary of processes with the waiting requested resources {process: [requested_resource]}.
+    :param resource_capacity: Dictionary with the total capacity of each resource {resource: total_capacity}.
+    :param resolve: If True, victims are removed until the whole graph is reduced.
+    :param cost_model: Victim cost model, one of COST_MODELS (see VictimQueue).
+    :param process_costs: Cost of removing each process, used by the "cost" model.
+    :return: ReductionResult with the verdict, the deadlocked processes and the reduction order.
+    """
+    rag = ResourceAllocationGraph.from_lists(allocation, request, resource_capacity)
+    return reduce_allocation_graph(rag, resolve, cost_model=cost_model, process_costs=process_costs)
+
+@timed("reduction")
+def reduce_allocation_graph(rag: ResourceAllocationGraph, resolve: bool = False, reduced_processes: list[int] = None,
+                            cost_model: str = "fewest_held", process_costs: dict[str, float] = None) -> ReductionResult:
+    """
+    Reduces a ResourceAllocationGraph with a worklist. Each process keeps the number of resources it is
+    still blocked on and each resource keeps its waiters sorted by the requested quantity, so releasing
+    capacity only re-examines the waiters of the released resource.
+    Detection runs in O(P + R + E) (plus the sort of the waiters of each resource).
+
+    :param rag: ResourceAllocationGraph to be reduced.
+    :param resolve: If True, victims are removed until the whole graph is reduced.
+    :param reduced_processes: Ids of processes already reduced, their allocations are released before the reduction starts.
+    :param cost_model: Victim cost model, one of COST_MODELS (see VictimQueue).
+    :param process_costs: Cost of removing each process, used by the "cost" model.
+    :return: ReductionResult with the verdict, the deadlocked processes and the reduction order (without reduced_processes).
+    """
+    process_count = len(rag.processes)
+    available = array('q', rag.capacity)
+    for resource, units in zip(rag.allocation_targets, rag.allocation_units):
+        available[resource] -= units
+
+    reduced = bytearray(process_count)
+    reduced_count = 0
+    for process in reduced_processes or []:
+        reduced[process] = 1
+        reduced_count += 1
+        for resource, quantity in rag.allocation_quantities(process):
+            available[resource] += quantity
+
+    blocked_count = array('q', [0]) * process_count
+    waiters = [[] for _ in rag.resources]
+    ready = deque()
+
+    for process in range(process_count):
+        if reduced[process]:
+            continue
+
+        for resource, quantity in rag.request_quantities(process):
+            if quantity > available[resource]:
+                blocked_count[process] += 1
+                waiters[resource].append((quantity, process))
+
+        if blocked_count[process] == 0:
+            ready.append(process)
+
+    # Waiters with the smallest request are unblocked first, so each resource only moves a cursor forward
+    for resource_waiters in waiters:
+        resource_waiters.sort()
+    cursor = [0] * len(waiters)
+
+    reduction_order = []
+    deadlocked_processes = []
+    removed_processes = []
+    victims = VictimQueue(rag, cost_model, process_costs)
+
+    while reduced_count < process_count:
+        if ready:
+            process = ready.popleft()
+            if reduced[process]:
+                continue
+        else:
+            # Deadlock case
+            if not deadlocked_processes:
+                deadlocked_processes = [p for p in range(process_count) if not reduced[p]]
+            if not resolve:
+                break
+
+            process = victims.pop(reduced, available, waiters, cursor)
+            removed_processes.append(process)
+
+        reduced[process] = 1
+        reduced_count += 1
+        reduction_order.append(process)
+
+        # Release the allocation and only re-examine the waiters of the released resources
+        for resource, quantity in rag.allocation_quantities(process):
+            available[resource] += quantity
+            victims.released(resource)
+            resource_waiters = waiters[resource]
+            index = cursor[resource]
+            while index < len(resource_waiters) and resource_waiters[index][0] <= available[resource]:
+                waiter = resource_waiters[index][1]
+                blocked_count[waiter] -= 1
+                if blocked_count[waiter] == 0 and not reduced[waiter]:
+                    ready.append(waiter)
+                index += 1
+            cursor[resource] = index
+
+    if metrics.enabled:
+        metrics.count("passes")
+        metrics.count("reduced_processes", len(reduction_order))
+        metrics.count("deadlocked_processes", len(deadlocked_processes))
+        metrics.count("victims", len(removed_processes))
+        metrics.count("freed_units", sum(rag.held_units(process) for process in reduction_order))
+
+    names = rag.processes
+    return ReductionResult([names[p] for p in reduction_order], [names[p] for p in deadlocked_processes], [names[p] for p in removed_processes])
+
+@timed("scc_reduction")
+def scc_reduce_allocation_graph(rag: ResourceAllocationGraph, resolve: bool = False, cost_model: str = "fewest_held",
+                                process_costs: dict[str, float] = None) -> ReductionResult:
+    """
+    Reduces a ResourceAllocationGraph using a strongly connected components pass first.
+    Processes that are not on a cycle and do not wait on one are always reducible, so they are pruned in O(V + E).
+    When every resource has capacity 1 a cycle is a deadlock, so the processes left are deadlocked and
+    the general reduction only runs to resolve them. Otherwise the worklist reduction runs on what is left.
+
+    :param rag: ResourceAllocationGraph to be reduced.
+    :param resolve: If True, victims are removed until the whole graph is reduced.
+    :param cost_model: Victim cost model, one of COST_MODELS (see VictimQueue).
+    :param process_costs: Cost of removing each process, used by the "cost" model.
+    :return: ReductionResult with the verdict, the deadlocked processes and the reduction order.
+    """
+    process_count = len(rag.processes)
+    single_unit = all(capacity == 1 for capacity in rag.capacity)
+
+    if single_unit:
+        offsets, targets = build_wait_for_graph(rag)
+        node_count = process_count
+    else:
+        offsets, targets = build_bipartite_graph(rag)
+        node_count = process_count + len(rag.resources)
+
+    # Requests above the capacity can never be granted
+    stuck = bytearray(node_count)
+    for process in range(process_count):
+        for resource, quantity in rag.request_quantities(process):
+            if quantity > rag.capacity[resource]:
+                stuck[process] = 1
+
+    blocked, order = find_blocked_nodes(node_count, offsets, targets, stuck)
+    pruned = [node for node in order if node < process_count]
+    metrics.count("pruned_processes", len(pruned))
+    names = rag.processes
 
-    print("Deadlock resolvido.")
-    return removed_processes
+    if len(pruned) == process_count or (single_unit and not resolve):
+        return ReductionResult([names[process] for process in pruned], [names[process] for process in range(process_count) if blocked[process]], [])
+
+    result = reduce_allocation_graph(rag, resolve, pruned, cost_model, process_costs)
+    return ReductionResult([names[process] for process in pruned] + result.reduction_order, result.deadlocked_processes, result.removed_processes)
+
+def detect_and_resolve_deadlock(allocation: dict[str, dict[str, int]], request: dict[str, list[str]], resource_capacity: dict[str, int],
+                                cost_model: str = "fewest_held", process_costs: dict[str, float] = None) -> list[str]:
+    """
+    Detects and removes a deadlock in a Resource Allocation Graph (RAG) using graph reduction.
+
+    :param allocation: Dictionary of processes with the allocated resources and their quantities {process: {resource: allocated_quantity}}.
+    :param request: Dictionary of processes with the waiting requested resources {process: [requested_resource]}.
+    :param resource_capacity: Dictionary with the total capacity of each resource {resource: available_capacity}.
+    :param cost_model: Victim cost model, one of COST_MODELS (see VictimQueue).
+    :param process_costs: Cost of removing each process, used by the "cost" model.
+    :return: List of processes that were removed.
+    """
+    result = reduce_graph(allocation, request, resource_capacity, resolve=True, cost_model=cost_model, process_costs=process_costs)
+
+    if result.deadlocked:
+        logger.info("Deadlock detectado nos processos: %s", result.deadlocked_processes)
+        logger.info("Processos removidos: %s", result.removed_processes)
+        logger.info("Deadlock resolvido.")
+
+    return result.removed_processes
 
 def free_allocation(allocation: dict[str, list[str]], request: dict[str, list[str]], process_to_remove: str, resource_capacity: dict[str, int]) -> None:
     """
     Releases the allocated resources of a removed process and updates resource capacities.
-    
+
     :param allocation: Dictionary of processes with allocated resources (as lists).
     :param request: Dictionary of processes with waiting requested resources.
-    :param processes: List of process names.
     :param process_to_remove: Name of the process to be removed.
     :param resource_capacity: Dictionary with the total capacity of each resource.
     """
@@ -107,4 +461,4 @@ def free_allocation(allocation: dict[str, list[str]], request: dict[str, list[st
         resource_capacity[resource] += 1  # Release one unit of the resource
 
     del allocation[process_to_remove]
-    del request[process_to_remove]
\ No newline at end of file
+    del request[process_to_remove]
@@ -0,0 +1,299 @@
+import argparse
+import json
+import os
+
+from utils.graph_snapshot import node_attributes, read_snapshot_content, write_json_snapshot
+from utils.instrumentation import timed
+from utils.resource_allocation_graph_builder import ResourceAllocationGraph
+
+# A delta log is a JSON lines file where each line is a sample: a keyframe with the whole snapshot content,
+# or a delta with the changes since the previous sample. The first line is always a keyframe.
+# DeltaWriter starts keyframes with this prefix, so they are found without parsing the lines
+KEYFRAME_PREFIX = b'{"type": "keyframe"'
+
+
+class GraphState:
+    def __init__(self, nodes: dict[str, dict], edges: dict[tuple[str, str], int], positions: dict, node_indexes: dict):
+        """
+        Graph kept as dictionaries, so a delta is applied in time proportional to its size.
+
+        :param nodes: Attributes of each node {node: {"kind": ..., "capacity": ...}}.
+        :param edges: Units of each edge {(source, target): units}.
+        :param positions: Position of each node {node: [x, y]}.
+        :param node_indexes: Last index of the process and resource names.
+        """
+        self.nodes = nodes
+        self.edges = edges
+        self.positions = positions
+        self.node_indexes = node_indexes
+
+    @classmethod
+    def from_content(cls, content: dict):
+        """Creates the state from a snapshot content, adding up repeated edges of old files."""
+        edges = {}
+        for edge in content["edges"]:
+            pair = (edge[0], edge[1])
+            edges[pair] = edges.get(pair, 0) + (edge[2] if len(edge) > 2 else 1)
+
+        nodes = {node: dict(attributes) for node, attributes in node_attributes(content).items()}
+        positions = {node: list(position) for node, position in content.get("node_positions", {}).items()}
+
+        return cls(nodes, edges, positions, dict(content.get("node_indexes", {})))
+
+    def to_content(self) -> dict:
+        """Converts the state to the snapshot content saved by the GUI, a copy that later deltas don't change."""
+        return {
+            "nodes": list(self.nodes),
+            "node_attributes": {node: dict(attributes) for node, attributes in self.nodes.items()},
+            "edges": [[source, target, units] for (source, target), units in self.edges.items()],
+            "node_positions": {node: list(position) for node, position in self.positions.items()},
+            "node_indexes": dict(self.node_indexes),
+        }
+
+    def to_graph(self) -> ResourceAllocationGraph:
+        """Builds the graph for the engine directly from the state."""
+        processes = [node for node, attributes in self.nodes.items() if attributes["kind"] == "process"]
+        resources = [node for node, attributes in self.nodes.items() if attributes["kind"] == "resource"]
+        availability = {resource: self.nodes[resource]["capacity"] for resource in resources}
+
+        return ResourceAllocationGraph(processes, resources, availability, [(source, target, units) for (source, target), units in self.edges.items()])
+
+    def copy(self):
+        return GraphState({node: dict(attributes) for node, attributes in self.nodes.items()}, dict(self.edges),
+                          {node: list(position) for node, position in self.positions.items()}, dict(self.node_indexes))
+
+    @property
+    def size(self) -> int:
+        return len(self.nodes) + len(self.edges)
+
+    def diff(self, target) -> dict:
+        """
+        Computes the changes from this state to another one. A node whose kind changed is removed and added again.
+
+        :param target: GraphState after the changes.
+        :return: Delta dictionary, only with the keys that changed (see apply).
+        """
+        removed_nodes = [node for node, attributes in self.nodes.items()
+                         if node not in target.nodes or target.nodes[node]["kind"] != attributes["kind"]]
+        removed = set(removed_nodes)
+        added_nodes = {node: attributes for node, attributes in target.nodes.items() if node not in self.nodes or node in removed}
+        capacities = {node: attributes["capacity"] for node, attributes in target.nodes.items()
+                      if node in self.nodes and node not in removed and attributes.get("capacity") != self.nodes[node].get("capacity")}
+
+        # Edges of removed nodes go away with them, so the ones that remain are added again
+        removed_edges = [list(pair) for pair in self.edges if pair not in target.edges or pair[0] in removed or pair[1] in removed]
+        edges = [[source, target_node, units] for (source, target_node), units in target.edges.items()
+                 if self.edges.get((source, target_node)) != units or source in removed or target_node in removed]
+        positions = {node: position for node, position in target.positions.items() if self.positions.get(node) != position}
+
+        delta = {"removed_edges": removed_edges, "removed_nodes": removed_nodes, "added_nodes": added_nodes,
+                 "capacities": capacities, "edges": edges, "positions": positions}
+        delta = {key: value for key, value in delta.items() if value}
+        if target.node_indexes != self.node_indexes:
+            delta["node_indexes"] = target.node_indexes
+
+        return delta
+
+    def apply(self, delta: dict) -> None:
+        """
+        Applies the changes of a delta.
+
+        :param delta: Dictionary with any of the keys "removed_edges" [[source, target]], "removed_nodes" [node],
+                      "added_nodes" {node: attributes}, "capacities" {resource: capacity},
+                      "edges" [[source, target, units]] (added or with new units), "positions" {node: [x, y]}
+                      and "node_indexes".
+        """
+        for source, target in delta.get("removed_edges", []):
+            del self.edges[(source, target)]
+        for node in delta.get("removed_nodes", []):
+            del self.nodes[node]
+            self.positions.pop(node, None)
+
+        self.nodes.update(delta.get("added_nodes", {}))
+        for resource, capacity in delta.get("capacities", {}).items():
+            self.nodes[resource]["capacity"] = capacity
+        for source, target, units in delta.get("edges", []):
+            self.edges[(source, target)] = units
+
+        self.positions.update(delta.get("positions", {}))
+        self.node_indexes.update(delta.get("node_indexes", {}))
+
+
+def delta_size(delta: dict) -> int:
+    """Number of changes of a delta."""
+    return sum(len(value) for key, value in delta.items() if key != "node_indexes")
+
+
+class DeltaWriter:
+    def __init__(self, path: str, keyframe_interval: int = 100):
+        """
+        Appends samples to a delta log. Each sample is written as the changes since the previous one, and a
+        full keyframe is written every keyframe_interval samples (or when the delta would be larger than half
+        the graph), so reading a sample never replays more than keyframe_interval - 1 deltas.
+        Writing to an existing log continues its chain.
+
+        :param path: Delta log path.
+        :param keyframe_interval: Samples between two keyframes.
+        """
+        self.path = path
+        self.keyframe_interval = keyframe_interval
+        self.state = None
+        self.since_keyframe = 0
+
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            self.state, self.since_keyframe = replay_delta_log(path)
+
+    def write(self, content: dict) -> str:
+        """
+        Appends a sample.
+
+        :param content: Snapshot content, as saved by the GUI.
+        :return: "keyframe" or "delta".
+        """
+        state = GraphState.from_content(content)
+        delta = self.state.diff(state) if self.state is not None else None
+
+        if delta is None or self.since_keyframe + 1 >= self.keyframe_interval or delta_size(delta) > state.size // 2:
+            line = {"type": "keyframe", "content": state.to_content()}
+            self.since_keyframe = 0
+        else:
+            line = {"type": "delta", **delta}
+            self.since_keyframe += 1
+
+        with open(self.path, 'a') as file:
+            file.write(json.dumps(line) + "\n")
+
+        self.state = state
+        return line["type"]
+
+
+def is_keyframe_line(line: bytes) -> bool:
+    """
+    Checks if a line of a delta log is a keyframe. Lines written by DeltaWriter are recognized by their prefix,
+    other lines are only parsed when they mention a keyframe (e.g. edited by hand, with other key order or spacing).
+
+    :param line: Line of the log.
+    :return: True if the line is a keyframe.
+    """
+    line = line.lstrip()
+    if line.startswith(KEYFRAME_PREFIX):
+        return True
+    if b'"keyframe"' not in line:
+        return False
+
+    try:
+        sample = json.loads(line)
+    except ValueError:
+        return False
+    return isinstance(sample, dict) and sample.get("type") == "keyframe"
+
+def is_delta_log(path: str) -> bool:
+    """Checks if a file starts with a keyframe line."""
+    with open(path, 'rb') as file:
+        # Binary snapshots don't start with a JSON object, their first "line" isn't read
+        if not file.read(64).lstrip().startswith(b'{'):
+            return False
+        file.seek(0)
+        return is_keyframe_line(file.readline())
+
+def replay_delta_log(path: str, index: int = None) -> tuple[GraphState, int]:
+    """
+    Rebuilds a sample of a delta log. The log is scanned once, keeping only the byte offset of the last
+    keyframe before the sample, then only that keyframe and the deltas after it are read and parsed,
+    so the memory used doesn't grow with the length of the log.
+
+    :param path: Delta log path.
+    :param index: Index of the sample, starting at 0 (defaults to the last one).
+    :return: (state of the sample, number of deltas applied after the keyframe).
+    """
+    with open(path, 'rb') as file:
+        keyframe_offset = keyframe_sample = None
+        samples = 0
+        offset = 0
+        for line in file:
+            if line.strip():
+                if index is not None and samples > index:
+                    break
+                if is_keyframe_line(line):
+                    keyframe_offset, keyframe_sample = offset, samples
+                samples += 1
+            offset += len(line)
+
+        if index is None:
+            index = samples - 1
+        if not 0 <= index < samples:
+            raise IndexError(f"Sample {index} is not in {path} ({samples} samples)")
+        if keyframe_offset is None:
+            raise ValueError(f"{path} has no keyframe before sample {index}")
+
+        file.seek(keyframe_offset)
+        state = None
+        sample = keyframe_sample
+        for line in file:
+            if not line.strip():
+                continue
+
+            if state is None:
+                state = GraphState.from_content(json.loads(line)["content"])
+            else:
+                state.apply(json.loads(line))
+            if sample == index:
+                break
+            sample += 1
+
+    return state, index - keyframe_sample
+
+@timed("snapshot_load")
+def read_delta_log(path: str, index: int = None) -> GraphState:
+    """
+    Reads a sample of a delta log.
+
+    :param path: Delta log path.
+    :param index: Index of the sample, starting at 0 (defaults to the last one).
+    :return: GraphState of the sample (see GraphState.to_graph and GraphState.to_content).
+    """
+    return replay_delta_log(path, index)[0]
+
+def iter_delta_log(path: str):
+    """
+    Reads every sample of a delta log in order, applying each delta to the previous state.
+    The same GraphState is updated and yielded for every sample, copy it to keep a sample.
+
+    :param path: Delta log path.
+    :return: Generator of GraphState.
+    """
+    state = None
+    with open(path, 'r') as file:
+        for line in file:
+            if not line.strip():
+                continue
+
+            sample = json.loads(line)
+            if sample["type"] == "keyframe":
+                state = GraphState.from_content(sample["content"])
+            else:
+                state.apply(sample)
+            yield state
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Appends snapshots to a delta log and extracts samples from it.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    append = subparsers.add_parser("append", help="Appends snapshots (JSON or .rag) as samples")
+    append.add_argument("log")
+    append.add_argument("snapshots", nargs="+")
+    append.add_argument("--keyframe-interval", type=int, default=100)
+
+    extract = subparsers.add_parser("extract", help="Saves a sample as a JSON snapshot")
+    extract.add_argument("log")
+    extract.add_argument("target")
+    extract.add_argument("--index", type=int, help="Sample index (default: the last one)")
+    args = parser.parse_args()
+
+    if args.command == "append":
+        writer = DeltaWriter(args.log, args.keyframe_interval)
+        for snapshot in args.snapshots:
+            print(snapshot, writer.write(read_snapshot_content(snapshot)))
+    else:
+        write_json_snapshot(args.target, read_delta_log(args.log, args.index).to_content())
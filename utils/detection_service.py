@@ -0,0 +1,449 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from utils.deadlock_resolver import reduce_allocation_graph
+from utils.event_stream import EVENT_TYPES, apply_event
+from utils.graph_snapshot import content_to_graph
+from utils.online_detector import OnlineDeadlockDetector
+
+# Requests and responses are JSON lines:
+#   {"id": 1, "snapshot": {...}}                     snapshot content as saved by the GUI (see graph.txt)
+#   {"id": 2, "session": "s1", "events": [{...}]}    events of utils.event_stream applied to a live graph
+#   {"id": 3, "session": "s1", "close": true}        drops a session
+#   {"id": 4, "stats": true}                         counters and latency percentiles of the service
+# Every response carries the id of its request, and responses can arrive out of order.
+LATENCY_SAMPLES = 10000
+
+PROCESS_EVENTS = ("request", "grant", "acquire", "release", "add_process", "remove_process", "exit")
+RESOURCE_EVENTS = ("request", "grant", "acquire", "release", "add_resource", "remove_resource")
+
+
+def reduce_snapshots(contents: list[dict], resolve: bool = False) -> list[dict]:
+    """
+    Reduces a batch of snapshots in one worker call, so the cost of sending a task to the pool is paid once
+    per batch. Each snapshot is still reduced as its own graph: reducing the disjoint union of the batch in a
+    single pass gives the same verdicts, but measured slower than reducing the graphs one by one.
+
+    :param contents: Snapshot contents.
+    :param resolve: If True, the victims that resolve each deadlock are also chosen.
+    :return: Verdict dictionary of each snapshot, or a dictionary with the error of an invalid one.
+    """
+    verdicts = []
+    for content in contents:
+        try:
+            result = reduce_allocation_graph(content_to_graph(content), resolve)
+        except (KeyError, TypeError, IndexError, ValueError, AttributeError) as error:
+            verdicts.append({"error": f"Invalid snapshot: {error!r}"})
+            continue
+
+        verdict = {"deadlocked": result.deadlocked, "deadlocked_processes": result.deadlocked_processes}
+        if resolve:
+            verdict["victims"] = result.removed_processes
+        verdicts.append(verdict)
+
+    return verdicts
+
+def check_event(event) -> str:
+    """
+    Checks the fields of an event before it is applied.
+
+    :param event: Event dictionary (see utils.event_stream).
+    :return: Description of the problem, or None if the event is well formed.
+    """
+    if not isinstance(event, dict):
+        return "the event is not an object"
+
+    event_type = event.get("event")
+    if event_type not in EVENT_TYPES:
+        return f"unknown event type {event_type!r}"
+    if event_type in PROCESS_EVENTS and not isinstance(event.get("process"), str):
+        return f"{event_type} needs a process name"
+    if event_type in RESOURCE_EVENTS and not isinstance(event.get("resource"), str):
+        return f"{event_type} needs a resource name"
+    for key in ("quantity", "capacity"):
+        if key in event and not (isinstance(event[key], int) and event[key] > 0):
+            return f"{key} must be a positive integer"
+
+    return None
+
+def apply_session_events(detector: OnlineDeadlockDetector, events: list[dict]) -> dict:
+    """
+    Applies events to the live graph of a session. Every event is checked before any is applied, so a
+    malformed batch leaves the graph untouched. An event that is well formed but inconsistent with the
+    graph (e.g. releasing units that are not held) can only fail while applying it: the response then
+    says how many events were applied and the session must be dropped, since its graph is half updated.
+
+    :param detector: OnlineDeadlockDetector of the session.
+    :param events: Event dictionaries (see utils.event_stream).
+    :return: Verdict dictionary, or {"error", "applied"[, "session_dropped"]}.
+    """
+    for index, event in enumerate(events):
+        problem = check_event(event)
+        if problem is not None:
+            return {"error": f"Invalid event {index}: {problem}", "applied": 0}
+
+    for index, event in enumerate(events):
+        try:
+            apply_event(detector, event)
+        except (KeyError, ValueError, TypeError) as error:
+            return {"error": f"Event {index} failed: {error!r}", "applied": index, "session_dropped": True}
+
+    return {"deadlocked": bool(detector.deadlocked), "deadlocked_processes": detector.deadlocked_processes}
+
+def percentile(values, fraction: float) -> float:
+    """Nearest-rank percentile of a list of values (0 when empty)."""
+    if not values:
+        return 0.0
+
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class DetectionService:
+    def __init__(self, workers: int = None, max_batch: int = 64, max_delay: float = 0.002, max_pending: int = 1024,
+                 resolve: bool = False, executor: str = "process"):
+        """
+        Deadlock detection server. Snapshots that arrive close together are reduced in a single call to a worker
+        pool (see reduce_snapshots), so the event loop only parses requests and writes responses.
+        A batch starts when a worker is free and takes the snapshots queued until then (up to max_batch, waiting
+        at most max_delay for more), so batches grow when the workers are busy. At most max_pending requests
+        are accepted and not answered yet; past that the connections are no longer read, and the clients
+        are slowed down by the socket buffers.
+
+        Sessions keep a live graph updated by events (see utils.event_stream) on a thread pool of the same size
+        as the workers: different sessions are updated concurrently, and the lock of each session keeps its
+        events in order.
+
+        :param workers: Number of worker processes (defaults to the number of CPUs).
+        :param max_batch: Maximum number of snapshots reduced together.
+        :param max_delay: Seconds a batch waits for more snapshots.
+        :param max_pending: Maximum number of requests accepted and not answered yet.
+        :param resolve: If True, the victims that resolve each deadlock are also chosen.
+        :param executor: "process" or "thread" for the worker pool.
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+        self.resolve = resolve
+        self.executor = executor
+
+        self.pool = None
+        self.session_pool = None
+        self.queue = None
+        self.pending_slots = None
+        self.batch_slots = None
+        self.batcher = None
+        self.batch_tasks = set()
+        self.sessions = {}
+        self.session_locks = {}
+
+        self.requests = 0
+        self.errors = 0
+        self.batches = 0
+        self.batched_snapshots = 0
+        self.pending = 0
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8765, path: str = None) -> asyncio.AbstractServer:
+        """
+        Starts the worker pool, the batcher and the server.
+
+        :param host: TCP host, only local addresses are meant to be used.
+        :param port: TCP port.
+        :param path: Unix socket path, used instead of TCP when given.
+        :return: asyncio server.
+        """
+        pool_class = ProcessPoolExecutor if self.executor == "process" else ThreadPoolExecutor
+        self.pool = pool_class(max_workers=self.workers)
+        self.session_pool = ThreadPoolExecutor(max_workers=self.workers)
+        self.queue = asyncio.Queue()
+        self.pending_slots = asyncio.Semaphore(self.max_pending)
+        self.batch_slots = asyncio.Semaphore(self.workers)
+        self.batcher = asyncio.create_task(self.run_batcher())
+
+        # Snapshots can be large, the default limit of a line is 64 KiB
+        limit = 2 ** 30
+        if path is not None:
+            if os.path.exists(path):
+                os.remove(path)
+            return await asyncio.start_unix_server(self.handle_connection, path=path, limit=limit)
+        return await asyncio.start_server(self.handle_connection, host, port, limit=limit)
+
+    def close(self) -> None:
+        """Stops the batcher, the batches in flight and the worker pools. Safe to call if start failed or never ran."""
+        if self.batcher is not None:
+            self.batcher.cancel()
+        for task in list(self.batch_tasks):
+            task.cancel()
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+        if self.session_pool is not None:
+            self.session_pool.shutdown(cancel_futures=True)
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Reads the requests of a connection and answers each one as soon as it is done."""
+        write_lock = asyncio.Lock()
+        tasks = set()
+
+        try:
+            while line := await reader.readline():
+                # Backpressure: the connection isn't read while too many requests are pending
+                await self.pending_slots.acquire()
+                self.pending += 1
+                task = asyncio.create_task(self.answer(line, time.perf_counter(), writer, write_lock))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+            await asyncio.gather(*tasks)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def answer(self, line: bytes, received: float, writer: asyncio.StreamWriter, write_lock: asyncio.Lock) -> None:
+        """Serves a request and writes the response."""
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get("id")
+            response = await self.serve(request)
+            # Invalid snapshots and events are answered with an error instead of raising
+            if "error" in response:
+                self.errors += 1
+        except Exception as error:
+            self.errors += 1
+            response = {"error": f"{type(error).__name__}: {error}"}
+        finally:
+            self.pending -= 1
+            self.pending_slots.release()
+
+        self.requests += 1
+        self.latencies.append(time.perf_counter() - received)
+        try:
+            async with write_lock:
+                writer.write(json.dumps({"id": request_id, **response}).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+
+    async def serve(self, request: dict) -> dict:
+        """
+        Serves a parsed request.
+
+        :param request: Request dictionary.
+        :return: Response dictionary (without the id).
+        """
+        if "snapshot" in request:
+            future = asyncio.get_running_loop().create_future()
+            self.queue.put_nowait((request["snapshot"], future))
+            return await future
+
+        if "session" in request:
+            session = request["session"]
+            if request.get("close"):
+                self.sessions.pop(session, None)
+                self.session_locks.pop(session, None)
+                return {"closed": session}
+
+            detector = self.sessions.setdefault(session, OnlineDeadlockDetector())
+            lock = self.session_locks.setdefault(session, asyncio.Lock())
+            async with lock:
+                response = await asyncio.get_running_loop().run_in_executor(self.session_pool, apply_session_events, detector, request.get("events", []))
+            if response.get("session_dropped") and self.sessions.get(session) is detector:
+                del self.sessions[session], self.session_locks[session]
+            return response
+
+        if request.get("stats"):
+            return {"stats": self.stats()}
+
+        raise ValueError("The request needs a snapshot, a session or stats")
+
+    async def run_batcher(self) -> None:
+        """Groups the queued snapshots into batches, one batch per free worker."""
+        loop = asyncio.get_running_loop()
+        while True:
+            await self.batch_slots.acquire()
+            batch = [await self.queue.get()]
+
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch:
+                if not self.queue.empty():
+                    batch.append(self.queue.get_nowait())
+                    continue
+
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            # The event loop only keeps weak references to tasks, a batch in flight must not be collected
+            task = asyncio.create_task(self.run_batch(batch))
+            self.batch_tasks.add(task)
+            task.add_done_callback(self.batch_tasks.discard)
+
+    async def run_batch(self, batch: list[tuple[dict, asyncio.Future]]) -> None:
+        """Reduces a batch on the worker pool and resolves the future of each snapshot."""
+        self.batches += 1
+        self.batched_snapshots += len(batch)
+        try:
+            verdicts = await asyncio.get_running_loop().run_in_executor(self.pool, reduce_snapshots, [content for content, _ in batch], self.resolve)
+            for (_, future), verdict in zip(batch, verdicts):
+                if not future.done():
+                    future.set_result(verdict)
+        except Exception as error:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+        finally:
+            # Cancelled on close: the requests waiting on the batch are cancelled too
+            for _, future in batch:
+                future.cancel()
+            self.batch_slots.release()
+
+    def stats(self) -> dict:
+        latencies = list(self.latencies)
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "pending": self.pending,
+            "batches": self.batches,
+            "mean_batch_size": round(self.batched_snapshots / self.batches, 2) if self.batches else 0.0,
+            "sessions": len(self.sessions),
+            "p50_ms": round(percentile(latencies, 0.5) * 1000, 3),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        }
+
+
+async def serve_forever(service: DetectionService, host: str, port: int, path: str = None) -> None:
+    try:
+        server = await service.start(host, port, path)
+        print(f"Listening on {path or f'{host}:{port}'} with {service.workers} {service.executor} worker(s)", flush=True)
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+async def open_connection(host: str, port: int, path: str = None):
+    if path is not None:
+        return await asyncio.open_unix_connection(path, limit=2 ** 30)
+    return await asyncio.open_connection(host, port, limit=2 ** 30)
+
+async def generate_load(host: str = "127.0.0.1", port: int = 8765, path: str = None, connections: int = 8, requests: int = 1000,
+                        in_flight: int = 8, shape: str = "dense", size: int = 100, seed: int = 0) -> dict:
+    """
+    Load generator: sends synthetic snapshots over several connections, each one keeping in_flight requests
+    outstanding, and measures the latency of every response.
+
+    :param host: Server host.
+    :param port: Server port.
+    :param path: Unix socket path, used instead of TCP when given.
+    :param connections: Number of connections.
+    :param requests: Total number of requests.
+    :param in_flight: Requests outstanding per connection.
+    :param shape: Graph shape (see utils.graph_generators).
+    :param size: Number of processes of each snapshot.
+    :param seed: Random seed of the first snapshot.
+    :return: Dictionary with the throughput, the latency percentiles and the statistics of the server.
+    """
+    from utils.graph_generators import generate_graph
+    from utils.graph_snapshot import graph_to_content
+    from utils.resource_allocation_graph_builder import ResourceAllocationGraph
+
+    # A few distinct snapshots are encoded up front, so the client spends its time on the sockets
+    lines = []
+    for index in range(16):
+        rag = ResourceAllocationGraph.from_lists(*generate_graph(shape, size, seed + index))
+        lines.append(json.dumps({"snapshot": graph_to_content(rag)})[1:])
+
+    latencies = []
+    errors = 0
+
+    async def client(count: int, offset: int):
+        nonlocal errors
+        reader, writer = await open_connection(host, port, path)
+        sent = {}
+        window = asyncio.Semaphore(in_flight)
+
+        async def receive():
+            nonlocal errors
+            for _ in range(count):
+                response = json.loads(await reader.readline())
+                latencies.append(time.perf_counter() - sent.pop(response["id"]))
+                errors += "error" in response
+                window.release()
+
+        receiver = asyncio.create_task(receive())
+        for index in range(count):
+            await window.acquire()
+            request_id = offset + index
+            sent[request_id] = time.perf_counter()
+            writer.write(f'{{"id": {request_id}, {lines[request_id % len(lines)]}\n'.encode())
+            await writer.drain()
+
+        await receiver
+        writer.close()
+
+    start = time.perf_counter()
+    share = [requests // connections + (index < requests % connections) for index in range(connections)]
+    await asyncio.gather(*(client(count, sum(share[:index])) for index, count in enumerate(share) if count))
+    seconds = time.perf_counter() - start
+
+    reader, writer = await open_connection(host, port, path)
+    writer.write(b'{"id": "stats", "stats": true}\n')
+    server_stats = json.loads(await reader.readline())["stats"]
+    writer.close()
+
+    return {
+        "requests": requests,
+        "errors": errors,
+        "seconds": round(seconds, 6),
+        "requests_per_second": round(requests / seconds, 1),
+        "p50_ms": round(percentile(latencies, 0.5) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "server": server_stats,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local deadlock detection service and its load generator.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for name, help_text in (("serve", "Runs the service"), ("load", "Sends synthetic snapshots to a running service")):
+        subparser = subparsers.add_parser(name, help=help_text)
+        subparser.add_argument("--host", default="127.0.0.1")
+        subparser.add_argument("--port", type=int, default=8765)
+        subparser.add_argument("--unix", metavar="PATH", help="Unix socket path, used instead of TCP")
+
+    serve = subparsers.choices["serve"]
+    serve.add_argument("--workers", type=int, help="Worker processes (default: number of CPUs)")
+    serve.add_argument("--executor", default="process", choices=["process", "thread"])
+    serve.add_argument("--max-batch", type=int, default=64)
+    serve.add_argument("--max-delay", type=float, default=0.002, help="Seconds a batch waits for more snapshots")
+    serve.add_argument("--max-pending", type=int, default=1024, help="Requests accepted and not answered yet")
+    serve.add_argument("--resolve", action="store_true", help="Also chooses the victims that resolve each deadlock")
+
+    load = subparsers.choices["load"]
+    load.add_argument("--connections", type=int, default=8)
+    load.add_argument("--requests", type=int, default=1000)
+    load.add_argument("--in-flight", type=int, default=8, help="Requests outstanding per connection")
+    load.add_argument("--shape", default="dense")
+    load.add_argument("--size", type=int, default=100, help="Processes of each snapshot")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        service = DetectionService(args.workers, args.max_batch, args.max_delay, args.max_pending, args.resolve, args.executor)
+        try:
+            asyncio.run(serve_forever(service, args.host, args.port, args.unix))
+        except KeyboardInterrupt:
+            pass
+    else:
+        print(json.dumps(asyncio.run(generate_load(args.host, args.port, args.unix, args.connections, args.requests,
+                                                   args.in_flight, args.shape, args.size))))
@@ -0,0 +1,228 @@
+import argparse
+import csv
+import json
+import logging
+import sys
+import time
+
+from utils.online_detector import OnlineDeadlockDetector
+from utils.resource_allocation_graph_builder import parse_resource_capacity
+
+logger = logging.getLogger(__name__)
+
+EVENT_TYPES = ("request", "grant", "acquire", "release", "add_process", "remove_process", "exit", "add_resource", "remove_resource")
+
+
+def read_jsonl_events(file):
+    """
+    Reads events from a JSON lines stream, one event per line:
+    {"event": "request", "process": "P1", "resource": "R1 (2)", "quantity": 1}
+
+    :param file: Text file object.
+    :return: Generator of event dictionaries.
+    """
+    for line in file:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+def read_csv_events(file):
+    """
+    Reads events from a CSV stream with the header event,process,resource,quantity[,capacity].
+
+    :param file: Text file object.
+    :return: Generator of event dictionaries.
+    """
+    for row in csv.DictReader(file):
+        event = {key: value for key, value in row.items() if value not in (None, "")}
+        for key in ("quantity", "capacity"):
+            if key in event:
+                event[key] = int(event[key])
+        yield event
+
+def read_events(path: str):
+    """
+    Reads events from a .jsonl or .csv file ("-" reads JSON lines from the standard input).
+
+    :param path: File path.
+    :return: Generator of event dictionaries.
+    """
+    if path == "-":
+        yield from read_jsonl_events(sys.stdin)
+        return
+
+    with open(path, 'r', newline='') as file:
+        yield from read_csv_events(file) if path.endswith('.csv') else read_jsonl_events(file)
+
+def apply_event(detector: OnlineDeadlockDetector, event: dict) -> None:
+    """
+    Applies an event to the live graph. Processes and resources are added the first time they appear;
+    the capacity of a new resource comes from the "capacity" field or from its name (e.g. "R1 (2)").
+
+    :param detector: OnlineDeadlockDetector holding the live graph.
+    :param event: Event dictionary.
+    """
+    event_type = event["event"]
+    process = event.get("process")
+    resource = event.get("resource")
+    quantity = event.get("quantity", 1)
+
+    if event_type not in EVENT_TYPES:
+        raise ValueError(f"Unknown event type: {event_type}")
+
+    if resource is not None and resource not in detector.capacity and event_type != "remove_resource":
+        detector.add_resource(resource, event.get("capacity", parse_resource_capacity(resource)))
+        if event_type == "add_resource":
+            return
+    if process is not None and process not in detector.allocations and event_type not in ("remove_process", "exit"):
+        detector.add_process(process)
+        if event_type == "add_process":
+            return
+
+    if event_type == "request":
+        detector.request(process, resource, quantity)
+    elif event_type in ("grant", "acquire"):
+        detector.grant(process, resource, quantity)
+    elif event_type == "release":
+        detector.release(process, resource, quantity)
+    elif event_type in ("remove_process", "exit"):
+        if process in detector.allocations:
+            detector.remove_process(process)
+    elif event_type == "remove_resource":
+        detector.remove_resource(resource)
+
+
+class DeadlockReport:
+    def __init__(self, offset: int, processes: list[str]):
+        """
+        Deadlock found while reading a stream.
+
+        :param offset: Index of the event (starting at 0) after which the deadlock was detected.
+        :param processes: Processes that became deadlocked.
+        """
+        self.offset = offset
+        self.processes = processes
+
+    def to_dict(self) -> dict:
+        return {"offset": self.offset, "deadlocked": self.processes}
+
+
+class EventStreamAnalyzer:
+    def __init__(self, every_events: int = None, every_seconds: float = None, on_request: bool = False):
+        """
+        Runs deadlock detection over an event stream, keeping only the live graph in memory.
+        With on_request the verdict is updated incrementally on every event, so a deadlock is reported
+        at the exact request that created it. Otherwise events only update the graph and a full
+        reduction runs every N events and/or every T seconds.
+
+        :param every_events: Runs the detection every N events.
+        :param every_seconds: Runs the detection every T seconds.
+        :param on_request: Detects on each request (and grant) edge.
+        """
+        if not (every_events or every_seconds or on_request):
+            raise ValueError("Choose at least one detection trigger")
+
+        self.every_events = every_events
+        self.every_seconds = every_seconds
+        self.on_request = on_request
+        self.detector = OnlineDeadlockDetector(incremental=on_request)
+
+        self.events = 0
+        self.detections = 0
+        self.errors = 0
+        self.elapsed = 0.0
+
+    @property
+    def events_per_second(self) -> float:
+        return self.events / self.elapsed if self.elapsed else 0.0
+
+    def run(self, events):
+        """
+        Consumes the events and yields a DeadlockReport whenever new processes become deadlocked.
+        A final detection runs at the end of the stream. Events inconsistent with the live graph
+        (e.g. releasing units that aren't held) are logged and skipped.
+
+        :param events: Iterable of event dictionaries.
+        :return: Generator of DeadlockReport.
+        """
+        detector = self.detector
+        reported = set()
+        start = time.perf_counter()
+        next_time = start + self.every_seconds if self.every_seconds else None
+        offset = -1
+
+        for offset, event in enumerate(events):
+            self.events += 1
+            try:
+                apply_event(detector, event)
+            except (KeyError, TypeError, ValueError) as error:
+                self.errors += 1
+                logger.warning("Skipping event %d %s: %s", offset, event, error)
+                continue
+
+            # Deadlocked processes that left the graph can deadlock again under the same name
+            if event["event"] in ("remove_process", "exit"):
+                reported.discard(event.get("process"))
+
+            if self.on_request:
+                # Processes freed by a release can deadlock again, they are reported again when they do
+                reported &= detector.deadlocked
+                detect = event["event"] in ("request", "grant", "acquire") and bool(detector.deadlocked - reported)
+            else:
+                detect = bool(self.every_events and self.events % self.every_events == 0)
+                if next_time is not None and time.perf_counter() >= next_time:
+                    detect = True
+                    next_time = time.perf_counter() + self.every_seconds
+
+            if detect:
+                report = self.detect(offset, reported)
+                if report:
+                    yield report
+
+        report = self.detect(offset, reported)
+        if report:
+            yield report
+
+        self.elapsed = time.perf_counter() - start
+
+    def detect(self, offset: int, reported: set[str]) -> DeadlockReport:
+        """
+        Runs the detection and returns a report with the processes not reported yet, if any.
+
+        :param offset: Index of the current event.
+        :param reported: Processes already reported, updated in place.
+        :return: DeadlockReport or None.
+        """
+        self.detections += 1
+        deadlocked = self.detector.deadlocked if self.on_request else self.detector.detect()
+        reported &= deadlocked
+
+        new_processes = [process for process in self.detector.deadlocked_processes if process not in reported]
+        if not new_processes:
+            return None
+
+        reported.update(new_processes)
+        return DeadlockReport(offset, new_processes)
+
+    def summary(self) -> dict:
+        return {"events": self.events, "errors": self.errors, "detections": self.detections, "seconds": round(self.elapsed, 6),
+                "events_per_second": round(self.events_per_second, 1)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Streams a JSONL/CSV event log and reports deadlocks as they appear.")
+    parser.add_argument("path", help="Event log (.jsonl or .csv, '-' for JSON lines on stdin)")
+    parser.add_argument("--every-events", type=int, help="Runs the detection every N events (default: 10000 if no trigger is given)")
+    parser.add_argument("--every-seconds", type=float, help="Runs the detection every T seconds")
+    parser.add_argument("--on-request", action="store_true", help="Detects on each request edge")
+    args = parser.parse_args()
+    logging.basicConfig(format="%(message)s")
+
+    if not (args.every_events or args.every_seconds or args.on_request):
+        args.every_events = 10000
+
+    analyzer = EventStreamAnalyzer(args.every_events, args.every_seconds, args.on_request)
+    for report in analyzer.run(read_events(args.path)):
+        print(json.dumps(report.to_dict()), flush=True)
+
+    print(json.dumps(analyzer.summary()), file=sys.stderr)
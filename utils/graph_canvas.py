@@ -0,0 +1,389 @@
+import math
+
+import numpy as np
+from matplotlib.collections import LineCollection
+from matplotlib.lines import Line2D
+from matplotlib.patches import FancyArrowPatch
+from matplotlib.text import Text
+
+from utils.spatial_index import SpatialGrid
+
+NODE_SIZE = 500
+NODE_COLOR = 'skyblue'
+EDGE_RADIUS = 0.2
+EDGE_LABEL_POSITION = 0.15
+MAX_EDGE_WIDTH = 4.0
+
+# Below this zoom (pixels per data unit) the graph is drawn as an overview: two point collections and one
+# line collection, without labels, counts or arrow heads
+LABEL_MIN_SCALE = 25
+OVERVIEW_NODE_SIZE = 40
+# Distance around the view where artists are still drawn, so nodes on the border are not cut
+VIEW_MARGIN = 0.5
+
+
+def edge_width(count: int) -> float:
+    """Line width of an edge with count units."""
+    return min(MAX_EDGE_WIDTH, 1 + 0.5 * (count - 1))
+
+
+class GraphCanvas:
+    def __init__(self, fig, ax):
+        """
+        Retained-mode drawing of a Resource Allocation Graph. Each node keeps a marker and a label and each
+        pair of connected nodes keeps one arrow and one label with its number of units (the arrow gets wider
+        with the units), so a change only updates the artists it touches. Highlights are drawn with
+        blitting when the backend supports it.
+
+        Node positions are kept in a SpatialGrid, used for picking and to find what is inside the view.
+        Artists are only created for nodes and edges inside the view, and hidden when they leave it.
+        When zoomed out the graph is drawn as an overview, which costs a few collections whatever its size.
+
+        :param fig: Matplotlib figure.
+        :param ax: Matplotlib axes where the graph is drawn.
+        """
+        self.fig = fig
+        self.ax = ax
+        self.ax.set_autoscale_on(False)
+
+        self.grid = SpatialGrid()
+        self.positions = self.grid.positions
+        self.colors = {}
+        self.node_artists = {}
+        self.edge_artists = {}
+        self.edge_counts = {}
+        self.incident_edges = {}
+        self.highlighted = {}
+        self.background = None
+
+        self.view = None
+        self.detailed = True
+        self.overview_stale = True
+        self.process_points = self.ax.scatter([], [], s=OVERVIEW_NODE_SIZE, marker='s', linewidths=0, zorder=2, visible=False)
+        self.resource_points = self.ax.scatter([], [], s=OVERVIEW_NODE_SIZE, marker='o', linewidths=0, zorder=2, visible=False)
+        self.overview_edges = LineCollection([], colors='k', alpha=0.4, zorder=1, visible=False)
+        self.ax.add_collection(self.overview_edges, autolim=False)
+
+        self.fig.canvas.mpl_connect('draw_event', self.on_draw)
+        self.fig.canvas.mpl_connect('resize_event', self.update_view)
+        self.ax.callbacks.connect('xlim_changed', self.update_view)
+        self.ax.callbacks.connect('ylim_changed', self.update_view)
+
+    def on_draw(self, event):
+        """Keeps a copy of the rendered axes to blit highlights on top of it."""
+        if self.fig.canvas.supports_blit:
+            self.background = self.fig.canvas.copy_from_bbox(self.ax.bbox)
+
+    def refresh(self, now: bool = False) -> None:
+        """
+        Redraws the canvas with the updated artists.
+
+        :param now: If True the canvas is drawn right away, otherwise when the event loop is idle.
+        """
+        if not self.detailed and self.overview_stale:
+            self.update_overview()
+
+        if now:
+            self.fig.canvas.draw()
+        else:
+            self.fig.canvas.draw_idle()
+
+    def clear(self) -> None:
+        """Removes every artist of the graph."""
+        for artists in list(self.node_artists.values()) + list(self.edge_artists.values()):
+            for artist in artists:
+                artist.remove()
+
+        self.grid.clear()
+        self.colors.clear()
+        self.node_artists.clear()
+        self.edge_artists.clear()
+        self.edge_counts.clear()
+        self.incident_edges.clear()
+        self.highlighted.clear()
+        self.overview_stale = True
+
+    def rebuild(self, graph, positions: dict, node_colors: dict) -> None:
+        """
+        Rebuilds the graph from scratch. Only needed on load or reset.
+
+        :param graph: NetworkX graph with the nodes and edges (with a units attribute, 1 by default).
+        :param positions: Position of each node.
+        :param node_colors: Color of each node (default skyblue).
+        """
+        self.clear()
+        for node in graph.nodes():
+            self.grid.insert(node, positions[node])
+            self.colors[node] = node_colors.get(node, NODE_COLOR)
+            self.incident_edges[node] = set()
+        for source, target, units in graph.edges(data='units', default=1):
+            edge = (source, target)
+            self.edge_counts[edge] = self.edge_counts.get(edge, 0) + units
+            self.incident_edges[edge[0]].add(edge)
+            self.incident_edges[edge[1]].add(edge)
+
+        self.update_view()
+        self.refresh()
+
+    def add_node(self, node: str, position: tuple, color: str = NODE_COLOR) -> None:
+        """
+        Adds a node. Processes are squares and resources are circles.
+
+        :param node: Node name.
+        :param position: (x, y) position.
+        :param color: Node color.
+        """
+        self.grid.insert(node, position)
+        self.colors[node] = color
+        self.incident_edges[node] = set()
+        self.show_node(node)
+        self.overview_stale = True
+
+    def remove_node(self, node: str) -> None:
+        """
+        Removes a node and all of its edges.
+
+        :param node: Node name.
+        """
+        self.remove_edges(node)
+
+        for artist in self.node_artists.pop(node, ()):
+            artist.remove()
+        self.grid.remove(node)
+        del self.colors[node], self.incident_edges[node]
+        self.highlighted.pop(node, None)
+        self.overview_stale = True
+
+    def move_node(self, node: str, position: tuple) -> None:
+        """
+        Moves a node, its label and the arrows of its edges.
+
+        :param node: Node name.
+        :param position: New (x, y) position.
+        """
+        self.grid.move(node, position)
+        if node in self.node_artists:
+            marker, label = self.node_artists[node]
+            marker.set_data([position[0]], [position[1]])
+            label.set_position(self.label_position(node, position))
+        self.show_node(node)
+
+        for edge in self.incident_edges[node]:
+            if edge in self.edge_artists:
+                self.place_edge(edge)
+            self.show_edge(edge)
+        self.overview_stale = True
+
+    def set_color(self, node: str, color: str) -> None:
+        """
+        Changes the color of a node.
+
+        :param node: Node name.
+        :param color: New color.
+        """
+        self.colors[node] = color
+        if node in self.node_artists:
+            self.node_artists[node][0].set_color(color)
+        self.overview_stale = True
+
+    def set_highlight(self, node: str, color: str, highlighted: bool = True) -> None:
+        """
+        Highlights a node, or removes its highlight, and blits it on the last rendered frame.
+
+        :param node: Node name.
+        :param color: Color of the node.
+        :param highlighted: False when the highlight is removed.
+        """
+        if highlighted:
+            self.highlighted[node] = color
+        else:
+            self.highlighted.pop(node, None)
+        self.set_color(node, color)
+
+        canvas = self.fig.canvas
+        if self.background is None or not canvas.supports_blit or not self.detailed:
+            self.refresh()
+            return
+
+        # The background has the nodes as they were in the last full draw, so every highlight is drawn again
+        canvas.restore_region(self.background)
+        for artist in [node] + list(self.highlighted):
+            if artist in self.node_artists:
+                for child in self.node_artists[artist]:
+                    self.ax.draw_artist(child)
+        canvas.blit(self.ax.bbox)
+
+    def add_edge(self, source: str, target: str, units: int = 1) -> None:
+        """
+        Adds units to an edge. The units of a pair share one arrow and its count label is updated.
+
+        :param source: Source node.
+        :param target: Target node.
+        :param units: Number of units.
+        """
+        edge = (source, target)
+        self.edge_counts[edge] = self.edge_counts.get(edge, 0) + units
+        self.incident_edges[source].add(edge)
+        self.incident_edges[target].add(edge)
+
+        if edge in self.edge_artists:
+            self.set_edge_count(edge)
+        self.show_edge(edge)
+        self.overview_stale = True
+
+    def remove_edge(self, source: str, target: str, count: int = 1) -> None:
+        """
+        Removes parallel edges, the arrow is removed with the last one.
+
+        :param source: Source node.
+        :param target: Target node.
+        :param count: Number of parallel edges to remove.
+        """
+        edge = (source, target)
+        self.edge_counts[edge] -= count
+        self.overview_stale = True
+        if self.edge_counts[edge] > 0:
+            if edge in self.edge_artists:
+                self.set_edge_count(edge)
+            return
+
+        for artist in self.edge_artists.pop(edge, ()):
+            artist.remove()
+        del self.edge_counts[edge]
+        self.incident_edges[source].discard(edge)
+        self.incident_edges[target].discard(edge)
+
+    def remove_edges(self, node: str) -> None:
+        """
+        Removes every edge of a node.
+
+        :param node: Node name.
+        """
+        for edge in list(self.incident_edges[node]):
+            self.remove_edge(*edge, count=self.edge_counts[edge])
+
+    def create_node_artists(self, node: str) -> None:
+        """Creates the marker and the label of a node."""
+        x, y = position = self.positions[node]
+        marker = Line2D([x], [y], marker='s' if node.startswith('P') else 'o', markersize=math.sqrt(NODE_SIZE),
+                        color=self.colors[node], markeredgewidth=0, linestyle='none', zorder=2)
+        label = Text(*self.label_position(node, position), node, fontsize=10, ha='center', va='center', zorder=3)
+        self.ax.add_artist(marker)
+        self.ax.add_artist(label)
+        self.node_artists[node] = (marker, label)
+
+    def create_edge_artists(self, edge: tuple) -> None:
+        """Creates the arrow and the count label of a pair of connected nodes."""
+        arrow = FancyArrowPatch(self.positions[edge[0]], self.positions[edge[1]], arrowstyle='->', mutation_scale=20,
+                                connectionstyle=f'arc3,rad={EDGE_RADIUS}', shrinkA=12, shrinkB=12, color='k', zorder=1)
+        label = Text(0, 0, '', fontsize=6, ha='center', va='center_baseline', zorder=1,
+                     bbox=dict(boxstyle='round', ec=(1.0, 1.0, 1.0), fc=(1.0, 1.0, 1.0)))
+        self.ax.add_artist(arrow)
+        self.ax.add_artist(label)
+        self.edge_artists[edge] = (arrow, label)
+        self.place_edge(edge)
+        self.set_edge_count(edge)
+
+    def set_edge_count(self, edge: tuple) -> None:
+        """Shows the number of parallel edges in the count label and in the width of the arrow."""
+        arrow, label = self.edge_artists[edge]
+        label.set_text(str(self.edge_counts[edge]))
+        arrow.set_linewidth(edge_width(self.edge_counts[edge]))
+
+    def show_node(self, node: str) -> None:
+        """Shows the artists of a node if it is inside the view and the view is detailed, creating them if needed."""
+        visible = self.detailed and self.in_view(self.positions[node])
+        if visible and node not in self.node_artists:
+            self.create_node_artists(node)
+        for artist in self.node_artists.get(node, ()):
+            artist.set_visible(visible)
+
+    def show_edge(self, edge: tuple) -> None:
+        """Shows the artists of an edge if it may cross the view and the view is detailed, creating them if needed."""
+        visible = self.detailed and self.edge_in_view(edge)
+        if visible and edge not in self.edge_artists:
+            self.create_edge_artists(edge)
+        for artist in self.edge_artists.get(edge, ()):
+            artist.set_visible(visible)
+
+    def update_view(self, *args) -> None:
+        """
+        Chooses between the detailed drawing and the overview, and shows only the artists inside the view.
+        Called when the limits or the size of the axes change.
+        """
+        (x_min, x_max), (y_min, y_max) = sorted(self.ax.get_xlim()), sorted(self.ax.get_ylim())
+        self.view = (x_min - VIEW_MARGIN, y_min - VIEW_MARGIN, x_max + VIEW_MARGIN, y_max + VIEW_MARGIN)
+        self.detailed = self.ax.bbox.width / max(x_max - x_min, 1e-9) >= LABEL_MIN_SCALE
+
+        for collection in (self.process_points, self.resource_points, self.overview_edges):
+            collection.set_visible(not self.detailed)
+        if not self.detailed:
+            self.update_overview()
+
+        # Artists that left the view are hidden, the ones inside it are shown (and created on the first time)
+        visible = set(self.grid.query(*self.view)) if self.detailed else set()
+        for node in set(self.node_artists) - visible:
+            for artist in self.node_artists[node]:
+                artist.set_visible(False)
+        for node in visible:
+            self.show_node(node)
+        for edge in self.edge_counts:
+            if edge in self.edge_artists or self.detailed:
+                self.show_edge(edge)
+
+    def update_overview(self) -> None:
+        """Fills the overview collections with every node and edge."""
+        for points, kind in ((self.process_points, 'P'), (self.resource_points, 'R')):
+            nodes = [node for node in self.positions if node.startswith(kind)]
+            points.set_offsets(np.array([self.positions[node] for node in nodes]).reshape(-1, 2))
+            points.set_facecolors([self.colors[node] for node in nodes])
+
+        edges = list(self.edge_counts)
+        self.overview_edges.set_segments([(self.positions[source], self.positions[target]) for source, target in edges])
+        self.overview_edges.set_linewidths([edge_width(self.edge_counts[edge]) for edge in edges])
+        self.overview_stale = False
+
+    def in_view(self, position: tuple) -> bool:
+        """Checks if a position is inside the view."""
+        if self.view is None:
+            return True
+        x_min, y_min, x_max, y_max = self.view
+        return x_min <= position[0] <= x_max and y_min <= position[1] <= y_max
+
+    def edge_in_view(self, edge: tuple) -> bool:
+        """Checks if the arc of an edge may cross the view, using the box of its endpoints grown by its bend."""
+        if self.view is None:
+            return True
+        (x1, y1), (x2, y2) = self.positions[edge[0]], self.positions[edge[1]]
+        bend = EDGE_RADIUS * max(abs(x2 - x1), abs(y2 - y1))
+        x_min, y_min, x_max, y_max = self.view
+        return (min(x1, x2) - bend <= x_max and max(x1, x2) + bend >= x_min and
+                min(y1, y2) - bend <= y_max and max(y1, y2) + bend >= y_min)
+
+    def node_at(self, x: float, y: float, radius: float = 0.5) -> str:
+        """
+        Finds the node under a point.
+
+        :param x: X coordinate.
+        :param y: Y coordinate.
+        :param radius: Maximum distance to the node.
+        :return: Closest node name within the radius, or None.
+        """
+        return self.grid.nearest(x, y, radius)
+
+    def place_edge(self, edge: tuple) -> None:
+        """Places the arrow of an edge and its count label, near the target along the arc."""
+        (x1, y1), (x2, y2) = self.positions[edge[0]], self.positions[edge[1]]
+        arrow, label = self.edge_artists[edge]
+        arrow.set_positions((x1, y1), (x2, y2))
+
+        # Point of the quadratic curve drawn by arc3 (control point shifted by rad, perpendicular to the edge)
+        cx, cy = (x1 + x2) / 2 + EDGE_RADIUS * (y2 - y1), (y1 + y2) / 2 - EDGE_RADIUS * (x2 - x1)
+        t = 1 - EDGE_LABEL_POSITION
+        label.set_position(((1 - t) ** 2 * x1 + 2 * (1 - t) * t * cx + t ** 2 * x2,
+                            (1 - t) ** 2 * y1 + 2 * (1 - t) * t * cy + t ** 2 * y2))
+
+    def label_position(self, node: str, position: tuple) -> tuple:
+        """Resource labels are drawn below the node, process labels on top of it."""
+        x, y = position
+        return (x, y - 0.45) if node.startswith('R') else (x, y)
@@ -0,0 +1,140 @@
+import random
+
+
+def shuffled(processes: dict[str, list[str]], rnd: random.Random) -> dict[str, list[str]]:
+    """Shuffles the order of the processes, so the reduction can't rely on a lucky order."""
+    names = list(processes)
+    rnd.shuffle(names)
+    return {process: processes[process] for process in names}
+
+def wait_chain(size: int, seed: int = 0) -> tuple[dict, dict, dict]:
+    """
+    Generates a long wait chain: P(i) holds R(i) and waits for R(i + 1), the last process waits for nothing.
+    There is no deadlock, but each process can only be reduced after the next one.
+
+    :param size: Number of processes.
+    :param seed: Random seed.
+    :return: (allocation, request, resource_capacity) lists.
+    """
+    rnd = random.Random(seed)
+    allocation = {f"P{i}": [f"R{i}"] for i in range(size)}
+    request = {f"P{i}": [f"R{i + 1}"] if i + 1 < size else [] for i in range(size)}
+    resource_capacity = {f"R{i}": 1 for i in range(size)}
+
+    return shuffled(allocation, rnd), request, resource_capacity
+
+def ring(size: int, seed: int = 0) -> tuple[dict, dict, dict]:
+    """
+    Generates a single big cycle: P(i) holds R(i) and waits for R((i + 1) % size). Every process is deadlocked.
+
+    :param size: Number of processes.
+    :param seed: Random seed.
+    :return: (allocation, request, resource_capacity) lists.
+    """
+    rnd = random.Random(seed)
+    allocation = {f"P{i}": [f"R{i}"] for i in range(size)}
+    request = {f"P{i}": [f"R{(i + 1) % size}"] for i in range(size)}
+    resource_capacity = {f"R{i}": 1 for i in range(size)}
+
+    return shuffled(allocation, rnd), request, resource_capacity
+
+def dense_graph(size: int, seed: int = 0, degree: int = 8) -> tuple[dict, dict, dict]:
+    """
+    Generates a dense many-to-many graph: each process gets degree random edges over size / 10 resources
+    with capacity 1 to 3. An edge is an allocation while the resource has free units, otherwise a request.
+
+    :param size: Number of processes.
+    :param seed: Random seed.
+    :param degree: Number of edges of each process.
+    :return: (allocation, request, resource_capacity) lists.
+    """
+    rnd = random.Random(seed)
+    resource_capacity = {f"R{i}": rnd.randint(1, 3) for i in range(max(1, size // 10))}
+    resources = list(resource_capacity)
+    available = dict(resource_capacity)
+    allocation = {f"P{i}": [] for i in range(size)}
+    request = {f"P{i}": [] for i in range(size)}
+
+    for process in allocation:
+        for _ in range(degree):
+            resource = rnd.choice(resources)
+            if available[resource] > 0 and rnd.random() < 0.5:
+                allocation[process].append(resource)
+                available[resource] -= 1
+            else:
+                request[process].append(resource)
+
+    return allocation, request, resource_capacity
+
+def high_capacity(size: int, seed: int = 0) -> tuple[dict, dict, dict]:
+    """
+    Generates a few resources with a capacity in the order of the number of processes.
+    Each process holds and requests several units of the same resources.
+
+    :param size: Number of processes.
+    :param seed: Random seed.
+    :return: (allocation, request, resource_capacity) lists.
+    """
+    rnd = random.Random(seed)
+    resource_count = max(1, size // 100)
+    resource_capacity = {f"R{i} ({size})": size for i in range(resource_count)}
+    resources = list(resource_capacity)
+    available = dict(resource_capacity)
+    allocation = {f"P{i}": [] for i in range(size)}
+    request = {f"P{i}": [] for i in range(size)}
+
+    for process in allocation:
+        for resource in rnd.sample(resources, min(2, resource_count)):
+            units = rnd.randint(1, 3)
+            held = min(units, available[resource])
+            allocation[process].extend([resource] * held)
+            available[resource] -= held
+            request[process].extend([resource] * rnd.randint(0, 3))
+
+    return allocation, request, resource_capacity
+
+def small_components(size: int, seed: int = 0, component_size: int = 3) -> tuple[dict, dict, dict]:
+    """
+    Generates many small independent components of component_size processes and resources.
+    Each component is a small ring (deadlocked) or a small chain (reducible), at random.
+
+    :param size: Number of processes.
+    :param seed: Random seed.
+    :param component_size: Number of processes of each component.
+    :return: (allocation, request, resource_capacity) lists.
+    """
+    rnd = random.Random(seed)
+    allocation, request, resource_capacity = {}, {}, {}
+
+    for start in range(0, size, component_size):
+        count = min(component_size, size - start)
+        is_ring = rnd.random() < 0.5
+        for i in range(start, start + count):
+            following = i + 1 if i + 1 < start + count else (start if is_ring else None)
+            allocation[f"P{i}"] = [f"R{i}"]
+            request[f"P{i}"] = [f"R{following}"] if following is not None else []
+            resource_capacity[f"R{i}"] = 1
+
+    return shuffled(allocation, rnd), request, resource_capacity
+
+GENERATORS = {
+    "chain": wait_chain,
+    "ring": ring,
+    "dense": dense_graph,
+    "high_capacity": high_capacity,
+    "components": small_components,
+}
+
+def generate_graph(shape: str, size: int, seed: int = 0) -> tuple[dict, dict, dict]:
+    """
+    Generates a synthetic graph of the given shape.
+
+    :param shape: One of GENERATORS.
+    :param size: Number of processes.
+    :param seed: Random seed.
+    :return: (allocation, request, resource_capacity) lists.
+    """
+    if shape not in GENERATORS:
+        raise ValueError(f"Unknown graph shape: {shape}")
+
+    return GENERATORS[shape](size, seed)
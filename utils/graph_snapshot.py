@@ -0,0 +1,334 @@
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from utils.instrumentation import timed
+from utils.resource_allocation_graph_builder import ResourceAllocationGraph, merge_runs, parse_resource_capacity
+
+MAGIC = b'RAGB'
+# Version 1 stored one CSR entry per unit, version 2 stores one entry per distinct pair with its units
+VERSION = 2
+FLAG_POSITIONS = 1
+
+# magic, version, flags, processes, resources, requests, allocations, string table size, process index, resource index
+HEADER = struct.Struct('<4sHHIIQQQII')
+
+
+class BinarySnapshot:
+    def __init__(self, rag: ResourceAllocationGraph, positions, node_indexes: dict[str, int],
+                 file_map: mmap.mmap = None, views: list[memoryview] = None):
+        """
+        Snapshot loaded from the binary format. The arrays of the graph point into the memory-mapped file,
+        which stays open until close (or the end of a with block); the graph can't be used after it.
+        Without close, the map is released when the graph and its arrays are garbage collected.
+
+        :param rag: ResourceAllocationGraph backed by the file.
+        :param positions: Float buffer [x0, y0, x1, y1, ...] of the node positions (processes first), or None.
+        :param node_indexes: Last index of the process and resource names.
+        :param file_map: Memory map of the file.
+        :param views: Views on the map, released before closing it (derived views after their parent).
+        """
+        self.rag = rag
+        self.positions = positions
+        self.node_indexes = node_indexes
+        self.file_map = file_map
+        self.views = views if views is not None else []
+
+    def close(self) -> None:
+        """Releases the views and closes the memory map. Raises BufferError if a view of the arrays is still in use."""
+        while self.views:
+            self.views[-1].release()
+            self.views.pop()
+        if self.file_map is not None:
+            self.file_map.close()
+            self.file_map = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+@timed("snapshot_load")
+def read_json_snapshot(path: str) -> dict:
+    """
+    Reads a snapshot saved by the GUI (see graph.txt).
+
+    :param path: File path.
+    :return: Snapshot content.
+    """
+    with open(path, 'r') as file:
+        return json.load(file)
+
+def write_json_snapshot(path: str, content: dict) -> None:
+    """
+    Writes a snapshot in the GUI format.
+
+    :param path: File path.
+    :param content: Snapshot content.
+    """
+    with open(path, 'w') as file:
+        json.dump(content, file, indent=4)
+
+def node_attributes(content: dict) -> dict[str, dict]:
+    """
+    Kind and capacity of each node of a snapshot content. Files saved before the nodes had attributes
+    get them from the node names: processes start with P and the capacity comes from names like "R1 (2)".
+
+    :param content: Snapshot content.
+    :return: Dictionary {node: {"kind": "process" or "resource", "capacity": units}}, capacity only for resources.
+    """
+    attributes = content.get("node_attributes", {})
+    result = {}
+    for node in content["nodes"]:
+        if node in attributes:
+            result[node] = attributes[node]
+        elif node.startswith('P'):
+            result[node] = {"kind": "process"}
+        else:
+            result[node] = {"kind": "resource", "capacity": parse_resource_capacity(node)}
+
+    return result
+
+def content_to_graph(content: dict) -> ResourceAllocationGraph:
+    """
+    Builds the graph from a snapshot content. Edges are [source, target, units], or [source, target]
+    repeated once per unit in files saved before edges carried the units.
+
+    :param content: Snapshot content.
+    :return: ResourceAllocationGraph instance.
+    """
+    attributes = node_attributes(content)
+    processes = [node for node in content["nodes"] if attributes[node]["kind"] == "process"]
+    resources = [node for node in content["nodes"] if attributes[node]["kind"] == "resource"]
+    availability = {resource: attributes[resource]["capacity"] for resource in resources}
+
+    return ResourceAllocationGraph(processes, resources, availability, [tuple(edge) for edge in content["edges"]])
+
+def graph_to_content(rag: ResourceAllocationGraph, positions: dict = None, node_indexes: dict = None) -> dict:
+    """
+    Converts a graph back to the snapshot content saved by the GUI.
+
+    :param rag: ResourceAllocationGraph instance.
+    :param positions: Dictionary with the position of each node.
+    :param node_indexes: Last index of the process and resource names.
+    :return: Snapshot content.
+    """
+    edges = [[process, rag.resources[r], units] for p, process in enumerate(rag.processes) for r, units in rag.request_quantities(p)]
+    edges += [[resource, rag.processes[p], units] for r, resource in enumerate(rag.resources) for p, units in rag.holder_quantities(r)]
+
+    attributes = {process: {"kind": "process"} for process in rag.processes}
+    attributes.update({resource: {"kind": "resource", "capacity": capacity} for resource, capacity in zip(rag.resources, rag.capacity)})
+
+    return {
+        "nodes": rag.processes + rag.resources,
+        "node_attributes": attributes,
+        "edges": edges,
+        "node_positions": positions or {},
+        "node_indexes": node_indexes or {"process": len(rag.processes), "resource": len(rag.resources)}
+    }
+
+def padding(size: int) -> bytes:
+    """Zero bytes that align a section to 8 bytes."""
+    return bytes(-size % 8)
+
+def write_binary_snapshot(path: str, rag: ResourceAllocationGraph, positions: dict = None, node_indexes: dict = None) -> None:
+    """
+    Writes a graph in the binary format: a header, a string table, the capacity and position arrays
+    and the request, allocation and holder CSR arrays (offsets, targets and units), each section aligned to 8 bytes.
+
+    :param path: File path.
+    :param rag: ResourceAllocationGraph instance.
+    :param positions: Dictionary with the position of each node.
+    :param node_indexes: Last index of the process and resource names.
+    """
+    names = [name.encode('utf-8') for name in rag.processes + rag.resources]
+    string_offsets = array('q', [0])
+    for name in names:
+        string_offsets.append(string_offsets[-1] + len(name))
+    strings = b''.join(names)
+
+    node_indexes = node_indexes or {"process": len(rag.processes), "resource": len(rag.resources)}
+    header = HEADER.pack(MAGIC, VERSION, FLAG_POSITIONS if positions else 0, len(rag.processes), len(rag.resources),
+                         len(rag.request_targets), len(rag.allocation_targets), len(strings),
+                         node_indexes["process"], node_indexes["resource"])
+
+    sections = [string_offsets.tobytes(), strings, array('q', rag.capacity).tobytes()]
+    if positions:
+        sections.append(array('d', [value for node in rag.processes + rag.resources for value in positions[node]]).tobytes())
+    for offsets, targets, units in ((rag.request_offsets, rag.request_targets, rag.request_units),
+                                    (rag.allocation_offsets, rag.allocation_targets, rag.allocation_units),
+                                    (rag.holder_offsets, rag.holder_targets, rag.holder_units)):
+        sections.append(array('q', offsets).tobytes())
+        sections.append(array('i', targets).tobytes())
+        sections.append(array('q', units).tobytes())
+
+    with open(path, 'wb') as file:
+        file.write(header)
+        file.write(padding(len(header)))
+        for section in sections:
+            file.write(section)
+            file.write(padding(len(section)))
+
+@timed("snapshot_load")
+def load_binary_snapshot(path: str) -> BinarySnapshot:
+    """
+    Memory-maps a binary snapshot. The CSR, capacity and position arrays are views on the file,
+    so no Python object is created per edge; only the node names are decoded.
+    Version 1 files (one CSR entry per unit) are converted to distinct pairs in memory.
+    The snapshot should be closed when its graph is no longer used.
+
+    :param path: File path.
+    :return: BinarySnapshot instance.
+    """
+    with open(path, 'rb') as file:
+        # Empty files can't be mapped, and shorter ones have no header to unpack
+        if os.fstat(file.fileno()).st_size < HEADER.size:
+            raise ValueError(f"{path} is not a binary graph snapshot")
+        file_map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    view = memoryview(file_map)
+    snapshot = BinarySnapshot(None, None, {}, file_map, [view])
+    try:
+        load_sections(path, view, snapshot)
+    except BaseException:
+        snapshot.close()
+        raise
+    return snapshot
+
+def load_sections(path: str, view: memoryview, snapshot: BinarySnapshot) -> None:
+    """Reads the header and the sections of a mapped binary snapshot into the snapshot, tracking the views it creates."""
+    magic, version, flags, process_count, resource_count, request_count, allocation_count, strings_size, \
+        process_index, resource_index = HEADER.unpack_from(view)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a binary graph snapshot")
+    if version > VERSION:
+        raise ValueError(f"Unsupported binary snapshot version: {version}")
+
+    position = HEADER.size + len(padding(HEADER.size))
+
+    def section(item_format: str, count: int, item_size: int):
+        nonlocal position
+        size = count * item_size
+        # A cast of a short slice fails with a TypeError, truncated files are reported like the other format errors
+        if position + size > len(view):
+            raise ValueError(f"{path} is a truncated binary snapshot")
+        data = view[position:position + size]
+        snapshot.views.append(data)
+        if item_format != 'B':
+            snapshot.views.append(data.cast('B'))
+            data = snapshot.views[-1].cast(item_format)
+            snapshot.views.append(data)
+        position += size + len(padding(size))
+
+        # Files are little-endian, big-endian hosts need a swapped copy
+        if sys.byteorder != 'little' and item_format != 'B':
+            swapped = array(item_format, data)
+            swapped.byteswap()
+            return swapped
+        return data
+
+    node_count = process_count + resource_count
+    string_offsets = section('q', node_count + 1, 8)
+    strings = bytes(section('B', strings_size, 1))
+    names = [strings[string_offsets[i]:string_offsets[i + 1]].decode('utf-8') for i in range(node_count)]
+
+    capacity = section('q', resource_count, 8)
+    positions = section('d', node_count * 2, 8) if flags & FLAG_POSITIONS else None
+    csr = []
+    for row_count, entry_count in ((process_count, request_count), (process_count, allocation_count), (resource_count, allocation_count)):
+        offsets, targets = section('q', row_count + 1, 8), section('i', entry_count, 4)
+        csr.append((offsets, targets, section('q', entry_count, 8)) if version >= 2 else merge_runs(offsets, targets, row_count))
+    request_csr, allocation_csr, holder_csr = csr
+
+    snapshot.rag = ResourceAllocationGraph.from_csr(names[:process_count], names[process_count:], capacity, request_csr, allocation_csr, holder_csr)
+    snapshot.positions = positions
+    snapshot.node_indexes = {"process": process_index, "resource": resource_index}
+
+def is_binary_snapshot(path: str) -> bool:
+    """Checks the magic number of a file."""
+    with open(path, 'rb') as file:
+        return file.read(len(MAGIC)) == MAGIC
+
+def read_snapshot_content(path: str) -> dict:
+    """
+    Reads a JSON or binary snapshot, or the last sample of a delta log, as the content saved by the GUI.
+
+    :param path: File path.
+    :return: Snapshot content.
+    """
+    from utils.delta_snapshot import is_delta_log, read_delta_log
+
+    if is_delta_log(path):
+        return read_delta_log(path).to_content()
+    if not is_binary_snapshot(path):
+        return read_json_snapshot(path)
+
+    with load_binary_snapshot(path) as snapshot:
+        return graph_to_content(snapshot.rag, binary_positions(snapshot), snapshot.node_indexes)
+
+def read_snapshot_graph(path: str) -> ResourceAllocationGraph:
+    """
+    Reads a JSON or binary snapshot, or the last sample of a delta log, as a graph ready for the engine.
+
+    :param path: File path.
+    :return: ResourceAllocationGraph instance.
+    """
+    from utils.delta_snapshot import is_delta_log, read_delta_log
+
+    if is_binary_snapshot(path):
+        # The arrays are copied out of the map, so it is closed before returning
+        with load_binary_snapshot(path) as snapshot:
+            return copy_graph_arrays(snapshot.rag)
+    if is_delta_log(path):
+        return read_delta_log(path).to_graph()
+
+    return content_to_graph(read_json_snapshot(path))
+
+def copy_graph_arrays(rag: ResourceAllocationGraph) -> ResourceAllocationGraph:
+    """Copies the capacity and CSR buffers of a graph (e.g. views on a memory map) into arrays owned by a new graph."""
+    def copy(item_format: str, data) -> array:
+        buffer = array(item_format)
+        buffer.frombytes(memoryview(data).cast('B'))
+        return buffer
+
+    return ResourceAllocationGraph.from_csr(
+        rag.processes, rag.resources, copy('q', rag.capacity),
+        (copy('q', rag.request_offsets), copy('i', rag.request_targets), copy('q', rag.request_units)),
+        (copy('q', rag.allocation_offsets), copy('i', rag.allocation_targets), copy('q', rag.allocation_units)),
+        (copy('q', rag.holder_offsets), copy('i', rag.holder_targets), copy('q', rag.holder_units)))
+
+def binary_positions(snapshot: BinarySnapshot) -> dict:
+    """Converts the position buffer of a binary snapshot to a dictionary of node positions."""
+    if snapshot.positions is None:
+        return {}
+
+    nodes = snapshot.rag.processes + snapshot.rag.resources
+    return {node: [snapshot.positions[2 * i], snapshot.positions[2 * i + 1]] for i, node in enumerate(nodes)}
+
+def json_to_binary(json_path: str, binary_path: str) -> None:
+    """Converts a JSON snapshot to the binary format."""
+    content = read_json_snapshot(json_path)
+    write_binary_snapshot(binary_path, content_to_graph(content), content.get("node_positions"), content.get("node_indexes"))
+
+def binary_to_json(binary_path: str, json_path: str) -> None:
+    """Converts a binary snapshot to the JSON format."""
+    write_json_snapshot(json_path, read_snapshot_content(binary_path))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Converts graph snapshots between the JSON and the binary format.")
+    parser.add_argument("command", choices=["to-binary", "to-json"])
+    parser.add_argument("source")
+    parser.add_argument("target")
+    args = parser.parse_args()
+
+    if args.command == "to-binary":
+        json_to_binary(args.source, args.target)
+    else:
+        binary_to_json(args.source, args.target)
@@ -0,0 +1,211 @@
+import cProfile
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+
+
+class Instrumentation:
+    def __init__(self):
+        """
+        Collects the time of each phase of the deadlock detection and counters such as the reduced processes,
+        victims and freed units, and sends them to sinks. It starts disabled: a timed function then only pays
+        for one attribute check and the counters are not computed.
+
+        Phases can be nested (e.g. the victim selection inside a reduction), the time of each one includes the
+        phases it calls. The profiler and the memory tracing only follow the outermost phase.
+        The nesting depth is kept per thread, so phases timed by concurrent threads (the detection service,
+        the batch analyzer) don't see each other as nested; the totals are updated under a lock.
+        """
+        self.enabled = False
+        self.sinks = []
+        self.profiler = None
+        self.trace_memory = False
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.reset()
+
+    @property
+    def depth(self) -> int:
+        """Number of timed phases the current thread is in."""
+        return getattr(self.local, "depth", 0)
+
+    @depth.setter
+    def depth(self, value: int) -> None:
+        self.local.depth = value
+
+    def enable(self, *sinks, profile: bool = False, trace_memory: bool = False) -> None:
+        """
+        Starts collecting, discarding anything collected before.
+
+        :param sinks: Objects with an emit(snapshot) method, called by flush.
+        :param profile: Runs the outermost phases under cProfile (see self.profiler).
+        :param trace_memory: Records the peak memory of the outermost phases with tracemalloc.
+        """
+        self.reset()
+        self.sinks = list(sinks)
+        self.profiler = cProfile.Profile() if profile else None
+        self.trace_memory = trace_memory
+        self.enabled = True
+
+    def disable(self) -> None:
+        """Stops collecting. What was collected stays available to snapshot and flush."""
+        self.enabled = False
+
+    def reset(self) -> None:
+        """Clears the timers and counters."""
+        self.seconds = {}
+        self.calls = {}
+        self.peak_bytes = {}
+        self.counters = {}
+
+    def count(self, name: str, value: int = 1) -> None:
+        """Adds a value to a counter."""
+        if self.enabled:
+            with self.lock:
+                self.counters[name] = self.counters.get(name, 0) + value
+
+    def start_phase(self) -> None:
+        """Starts the profiler and the memory tracing when entering an outermost phase."""
+        self.depth += 1
+        if self.depth > 1:
+            return
+
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+        if self.profiler is not None:
+            self.profiler.enable()
+
+    def end_phase(self, phase: str, seconds: float) -> None:
+        """Records the time of a phase, stopping the profiler and the memory tracing after an outermost one."""
+        self.depth -= 1
+        with self.lock:
+            self.seconds[phase] = self.seconds.get(phase, 0.0) + seconds
+            self.calls[phase] = self.calls.get(phase, 0) + 1
+        if self.depth > 0:
+            return
+
+        if self.profiler is not None:
+            self.profiler.disable()
+        if self.trace_memory:
+            _, peak = tracemalloc.get_traced_memory()
+            with self.lock:
+                self.peak_bytes[phase] = max(self.peak_bytes.get(phase, 0), peak)
+
+    def snapshot(self) -> dict:
+        """
+        Returns what was collected.
+
+        :return: {"phases": {phase: {"seconds", "calls"[, "peak_bytes"]}}, "counters": {name: value}}.
+        """
+        phases = {}
+        for phase, seconds in self.seconds.items():
+            phases[phase] = {"seconds": round(seconds, 6), "calls": self.calls[phase]}
+            if phase in self.peak_bytes:
+                phases[phase]["peak_bytes"] = self.peak_bytes[phase]
+
+        return {"phases": phases, "counters": dict(self.counters)}
+
+    def flush(self) -> None:
+        """Sends the snapshot to every sink."""
+        snapshot = self.snapshot()
+        for sink in self.sinks:
+            sink.emit(snapshot)
+
+
+metrics = Instrumentation()
+
+
+def timed(phase: str):
+    """
+    Decorator that records the time of each call of a function as a phase of metrics.
+
+    :param phase: Phase name.
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not metrics.enabled:
+                return function(*args, **kwargs)
+
+            metrics.start_phase()
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                metrics.end_phase(phase, time.perf_counter() - start)
+
+        return wrapper
+
+    return decorator
+
+
+class LoggingSink:
+    def __init__(self, logger: logging.Logger = None, level: int = logging.INFO):
+        """
+        Logs one line per phase and one line with the counters.
+
+        :param logger: Logger (defaults to the logger of this module).
+        :param level: Logging level.
+        """
+        self.logger = logger or logging.getLogger(__name__)
+        self.level = level
+
+    def emit(self, snapshot: dict) -> None:
+        for phase, values in snapshot["phases"].items():
+            self.logger.log(self.level, "phase %s: %s", phase, values)
+        self.logger.log(self.level, "counters: %s", snapshot["counters"])
+
+
+class JsonLinesSink:
+    def __init__(self, path: str):
+        """
+        Appends each snapshot to a file as a JSON line, with the time it was taken.
+
+        :param path: File path.
+        """
+        self.path = path
+
+    def emit(self, snapshot: dict) -> None:
+        with open(self.path, 'a') as file:
+            file.write(json.dumps({"time": time.time(), **snapshot}) + "\n")
+
+
+class PrometheusSink:
+    def __init__(self, path: str, prefix: str = "rag_"):
+        """
+        Writes the snapshot in the Prometheus text format, for the textfile collector of node_exporter.
+        The file is replaced atomically, so the collector never reads a partial file.
+
+        :param path: File path (the collector only reads files ending with .prom).
+        :param prefix: Prefix of the metric names.
+        """
+        self.path = path
+        self.prefix = prefix
+
+    def emit(self, snapshot: dict) -> None:
+        prefix = self.prefix
+        phases = snapshot["phases"]
+        lines = [f"# TYPE {prefix}phase_seconds_total counter"]
+        lines += [f'{prefix}phase_seconds_total{{phase="{phase}"}} {values["seconds"]}' for phase, values in phases.items()]
+        lines.append(f"# TYPE {prefix}phase_calls_total counter")
+        lines += [f'{prefix}phase_calls_total{{phase="{phase}"}} {values["calls"]}' for phase, values in phases.items()]
+
+        peaks = {phase: values["peak_bytes"] for phase, values in phases.items() if "peak_bytes" in values}
+        if peaks:
+            lines.append(f"# TYPE {prefix}phase_peak_bytes gauge")
+            lines += [f'{prefix}phase_peak_bytes{{phase="{phase}"}} {peak}' for phase, peak in peaks.items()]
+
+        for name, value in snapshot["counters"].items():
+            lines.append(f"# TYPE {prefix}{name}_total counter")
+            lines.append(f"{prefix}{name}_total {value}")
+
+        temporary = f"{self.path}.tmp"
+        with open(temporary, 'w') as file:
+            file.write("\n".join(lines) + "\n")
+        os.replace(temporary, self.path)
@@ -0,0 +1,324 @@
+import argparse
+import json
+import sys
+import time
+
+from utils.event_stream import EVENT_TYPES, read_events
+from utils.resource_allocation_graph_builder import ResourceAllocationGraph, parse_resource_capacity
+
+
+class OrderingCycle:
+    def __init__(self, resources: list[str], capacities: list[int], examples: list[dict], offset: int):
+        """
+        Cycle of the resource ordering graph: each resource was held while the next one was requested, so
+        processes following these orders at the same time can deadlock, even if it never happened. With
+        multi-unit resources it also needs every unit of the resources to be held along the cycle.
+
+        :param resources: Resources of the cycle, each one held while the next one (wrapping around) was requested.
+        :param capacities: Capacity of each resource.
+        :param examples: One trace of each ordering edge: {"process", "offset", "held", "requested"}.
+        :param offset: Index of the event that closed the cycle.
+        """
+        self.resources = resources
+        self.capacities = capacities
+        self.examples = examples
+        self.offset = offset
+
+    @property
+    def single_unit(self) -> bool:
+        """True if every resource has a single unit, so the orders alone are enough to deadlock."""
+        return all(capacity == 1 for capacity in self.capacities)
+
+    def to_dict(self) -> dict:
+        return {"offset": self.offset, "cycle": self.resources, "capacities": self.capacities,
+                "single_unit": self.single_unit, "examples": self.examples}
+
+
+class LockOrderAnalyzer:
+    def __init__(self):
+        """
+        Lockdep-style analysis of acquisition traces. Every time a process requests a resource while holding
+        others, an ordering edge held -> requested is added to a global graph of resources. A cycle in that
+        graph is a potential deadlock: it is reported with the trace that created each of its edges.
+
+        Each ordering edge is stored once with its first trace, so the graph only grows with the distinct
+        orders and an event that repeats a known order costs one dictionary lookup per held resource.
+        A topological order of the strongly connected components of the graph is kept incrementally
+        (Pearce-Kelly), so a new edge that follows the order costs O(1); only an edge against the order
+        searches the components between its ends, merging the ones it puts on a cycle. An edge inside a
+        component always closes a cycle, found with a bidirectional search restricted to that component.
+        Resources and their capacities follow the events of utils.event_stream ("capacity" field or
+        names like "R1 (2)").
+        """
+        self.capacity = {}
+        self.held = {}
+        self.order = {}
+        self.incoming = {}
+        self.component = {}
+        self.members = {}
+        self.position = {}
+        self.reported = set()
+
+        self.events = 0
+        self.edges = 0
+        self.elapsed = 0.0
+
+    @property
+    def events_per_second(self) -> float:
+        return self.events / self.elapsed if self.elapsed else 0.0
+
+    def add_resource(self, resource: str, capacity: int = None) -> None:
+        if resource not in self.capacity:
+            self.capacity[resource] = capacity if capacity is not None else parse_resource_capacity(resource)
+            # A resource without edges can go anywhere in the order, it starts as its own component at the end
+            self.order[resource] = {}
+            self.incoming[resource] = {}
+            self.component[resource] = resource
+            self.members[resource] = [resource]
+            self.position[resource] = len(self.capacity)
+
+    def observe(self, event: dict, offset: int = None) -> list[OrderingCycle]:
+        """
+        Updates the held resources and the ordering graph with an event.
+
+        :param event: Event dictionary (see utils.event_stream).
+        :param offset: Index of the event in the trace (defaults to the number of events observed).
+        :return: Cycles closed by this event, not reported before.
+        """
+        event_type = event["event"]
+        if event_type not in EVENT_TYPES:
+            raise ValueError(f"Unknown event type: {event_type}")
+
+        if offset is None:
+            offset = self.events
+        self.events += 1
+
+        process = event.get("process")
+        resource = event.get("resource")
+        if resource is not None and event_type != "remove_resource":
+            self.add_resource(resource, event.get("capacity"))
+
+        cycles = []
+        if event_type in ("request", "grant", "acquire"):
+            held = self.held.setdefault(process, {})
+            if held:
+                cycles = self.add_orders(process, held, resource, offset)
+            if event_type != "request":
+                held[resource] = held.get(resource, 0) + event.get("quantity", 1)
+        elif event_type == "release":
+            held = self.held.get(process, {})
+            units = held.get(resource, 0) - event.get("quantity", 1)
+            if units > 0:
+                held[resource] = units
+            else:
+                held.pop(resource, None)
+        elif event_type in ("remove_process", "exit"):
+            self.held.pop(process, None)
+
+        return cycles
+
+    def observe_graph(self, rag: ResourceAllocationGraph, offset: int = None) -> list[OrderingCycle]:
+        """
+        Adds the orders of a graph snapshot: each process holds its allocations while it requests.
+
+        :param rag: ResourceAllocationGraph instance.
+        :param offset: Index of the snapshot, used in the examples (defaults to the number of events observed).
+        :return: Cycles closed by this snapshot, not reported before.
+        """
+        if offset is None:
+            offset = self.events
+        self.events += 1
+
+        for resource_id, resource in enumerate(rag.resources):
+            self.add_resource(resource, rag.capacity[resource_id])
+
+        cycles = []
+        for process_id, process in enumerate(rag.processes):
+            held = {rag.resources[resource]: units for resource, units in rag.allocation_quantities(process_id)}
+            if held:
+                for resource in rag.request_view(process_id):
+                    cycles += self.add_orders(process, held, rag.resources[resource], offset)
+
+        return cycles
+
+    def add_orders(self, process: str, held: dict[str, int], requested: str, offset: int) -> list[OrderingCycle]:
+        """Adds the edges from the held resources to the requested one, searching cycles from the new ones."""
+        cycles = []
+        example = None
+        for resource in held:
+            targets = self.order[resource]
+            if requested in targets:
+                continue
+            # More units of a multi-unit resource already held only deadlock with other resources, on other edges
+            if resource == requested and self.capacity[resource] > 1:
+                continue
+
+            if example is None:
+                example = {"process": process, "offset": offset, "held": list(held), "requested": requested}
+            targets[requested] = example
+            self.incoming[requested][resource] = example
+            self.edges += 1
+
+            if self.insert_order(resource, requested):
+                cycle = self.find_cycle(resource, requested, offset)
+                if cycle is not None:
+                    cycles.append(cycle)
+
+        return cycles
+
+    def insert_order(self, source: str, target: str) -> bool:
+        """
+        Updates the topological order of the components after adding the edge source -> target.
+
+        :return: True if the edge closes a cycle (both ends are then in the same component).
+        """
+        upper, lower = self.component[source], self.component[target]
+        if upper == lower:
+            return True
+        position = self.position
+        if position[upper] < position[lower]:
+            return False
+
+        # Only the components between the two ends in the order can be on a new cycle or need to move
+        low, high = position[lower], position[upper]
+        forward = self.reach(lower, self.order, low, high)
+        backward = self.reach(upper, self.incoming, low, high)
+        merged = forward & backward if upper in forward else set()
+        before = sorted(backward - merged, key=position.__getitem__)
+        after = sorted(forward - merged, key=position.__getitem__)
+        slots = sorted(position[component] for component in forward | backward)
+
+        # The components that reach the source keep the lowest positions and the ones reachable from the
+        # target the highest, a merged component goes in between
+        for component, slot in zip(before, slots):
+            position[component] = slot
+        for component, slot in zip(after, slots[len(slots) - len(after):]):
+            position[component] = slot
+        if merged:
+            # The largest component keeps its name, the resources of the others are relabeled
+            largest = max(merged, key=lambda component: len(self.members[component]))
+            for component in merged - {largest}:
+                for resource in self.members[component]:
+                    self.component[resource] = largest
+                self.members[largest] += self.members.pop(component)
+                del position[component]
+            position[largest] = slots[len(before)]
+
+        return bool(merged)
+
+    def reach(self, start: str, adjacency: dict, low: int, high: int) -> set[str]:
+        """Components reachable from a component through the adjacency (forward or backward), with positions in [low, high]."""
+        position = self.position
+        component_of = self.component
+        seen = {start}
+        stack = [start]
+        while stack:
+            for resource in self.members[stack.pop()]:
+                for neighbor in adjacency[resource]:
+                    component = component_of[neighbor]
+                    if component not in seen and low <= position[component] <= high:
+                        seen.add(component)
+                        stack.append(component)
+
+        return seen
+
+    def shortest_path(self, start: str, goal: str) -> list[str]:
+        """
+        Shortest path start -> goal inside their component, searched from both ends one layer at a time.
+        The first resource reached from both ends is on a shortest path: a shorter one would have met earlier.
+
+        :return: Resources of the path, from start to goal.
+        """
+        if start == goal:
+            return [start]
+        if goal in self.order[start]:
+            return [start, goal]
+        # Paths of two edges are the most common ones in dense graphs, the middle resources are an intersection
+        middle = self.order[start].keys() & self.incoming[goal].keys()
+        if middle:
+            return [start, min(middle), goal]
+
+        component = self.component[start]
+        forward, backward = {start: None}, {goal: None}
+        forward_layer, backward_layer = [start], [goal]
+        meeting = None
+        while meeting is None:
+            if len(forward_layer) <= len(backward_layer):
+                forward_layer, meeting = self.expand(forward_layer, forward, backward, self.order, component)
+            else:
+                backward_layer, meeting = self.expand(backward_layer, backward, forward, self.incoming, component)
+
+        path = []
+        resource = meeting
+        while resource is not None:
+            path.append(resource)
+            resource = forward[resource]
+        path.reverse()
+        resource = backward[meeting]
+        while resource is not None:
+            path.append(resource)
+            resource = backward[resource]
+        return path
+
+    def expand(self, layer: list[str], parents: dict, other: dict, adjacency: dict, component: str) -> tuple[list[str], str]:
+        """Expands a layer of the bidirectional search, stopping at the first resource reached from both ends."""
+        component_of = self.component
+        next_layer = []
+        for resource in layer:
+            for neighbor in adjacency[resource]:
+                if neighbor not in parents and component_of[neighbor] == component:
+                    parents[neighbor] = resource
+                    if neighbor in other:
+                        return next_layer, neighbor
+                    next_layer.append(neighbor)
+
+        return next_layer, None
+
+    def find_cycle(self, source: str, target: str, offset: int) -> OrderingCycle:
+        """
+        Searches the shortest path target -> source, which closes a cycle with the new edge source -> target.
+
+        :return: OrderingCycle, or None if the cycle was already reported.
+        """
+        resources = self.shortest_path(target, source)
+
+        # The same cycle can be closed from any of its edges, it is reported starting at its smallest resource
+        start = resources.index(min(resources))
+        resources = resources[start:] + resources[:start]
+        key = tuple(resources)
+        if key in self.reported:
+            return None
+        self.reported.add(key)
+
+        examples = [self.order[resource][resources[(index + 1) % len(resources)]] for index, resource in enumerate(resources)]
+        return OrderingCycle(resources, [self.capacity[resource] for resource in resources], examples, offset)
+
+    def run(self, events):
+        """
+        Consumes the events and yields each potential deadlock when its cycle is closed.
+
+        :param events: Iterable of event dictionaries.
+        :return: Generator of OrderingCycle.
+        """
+        start = time.perf_counter()
+        for offset, event in enumerate(events):
+            yield from self.observe(event, offset)
+
+        self.elapsed = time.perf_counter() - start
+
+    def summary(self) -> dict:
+        return {"events": self.events, "resources": len(self.capacity), "ordering_edges": self.edges,
+                "cycles": len(self.reported), "seconds": round(self.elapsed, 6),
+                "events_per_second": round(self.events_per_second, 1)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Predicts potential deadlocks from the resource acquisition orders of an event log.")
+    parser.add_argument("path", help="Event log (.jsonl or .csv, '-' for JSON lines on stdin)")
+    args = parser.parse_args()
+
+    analyzer = LockOrderAnalyzer()
+    for cycle in analyzer.run(read_events(args.path)):
+        print(json.dumps(cycle.to_dict()), flush=True)
+
+    print(json.dumps(analyzer.summary()), file=sys.stderr)
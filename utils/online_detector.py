@@ -0,0 +1,341 @@
+from collections import Counter, deque
+
+from utils.deadlock_resolver import reduce_allocation_graph
+from utils.resource_allocation_graph_builder import ResourceAllocationGraph
+
+
+def reduce_region(region: set[str], allocation: dict[str, Counter], request: dict[str, Counter], available: dict[str, int],
+                  order: list[str] = None) -> set[str]:
+    """
+    Reduces a region of the graph with a worklist.
+
+    :param region: Processes of the region.
+    :param allocation: Dictionary of processes with the allocated quantity of each resource.
+    :param request: Dictionary of processes with the requested quantity of each resource.
+    :param available: Dictionary with the capacity of each requested resource that the region can count on.
+    :param order: If given, the reduced processes are appended to it in the reduction order.
+    :return: Set of processes that can be reduced.
+    """
+    released = Counter()
+    blocked_count = {}
+    waiters = {}
+    ready = deque()
+
+    for process in region:
+        blocked_count[process] = 0
+        for resource, quantity in request[process].items():
+            if quantity > available[resource]:
+                blocked_count[process] += 1
+                waiters.setdefault(resource, []).append((quantity, process))
+
+        if blocked_count[process] == 0:
+            ready.append(process)
+
+    for resource_waiters in waiters.values():
+        resource_waiters.sort()
+    cursor = dict.fromkeys(waiters, 0)
+
+    reduced = set()
+    while ready:
+        process = ready.popleft()
+        reduced.add(process)
+        if order is not None:
+            order.append(process)
+
+        for resource, quantity in allocation[process].items():
+            released[resource] += quantity
+            if resource not in waiters:
+                continue
+
+            resource_waiters = waiters[resource]
+            index = cursor[resource]
+            while index < len(resource_waiters) and resource_waiters[index][0] <= available[resource] + released[resource]:
+                waiter = resource_waiters[index][1]
+                blocked_count[waiter] -= 1
+                if blocked_count[waiter] == 0:
+                    ready.append(waiter)
+                index += 1
+            cursor[resource] = index
+
+    return reduced
+
+
+class OnlineDeadlockDetector:
+    def __init__(self, incremental: bool = True):
+        """
+        Keeps the deadlock verdict of a Resource Allocation Graph up to date as requests, grants and
+        releases arrive. Each event only re-examines the processes whose verdict it can change:
+        new requests and grants can only create deadlocks among the processes waiting on the changed
+        region, and releases can only resolve deadlocks of the processes waiting on the released resource.
+
+        :param incremental: If False, events only update the graph and the verdict is refreshed by detect().
+        """
+        self.incremental = incremental
+        self.capacity = {}
+        self.available = {}
+        self.allocations = {}
+        self.requests = {}
+        self.holders = {}
+        self.waiters = {}
+        self.deadlocked = set()
+
+    @classmethod
+    def from_graph(cls, rag: ResourceAllocationGraph):
+        """
+        Creates a detector with the state of a ResourceAllocationGraph, running a single full reduction.
+
+        :param rag: ResourceAllocationGraph instance.
+        :return: OnlineDeadlockDetector instance.
+        """
+        detector = cls()
+        for resource, capacity in zip(rag.resources, rag.capacity):
+            detector.add_resource(resource, capacity)
+
+        for process_id, process in enumerate(rag.processes):
+            detector.add_process(process)
+            for resource_id, quantity in rag.request_quantities(process_id):
+                detector.add_units(process, rag.resources[resource_id], quantity, detector.requests, detector.waiters)
+            for resource_id, quantity in rag.allocation_quantities(process_id):
+                resource = rag.resources[resource_id]
+                detector.add_units(process, resource, quantity, detector.allocations, detector.holders)
+                detector.available[resource] -= quantity
+
+        detector.deadlocked = set(reduce_allocation_graph(rag).deadlocked_processes)
+        return detector
+
+    @property
+    def deadlocked_processes(self) -> list[str]:
+        """Processes currently deadlocked, in the order they were added."""
+        return [process for process in self.allocations if process in self.deadlocked]
+
+    def add_resource(self, resource: str, capacity: int) -> None:
+        """
+        Adds a resource to the graph.
+
+        :param resource: Resource name.
+        :param capacity: Total capacity of the resource.
+        """
+        if resource in self.capacity:
+            raise ValueError(f"Resource {resource} already exists")
+
+        self.capacity[resource] = capacity
+        self.available[resource] = capacity
+        self.holders[resource] = set()
+        self.waiters[resource] = set()
+
+    def remove_resource(self, resource: str) -> None:
+        """
+        Removes a resource and all of its request and allocation edges.
+
+        :param resource: Resource name.
+        """
+        for process in list(self.waiters[resource]):
+            self.requests[process].pop(resource)
+        for process in list(self.holders[resource]):
+            self.allocations[process].pop(resource)
+
+        waiters = self.waiters.pop(resource)
+        del self.capacity[resource], self.available[resource], self.holders[resource]
+
+        if not self.incremental:
+            return
+
+        # Dropping requests can only resolve deadlocks
+        held = [held_resource for process in waiters for held_resource in self.allocations[process]]
+        self.reexamine(self.waiting_on(held, True) | (waiters & self.deadlocked))
+
+    def add_process(self, process: str) -> None:
+        """
+        Adds a process without any edge to the graph.
+
+        :param process: Process name.
+        """
+        if process in self.allocations:
+            raise ValueError(f"Process {process} already exists")
+
+        self.allocations[process] = Counter()
+        self.requests[process] = Counter()
+
+    def remove_process(self, process: str) -> None:
+        """
+        Removes a process, releasing its allocations and cancelling its requests.
+
+        :param process: Process name.
+        """
+        held = list(self.allocations[process])
+        for resource, quantity in self.allocations.pop(process).items():
+            self.available[resource] += quantity
+            self.holders[resource].discard(process)
+        for resource in self.requests.pop(process):
+            self.waiters[resource].discard(process)
+
+        self.deadlocked.discard(process)
+        if self.incremental:
+            self.reexamine(self.waiting_on(held, True))
+
+    def request(self, process: str, resource: str, quantity: int = 1) -> None:
+        """
+        Adds a request edge.
+
+        :param process: Process name.
+        :param resource: Requested resource name.
+        :param quantity: Number of requested units.
+        """
+        self.add_units(process, resource, quantity, self.requests, self.waiters)
+
+        # A deadlocked process stays deadlocked, and a request that can be granted right away keeps it reducible
+        if not self.incremental or process in self.deadlocked or self.requests[process][resource] <= self.available[resource]:
+            return
+
+        # Nothing changes while the process stays reducible, otherwise the processes waiting on it may follow
+        if process not in self.reducible(self.forward_region(process)):
+            self.reexamine({process} | self.waiting_on(self.allocations[process], False))
+
+    def grant(self, process: str, resource: str, quantity: int = 1) -> None:
+        """
+        Grants units of a resource, turning pending requests into allocations. Units that were
+        not requested are allocated directly. The capacity is not checked, an over-allocated
+        resource blocks all of its waiters.
+
+        :param process: Process name.
+        :param resource: Granted resource name.
+        :param quantity: Number of granted units.
+        """
+        pending = min(quantity, self.requests[process][resource])
+        if pending:
+            self.remove_units(process, resource, pending, self.requests, self.waiters)
+
+        self.add_units(process, resource, quantity, self.allocations, self.holders)
+        self.available[resource] -= quantity
+
+        # The grant can only deadlock processes that wait on the granted units: if the process is reducible
+        # they are released in the end unless it becomes deadlocked, otherwise they are held for good
+        if not self.incremental:
+            return
+        if process in self.deadlocked:
+            self.reexamine(self.waiting_on([resource], False))
+        elif self.waiters[resource] - self.deadlocked - {process} and process not in self.reducible(self.forward_region(process)):
+            self.reexamine({process} | self.waiting_on(self.allocations[process], False))
+
+    def release(self, process: str, resource: str, quantity: int = 1) -> None:
+        """
+        Releases allocated units of a resource.
+
+        :param process: Process name.
+        :param resource: Released resource name.
+        :param quantity: Number of released units.
+        """
+        self.remove_units(process, resource, quantity, self.allocations, self.holders)
+        self.available[resource] += quantity
+
+        if self.incremental:
+            self.reexamine(self.waiting_on([resource], True))
+
+    def add_units(self, process: str, resource: str, quantity: int, edges: dict[str, Counter], index: dict[str, set]) -> None:
+        """Adds units to a request or allocation edge and to its resource index."""
+        if resource not in self.capacity:
+            raise KeyError(f"Unknown resource {resource}")
+
+        edges[process][resource] += quantity
+        index[resource].add(process)
+
+    def remove_units(self, process: str, resource: str, quantity: int, edges: dict[str, Counter], index: dict[str, set]) -> None:
+        """Removes units from a request or allocation edge and from its resource index."""
+        if edges[process][resource] < quantity:
+            raise ValueError(f"Process {process} has only {edges[process][resource]} unit(s) of {resource}")
+
+        edges[process][resource] -= quantity
+        if edges[process][resource] == 0:
+            del edges[process][resource]
+            index[resource].discard(process)
+
+    def waiting_on(self, resources, deadlocked: bool) -> set[str]:
+        """
+        Finds the processes that wait, directly or through other processes, on the given resources.
+        Only processes with the given deadlock state are followed.
+
+        :param resources: Resource names.
+        :param deadlocked: If True follows deadlocked processes, otherwise the reducible ones.
+        :return: Set of process names.
+        """
+        processes = set()
+        stack = list(resources)
+        visited = set(stack)
+
+        while stack:
+            resource = stack.pop()
+            for waiter in self.waiters[resource]:
+                if waiter in processes or (waiter in self.deadlocked) != deadlocked:
+                    continue
+
+                processes.add(waiter)
+                for held in self.allocations[waiter]:
+                    if held not in visited:
+                        visited.add(held)
+                        stack.append(held)
+
+        return processes
+
+    def forward_region(self, process: str) -> set[str]:
+        """
+        Finds the process and the reducible processes it waits on, directly or through other processes.
+        Holders without requests are left out, since they are always reducible.
+
+        :param process: Process name.
+        :return: Set of process names.
+        """
+        region = {process}
+        stack = [process]
+
+        while stack:
+            waiter = stack.pop()
+            for resource in self.requests[waiter]:
+                for holder in self.holders[resource]:
+                    if holder not in region and holder not in self.deadlocked and self.requests[holder]:
+                        region.add(holder)
+                        stack.append(holder)
+
+        return region
+
+    def reducible(self, processes: set[str]) -> set[str]:
+        """
+        Finds which of the given processes can be reduced. Every other process must keep its verdict:
+        reducible holders outside the region release their units in the end and deadlocked ones never do.
+
+        :param processes: Process names.
+        :return: Set of reducible process names.
+        """
+        available = {}
+        for process in processes:
+            for resource in self.requests[process]:
+                if resource in available:
+                    continue
+
+                available[resource] = self.available[resource]
+                for holder in self.holders[resource]:
+                    if holder not in processes and holder not in self.deadlocked:
+                        available[resource] += self.allocations[holder][resource]
+
+        return reduce_region(processes, self.allocations, self.requests, available)
+
+    def detect(self) -> set[str]:
+        """
+        Recomputes the verdict of every process with a full reduction of the live graph.
+
+        :return: Set of deadlocked process names.
+        """
+        self.reexamine(set(self.allocations))
+        return self.deadlocked
+
+    def reexamine(self, processes: set[str]) -> None:
+        """
+        Recomputes the verdict of the given processes, assuming every other process keeps its verdict.
+
+        :param processes: Process names.
+        """
+        if not processes:
+            return
+
+        reduced = self.reducible(processes)
+        self.deadlocked -= reduced
+        self.deadlocked |= processes - reduced
@@ -0,0 +1,263 @@
+import os
+from array import array
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+from utils.deadlock_resolver import ReductionResult, reduce_allocation_graph
+from utils.instrumentation import metrics, timed
+from utils.resource_allocation_graph_builder import ResourceAllocationGraph
+
+# Smallest graph (nodes and edges) that the "auto" executor reduces in worker processes. Below it, starting the
+# pool and packing the chunks cost more than the workers save (measured with python -m utils.benchmark --parallel)
+PARALLEL_THRESHOLD = 200000
+
+def find_components(rag: ResourceAllocationGraph) -> list[tuple[list[int], list[int]]]:
+    """
+    Partitions the graph into weakly connected components with a union-find, in O(V + E).
+    Resources without any edge are left out, since they can't change the verdict.
+
+    :param rag: ResourceAllocationGraph instance.
+    :return: List of components as (process ids, resource ids).
+    """
+    process_count = len(rag.processes)
+    parent = list(range(process_count + len(rag.resources)))
+
+    for process in range(process_count):
+        for targets in (rag.request_view(process), rag.allocation_view(process)):
+            for resource in targets:
+                # Union with path halving
+                a, b = process, process_count + resource
+                while parent[a] != a:
+                    parent[a] = parent[parent[a]]
+                    a = parent[a]
+                while parent[b] != b:
+                    parent[b] = parent[parent[b]]
+                    b = parent[b]
+                if a != b:
+                    parent[b] = a
+
+    components = {}
+    for node in range(len(parent)):
+        root = node
+        while parent[root] != root:
+            root = parent[root]
+        parent[node] = root
+
+        processes, resources = components.setdefault(root, ([], []))
+        if node < process_count:
+            processes.append(node)
+        else:
+            resources.append(node - process_count)
+
+    return [component for component in components.values() if component[0]]
+
+def component_labels(rag: ResourceAllocationGraph):
+    """
+    Labels the weakly connected components with numpy: the roots of both ends of every edge are hooked to the
+    smallest one and the labels are shortened by pointer jumping until no edge joins two roots. Each round is a
+    few vectorized passes over the edges and the rounds shrink the number of roots quickly, so the partition
+    runs in C instead of a Python pass over every edge.
+
+    :param rag: ResourceAllocationGraph instance.
+    :return: numpy array with the label of each node (processes first, then resources), the smallest node id of its component.
+    """
+    import numpy as np
+
+    process_count = len(rag.processes)
+    sources = np.concatenate((row_sources(rag.request_offsets), row_sources(rag.allocation_offsets)))
+    targets = process_count + np.concatenate((np.asarray(rag.request_targets, dtype=np.int64),
+                                              np.asarray(rag.allocation_targets, dtype=np.int64)))
+
+    labels = np.arange(process_count + len(rag.resources))
+    while True:
+        source_labels, target_labels = labels[sources], labels[targets]
+        if np.array_equal(source_labels, target_labels):
+            return labels
+
+        lowest = np.minimum(source_labels, target_labels)
+        np.minimum.at(labels, source_labels, lowest)
+        np.minimum.at(labels, target_labels, lowest)
+
+        # Labels only point to smaller ids, so jumping ends with every node pointing to its root
+        while True:
+            jumped = labels[labels]
+            if np.array_equal(jumped, labels):
+                break
+            labels = jumped
+
+def row_sources(offsets):
+    """Row id of each entry of a CSR structure, as a numpy array."""
+    import numpy as np
+
+    offsets = np.asarray(offsets, dtype=np.int64)
+    return np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+
+def gather_rows(offsets, targets, units, order, target_ids) -> tuple:
+    """
+    Gathers the CSR rows of the given nodes, in that order, and renumbers their targets.
+
+    :param offsets: CSR offsets.
+    :param targets: CSR targets.
+    :param units: CSR units.
+    :param order: numpy array with the node ids of the new rows.
+    :param target_ids: numpy array with the new id of each target.
+    :return: (offsets, targets, units) numpy arrays.
+    """
+    import numpy as np
+
+    offsets = np.asarray(offsets, dtype=np.int64)
+    starts = offsets[order]
+    counts = offsets[order + 1] - starts
+    new_offsets = np.zeros(len(order) + 1, dtype=np.int64)
+    np.cumsum(counts, out=new_offsets[1:])
+
+    # Position of each entry of the new rows in the old arrays
+    index = np.repeat(starts - new_offsets[:-1], counts) + np.arange(new_offsets[-1])
+    return new_offsets, target_ids[np.asarray(targets)[index]], np.asarray(units)[index]
+
+def csr_slice(csr: tuple, start: int, end: int, first_target: int) -> tuple[array, array, array]:
+    """Rows start to end of gathered CSR arrays, packed as arrays with local ids (offsets from 0, targets from first_target)."""
+    offsets, targets, units = csr
+    first, last = offsets[start], offsets[end]
+    return (array('q', (offsets[start:end + 1] - first).tobytes()), array('i', (targets[first:last] - first_target).astype('i').tobytes()),
+            array('q', units[first:last].astype('q').tobytes()))
+
+def chunk_components(rag: ResourceAllocationGraph, chunk_size: int) -> tuple[int, list[tuple]]:
+    """
+    Groups the components into chunks of about chunk_size nodes and edges, so thousands of tiny components are
+    sent to the workers in a few messages. The processes and resources are sorted by component and their CSR
+    rows are gathered in that order with numpy, so each chunk is a contiguous slice of the sorted arrays that
+    is sent as flat buffers with local ids; only the node names go through Python objects.
+    Resources without any edge are left out, since they can't change the verdict.
+
+    :param rag: ResourceAllocationGraph instance.
+    :param chunk_size: Minimum number of nodes and edges of a chunk.
+    :return: (number of components, packed chunks), each chunk being (process names, resource names, capacities,
+             request CSR, allocation CSR, holder CSR) ready for ResourceAllocationGraph.from_csr. There are no chunks
+             when the whole graph fits in one, since it is then reduced as it is.
+    """
+    import numpy as np
+
+    process_count, resource_count = len(rag.processes), len(rag.resources)
+    labels = component_labels(rag)
+    process_labels, resource_labels = labels[:process_count], labels[process_count:]
+
+    # The label of a component with a process is a process id, the other resources have no edge
+    process_order = np.argsort(process_labels, kind='stable')
+    resource_order = np.argsort(resource_labels, kind='stable')
+    resource_order = resource_order[resource_labels[resource_order] < process_count]
+
+    # Each component goes to the chunk where its first node falls, so components are never split
+    sizes = 1 + np.diff(np.asarray(rag.request_offsets)) + np.diff(np.asarray(rag.allocation_offsets))
+    component_sizes = np.bincount(process_labels, weights=sizes, minlength=process_count)
+    component_sizes += np.bincount(resource_labels[resource_order], minlength=process_count)
+    component_chunks = (np.cumsum(component_sizes) - component_sizes) // chunk_size
+
+    process_chunks = component_chunks[process_labels[process_order]]
+    resource_chunks = component_chunks[resource_labels[resource_order]]
+    chunk_ids = np.unique(process_chunks)
+    component_count = int(np.count_nonzero(process_labels == np.arange(process_count)))
+    if len(chunk_ids) < 2:
+        return component_count, []
+
+    process_ids = np.empty(process_count, dtype=np.int64)
+    process_ids[process_order] = np.arange(process_count)
+    resource_ids = np.full(resource_count, -1, dtype=np.int64)
+    resource_ids[resource_order] = np.arange(len(resource_order))
+
+    request = gather_rows(rag.request_offsets, rag.request_targets, rag.request_units, process_order, resource_ids)
+    allocation = gather_rows(rag.allocation_offsets, rag.allocation_targets, rag.allocation_units, process_order, resource_ids)
+    holder = gather_rows(rag.holder_offsets, rag.holder_targets, rag.holder_units, resource_order, process_ids)
+
+    process_bounds = np.append(np.searchsorted(process_chunks, chunk_ids), process_count).tolist()
+    resource_bounds = np.append(np.searchsorted(resource_chunks, chunk_ids), len(resource_order)).tolist()
+
+    capacity = np.asarray(rag.capacity)[resource_order]
+    chunks = []
+    for index in range(len(chunk_ids)):
+        first_process, last_process = process_bounds[index], process_bounds[index + 1]
+        first_resource, last_resource = resource_bounds[index], resource_bounds[index + 1]
+        chunks.append(([rag.processes[p] for p in process_order[first_process:last_process].tolist()],
+                       [rag.resources[r] for r in resource_order[first_resource:last_resource].tolist()],
+                       array('q', capacity[first_resource:last_resource].astype('q').tobytes()),
+                       csr_slice(request, first_process, last_process, first_resource),
+                       csr_slice(allocation, first_process, last_process, first_resource),
+                       csr_slice(holder, first_resource, last_resource, first_process)))
+
+    return component_count, chunks
+
+def reduce_chunk(payload: tuple, resolve: bool = False, cost_model: str = "fewest_held", process_costs: dict[str, float] = None) -> ReductionResult:
+    """
+    Reduces a packed group of components. Runs inside the workers.
+
+    :param payload: Components packed by chunk_components.
+    :param resolve: If True, victims are removed until the whole group is reduced.
+    :param cost_model: Victim cost model (see VictimQueue).
+    :param process_costs: Cost of removing each process of the group, used by the "cost" model.
+    :return: ReductionResult of the group.
+    """
+    rag = ResourceAllocationGraph.from_csr(*payload)
+    return reduce_allocation_graph(rag, resolve, cost_model=cost_model, process_costs=process_costs)
+
+def merge_results(rag: ResourceAllocationGraph, results: list[ReductionResult]) -> ReductionResult:
+    """
+    Merges the per component results. Deadlocked processes and victims are sorted by process id.
+
+    :param rag: ResourceAllocationGraph instance.
+    :param results: ReductionResult of each chunk of components.
+    :return: ReductionResult of the whole graph.
+    """
+    reduction_order, deadlocked_processes, removed_processes = [], [], []
+
+    for result in results:
+        reduction_order.extend(result.reduction_order)
+        deadlocked_processes.extend(result.deadlocked_processes)
+        removed_processes.extend(result.removed_processes)
+
+    by_id = rag.process_ids.__getitem__
+    return ReductionResult(reduction_order, sorted(deadlocked_processes, key=by_id), sorted(removed_processes, key=by_id))
+
+@timed("parallel_reduction")
+def parallel_reduce_allocation_graph(rag: ResourceAllocationGraph, resolve: bool = False, workers: int = None,
+                                     executor: str | Executor = "auto", chunk_size: int = 50000,
+                                     cost_model: str = "fewest_held", process_costs: dict[str, float] = None) -> ReductionResult:
+    """
+    Reduces the independent components of a graph concurrently and merges their verdicts and victims.
+
+    :param rag: ResourceAllocationGraph to be reduced.
+    :param resolve: If True, victims are removed until the whole graph is reduced.
+    :param workers: Number of workers (defaults to the number of CPUs).
+    :param executor: "process", "thread", "auto" or an existing Executor. "auto" reduces graphs smaller than
+                     PARALLEL_THRESHOLD, or with a single worker, in the calling process and uses a process pool
+                     otherwise. Threads don't run the reduction concurrently, they are meant for tests.
+    :param chunk_size: Approximate number of nodes and edges sent to a worker at once.
+    :param cost_model: Victim cost model (see VictimQueue). Victims are chosen per component, so with resolve
+                       the victims can differ from a serial reduction, which picks them across the whole graph.
+    :param process_costs: Cost of removing each process, used by the "cost" model.
+    :return: ReductionResult of the whole graph.
+    """
+    workers = workers or os.cpu_count() or 1
+    graph_size = len(rag.processes) + len(rag.resources) + len(rag.request_targets) + len(rag.allocation_targets)
+
+    if executor == "auto":
+        if graph_size < PARALLEL_THRESHOLD or workers == 1:
+            return reduce_allocation_graph(rag, resolve, cost_model=cost_model, process_costs=process_costs)
+        executor = "process"
+
+    component_count, chunks = chunk_components(rag, min(chunk_size, max(1, graph_size // workers)))
+    metrics.count("components", component_count)
+    metrics.count("chunks", len(chunks))
+    if not chunks:
+        return reduce_allocation_graph(rag, resolve, cost_model=cost_model, process_costs=process_costs)
+
+    # Each worker only receives the costs of its own processes
+    chunk_costs = [None] * len(chunks)
+    if process_costs:
+        chunk_costs = [{process: process_costs[process] for process in chunk[0] if process in process_costs} for chunk in chunks]
+    arguments = (chunks, [resolve] * len(chunks), [cost_model] * len(chunks), chunk_costs)
+
+    if isinstance(executor, Executor):
+        return merge_results(rag, list(executor.map(reduce_chunk, *arguments)))
+
+    pool_class = ProcessPoolExecutor if executor == "process" else ThreadPoolExecutor
+    with pool_class(max_workers=workers) as pool:
+        return merge_results(rag, list(pool.map(reduce_chunk, *arguments)))
@@ -0,0 +1,93 @@
+BASE_INTERVAL = 1000
+MIN_SPEED = 0.25
+MAX_SPEED = 16
+
+
+class ReductionReplay:
+    def __init__(self, fig, steps: list, apply_step, undo_step, on_finish, speed: float = 1.0):
+        """
+        Plays back a reduction trace computed up front, one step per tick of a matplotlib timer, so the
+        window keeps handling events between steps. The steps can be paused, stepped forward and back,
+        sped up and slowed down, or skipped to the end.
+
+        :param fig: Matplotlib figure that owns the timer.
+        :param steps: Steps of the trace.
+        :param apply_step: Function called with a step to show it.
+        :param undo_step: Function called with a step to revert it.
+        :param on_finish: Function called once, after the last step.
+        :param speed: Steps per second.
+        """
+        self.steps = steps
+        self.apply_step = apply_step
+        self.undo_step = undo_step
+        self.on_finish = on_finish
+        self.speed = speed
+        self.position = 0
+        self.paused = False
+        self.finished = False
+
+        self.timer = fig.canvas.new_timer(interval=self.interval)
+        self.timer.add_callback(self.tick)
+
+    @property
+    def interval(self) -> int:
+        """Milliseconds between two steps."""
+        return int(BASE_INTERVAL / self.speed)
+
+    def start(self) -> None:
+        """Starts the playback."""
+        if not self.steps:
+            self.finish()
+            return
+        self.timer.start()
+
+    def tick(self) -> None:
+        """Timer callback, shows the next step."""
+        if not self.paused:
+            self.step_forward()
+
+    def toggle_pause(self) -> None:
+        """Pauses or resumes the playback."""
+        self.paused = not self.paused
+
+    def step_forward(self) -> None:
+        """Shows the next step, finishing the playback after the last one."""
+        if self.finished:
+            return
+        if self.position < len(self.steps):
+            self.position += 1
+            self.apply_step(self.steps[self.position - 1])
+        if self.position == len(self.steps):
+            self.finish()
+
+    def step_back(self) -> None:
+        """Reverts the last step shown."""
+        if self.finished or self.position == 0:
+            return
+        self.position -= 1
+        self.undo_step(self.steps[self.position])
+
+    def change_speed(self, factor: float) -> None:
+        """
+        Multiplies the playback speed.
+
+        :param factor: Multiplier, limited to MIN_SPEED and MAX_SPEED steps per second.
+        """
+        self.speed = min(MAX_SPEED, max(MIN_SPEED, self.speed * factor))
+        self.timer.interval = self.interval
+
+    def skip_to_end(self) -> None:
+        """Shows every remaining step at once and finishes the playback."""
+        if self.finished:
+            return
+        while self.position < len(self.steps):
+            self.position += 1
+            self.apply_step(self.steps[self.position - 1])
+        self.finish()
+
+    def finish(self) -> None:
+        """Stops the timer and calls on_finish once."""
+        self.timer.stop()
+        if not self.finished:
+            self.finished = True
+            self.on_finish()
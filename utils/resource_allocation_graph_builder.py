@@ -1,53 +1,278 @@
+import logging
+from array import array
+
+from utils.instrumentation import timed
+
+logger = logging.getLogger(__name__)
+
+
+def build_csr(source_count: int, sources: array, targets: array, target_count: int, units: array = None) -> tuple[array, array, array]:
+    """
+    Builds a Compressed Sparse Row (CSR) structure with a counting sort, in O(V + E).
+    The targets of each row are sorted and repeated (source, target) pairs are merged, adding their units,
+    so the size of the structure depends on the number of distinct pairs, not on the number of units.
+
+    :param source_count: Number of rows (source nodes).
+    :param sources: Source id of each edge.
+    :param targets: Target id of each edge.
+    :param target_count: Number of distinct target ids.
+    :param units: Number of units of each edge (1 for every edge when None).
+    :return: (offsets, targets, units) where the row of a source s is targets[offsets[s]:offsets[s + 1]]
+             and units holds the number of units of each entry.
+    """
+    edge_count = len(sources)
+
+    # First pass sorts the edges by target, the second (stable) pass groups them by source
+    by_target = counting_sort(targets, target_count, range(edge_count))
+    by_source = counting_sort(sources, source_count, by_target)
+
+    if units is None:
+        units = array('q', [1]) * edge_count
+
+    offsets = array('q', [0]) * (source_count + 1)
+    row_targets, row_units = array('i'), array('q')
+    previous_source = previous_target = -1
+    for edge in by_source:
+        source, target = sources[edge], targets[edge]
+        if source == previous_source and target == previous_target:
+            row_units[-1] += units[edge]
+            continue
+
+        previous_source, previous_target = source, target
+        offsets[source + 1] += 1
+        row_targets.append(target)
+        row_units.append(units[edge])
+
+    for index in range(source_count):
+        offsets[index + 1] += offsets[index]
+
+    return offsets, row_targets, row_units
+
+def counting_sort(keys: array, key_count: int, order) -> list[int]:
+    """
+    Stable counting sort of edge indexes by key.
+
+    :param keys: Key of each edge.
+    :param key_count: Number of distinct keys.
+    :param order: Edge indexes in the current order.
+    :return: Edge indexes sorted by key.
+    """
+    start = [0] * (key_count + 1)
+    for key in keys:
+        start[key + 1] += 1
+    for index in range(key_count):
+        start[index + 1] += start[index]
+
+    result = [0] * len(keys)
+    for edge in order:
+        key = keys[edge]
+        result[start[key]] = edge
+        start[key] += 1
+
+    return result
+
+def parse_resource_capacity(resource: str, default: int = 1) -> int:
+    """
+    Extracts the capacity from a resource name such as "R1 (2)".
+
+    :param resource: Resource name.
+    :param default: Capacity returned when the name has none.
+    :return: Capacity of the resource.
+    """
+    key = resource.split('(')
+    if len(key) < 2:
+        return default
+
+    return int(key[1].replace(')', ''))
+
+def zip_row(targets, units, start: int, end: int):
+    """
+    Pairs the targets of a CSR row with their units.
+
+    :param targets: CSR targets array.
+    :param units: CSR units array.
+    :param start: First index of the row.
+    :param end: Index after the last entry of the row.
+    :return: Generator of (target id, units).
+    """
+    for index in range(start, end):
+        yield targets[index], units[index]
+
+def merge_runs(offsets, targets, row_count: int) -> tuple[array, array, array]:
+    """
+    Converts a CSR with one entry per unit (repeated targets adjacent) into one entry per distinct pair.
+    Used to read snapshots written before edges carried a number of units.
+
+    :param offsets: CSR offsets array.
+    :param targets: CSR targets array, one entry per unit.
+    :param row_count: Number of rows.
+    :return: (offsets, targets, units).
+    """
+    merged_offsets = array('q', [0])
+    merged_targets, merged_units = array('i'), array('q')
+
+    for row in range(row_count):
+        for index in range(offsets[row], offsets[row + 1]):
+            if index > offsets[row] and targets[index] == targets[index - 1]:
+                merged_units[-1] += 1
+            else:
+                merged_targets.append(targets[index])
+                merged_units.append(1)
+        merged_offsets.append(len(merged_targets))
+
+    return merged_offsets, merged_targets, merged_units
+
+
 class ResourceAllocationGraph:
     def __init__(self, processes, resources, availability, edges):
         """
         Inicializa a classe com os nós de processos, nós de recursos, disponibilidade dos recursos e arestas.
-        
+        Os nós são convertidos para ids inteiros e as arestas são armazenadas em formato CSR.
+
         :param processes: Lista de nós de processos (ex: ["P1", "P2", "P3"])
         :param resources: Lista de nós de recursos (ex: ["R1", "R2", "R3"])
         :param availability: Dicionário de disponibilidade de recursos (ex: {"R1": 2, "R2": 3, "R3": 2})
-        :param edges: Lista de arestas que conectam processos e recursos
-                      ex: [("P1", "R2"), ("R1", "P2"), ...]
+        :param edges: Lista de arestas que conectam processos e recursos, com o número de unidades opcional
+                      ex: [("P1", "R2"), ("R1", "P2", 3), ...]
         """
-        self.processes = processes
-        self.resources = resources
+        self.processes = list(processes)
+        self.resources = list(resources)
         self.availability = availability
         self.edges = edges
-        self.adjacency_list = {}
+
+        # Names are only used at the API boundary, the graph itself works with dense integer ids
+        self.process_ids = {process: index for index, process in enumerate(self.processes)}
+        self.resource_ids = {resource: index for index, resource in enumerate(self.resources)}
+        self.capacity = array('q', [availability[resource] for resource in self.resources])
 
         self.initialize_adjacency_list()
 
-    def initialize_adjacency_list(self):
-        """Initializes the adjacency list."""
-        for process in self.processes:
-            self.adjacency_list[process] = []
+    @classmethod
+    def from_lists(cls, allocation: dict[str, list[str]], request: dict[str, list[str]], resource_capacity: dict[str, int]):
+        """
+        Creates the graph from allocation and request lists.
+
+        :param allocation: Dictionary of processes with the allocated resources {process: [allocated_resource]}.
+        :param request: Dictionary of processes with the waiting requested resources {process: [requested_resource]}.
+        :param resource_capacity: Dictionary with the total capacity of each resource {resource: total_capacity}.
+        :return: ResourceAllocationGraph instance.
+        """
+        edges = [(process, resource) for process, resources in request.items() if process in allocation for resource in resources]
+        edges += [(resource, process) for process, resources in allocation.items() for resource in resources]
+
+        return cls(list(allocation.keys()), list(resource_capacity.keys()), resource_capacity, edges)
+
+    @classmethod
+    def from_csr(cls, processes: list[str], resources: list[str], capacity, request_csr: tuple, allocation_csr: tuple, holder_csr: tuple):
+        """
+        Creates the graph directly from CSR buffers (e.g. memory-mapped arrays), without building any edge.
 
-        for resource in self.resources:
-            self.adjacency_list[resource] = []
+        :param processes: List of process names.
+        :param resources: List of resource names.
+        :param capacity: Integer buffer with the capacity of each resource.
+        :param request_csr: (offsets, targets, units) of the requests of each process.
+        :param allocation_csr: (offsets, targets, units) of the allocations of each process.
+        :param holder_csr: (offsets, targets, units) of the holders of each resource.
+        :return: ResourceAllocationGraph instance.
+        """
+        rag = cls.__new__(cls)
+        rag.processes = processes
+        rag.resources = resources
+        rag.availability = dict(zip(resources, capacity))
+        rag.edges = None
+
+        rag.process_ids = {process: index for index, process in enumerate(processes)}
+        rag.resource_ids = {resource: index for index, resource in enumerate(resources)}
+        rag.capacity = capacity
+
+        rag.request_offsets, rag.request_targets, rag.request_units = request_csr
+        rag.allocation_offsets, rag.allocation_targets, rag.allocation_units = allocation_csr
+        rag.holder_offsets, rag.holder_targets, rag.holder_units = holder_csr
+
+        return rag
+
+    @timed("construction")
+    def initialize_adjacency_list(self):
+        """
+        Initializes the CSR adjacency of requests (process -> resource) and allocations (resource -> process).
+        Each entry is a distinct pair with its number of units.
+        """
+        request_sources, request_targets, request_units = array('i'), array('i'), array('q')
+        allocation_sources, allocation_targets, allocation_units = array('i'), array('i'), array('q')
 
+        process_ids, resource_ids = self.process_ids, self.resource_ids
         for edge in self.edges:
-            self.adjacency_list[edge[0]].append(edge[1])
+            source = edge[0]
+            if source in process_ids:
+                request_sources.append(process_ids[source])
+                request_targets.append(resource_ids[edge[1]])
+                request_units.append(edge[2] if len(edge) > 2 else 1)
+            else:
+                allocation_sources.append(resource_ids[source])
+                allocation_targets.append(process_ids[edge[1]])
+                allocation_units.append(edge[2] if len(edge) > 2 else 1)
+
+        process_count, resource_count = len(self.processes), len(self.resources)
+
+        self.request_offsets, self.request_targets, self.request_units = build_csr(
+            process_count, request_sources, request_targets, resource_count, request_units)
+        self.holder_offsets, self.holder_targets, self.holder_units = build_csr(
+            resource_count, allocation_sources, allocation_targets, process_count, allocation_units)
+        self.allocation_offsets, self.allocation_targets, self.allocation_units = build_csr(
+            process_count, allocation_targets, allocation_sources, resource_count, allocation_units)
+
+    @property
+    def adjacency_list(self) -> dict[str, list[str]]:
+        """Adjacency list with node names (one entry per unit), built on demand from the CSR arrays."""
+        adjacency_list = {process: [self.resources[r] for r, units in self.request_quantities(p) for _ in range(units)]
+                          for p, process in enumerate(self.processes)}
+        for r, resource in enumerate(self.resources):
+            adjacency_list[resource] = [self.processes[p] for p, units in self.holder_quantities(r) for _ in range(units)]
+
+        return adjacency_list
+
+    def request_view(self, process_id: int) -> memoryview:
+        """Zero-copy view of the distinct resource ids requested by a process (sorted)."""
+        return memoryview(self.request_targets)[self.request_offsets[process_id]:self.request_offsets[process_id + 1]]
+
+    def allocation_view(self, process_id: int) -> memoryview:
+        """Zero-copy view of the distinct resource ids allocated to a process (sorted)."""
+        return memoryview(self.allocation_targets)[self.allocation_offsets[process_id]:self.allocation_offsets[process_id + 1]]
 
-        print("Lista de Adjacência", self.adjacency_list)
+    def holder_view(self, resource_id: int) -> memoryview:
+        """Zero-copy view of the distinct process ids holding a resource (sorted)."""
+        return memoryview(self.holder_targets)[self.holder_offsets[resource_id]:self.holder_offsets[resource_id + 1]]
 
+    def request_quantities(self, process_id: int):
+        """Yields (resource id, requested quantity) for each distinct resource requested by a process."""
+        return zip_row(self.request_targets, self.request_units, self.request_offsets[process_id], self.request_offsets[process_id + 1])
+
+    def allocation_quantities(self, process_id: int):
+        """Yields (resource id, allocated quantity) for each distinct resource allocated to a process."""
+        return zip_row(self.allocation_targets, self.allocation_units, self.allocation_offsets[process_id], self.allocation_offsets[process_id + 1])
+
+    def holder_quantities(self, resource_id: int):
+        """Yields (process id, allocated quantity) for each distinct process holding a resource."""
+        return zip_row(self.holder_targets, self.holder_units, self.holder_offsets[resource_id], self.holder_offsets[resource_id + 1])
+
+    def held_units(self, process_id: int) -> int:
+        """Total number of units allocated to a process."""
+        return sum(self.allocation_units[self.allocation_offsets[process_id]:self.allocation_offsets[process_id + 1]])
+
+    @timed("lists")
     def create_request_list(self):
         """Creates the resource request dictionary for each process."""
-        request_list = {process: [] for process in self.processes}
+        request_list = {process: [self.resources[r] for r, units in self.request_quantities(p) for _ in range(units)]
+                        for p, process in enumerate(self.processes)}
 
-        for process in self.processes:
-            for edge in self.adjacency_list[process]:
-                request_list[process].append(edge)
-
-        print("Lista de Requisições", request_list)
+        logger.debug("Lista de Requisições %s", request_list)
         return request_list
-    
+
+    @timed("lists")
     def create_allocation_list(self):
         """Creates the resource allocation dictionary for each process."""
-        allocation_list = {process: [] for process in self.processes}
-
-        for resource in self.resources:
-            for process in self.adjacency_list[resource]:
-                allocation_list[process].append(resource)
+        allocation_list = {process: [self.resources[r] for r, units in self.allocation_quantities(p) for _ in range(units)]
+                           for p, process in enumerate(self.processes)}
 
-        print("Lista de Alocações", allocation_list)
-        return allocation_list
\ No newline at end of file
+        logger.debug("Lista de Alocações %s", allocation_list)
+        return allocation_list
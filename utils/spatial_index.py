@@ -0,0 +1,91 @@
+import math
+
+
+class SpatialGrid:
+    def __init__(self, cell_size: float = 1.0):
+        """
+        Uniform grid over the node positions. Each cell keeps the nodes inside it, so finding the nodes
+        near a point or inside a rectangle only looks at the cells it covers instead of every node.
+
+        :param cell_size: Side of each cell, in data coordinates.
+        """
+        self.cell_size = cell_size
+        self.cells = {}
+        self.positions = {}
+
+    def cell(self, x: float, y: float) -> tuple[int, int]:
+        """Cell of a point."""
+        return math.floor(x / self.cell_size), math.floor(y / self.cell_size)
+
+    def insert(self, node: str, position: tuple) -> None:
+        """
+        Adds a node.
+
+        :param node: Node name.
+        :param position: (x, y) position.
+        """
+        self.positions[node] = position
+        self.cells.setdefault(self.cell(*position), set()).add(node)
+
+    def remove(self, node: str) -> None:
+        """
+        Removes a node.
+
+        :param node: Node name.
+        """
+        cell = self.cell(*self.positions.pop(node))
+        self.cells[cell].discard(node)
+        if not self.cells[cell]:
+            del self.cells[cell]
+
+    def move(self, node: str, position: tuple) -> None:
+        """
+        Moves a node to a new position.
+
+        :param node: Node name.
+        :param position: New (x, y) position.
+        """
+        self.remove(node)
+        self.insert(node, position)
+
+    def clear(self) -> None:
+        """Removes every node."""
+        self.cells.clear()
+        self.positions.clear()
+
+    def nearest(self, x: float, y: float, radius: float) -> str:
+        """
+        Finds the node closest to a point.
+
+        :param x: X coordinate.
+        :param y: Y coordinate.
+        :param radius: Maximum distance.
+        :return: The closest node within the radius, or None.
+        """
+        closest, min_distance = None, radius
+        for node in self.query(x - radius, y - radius, x + radius, y + radius):
+            node_x, node_y = self.positions[node]
+            distance = ((node_x - x) ** 2 + (node_y - y) ** 2) ** 0.5
+            if distance < min_distance:
+                closest, min_distance = node, distance
+
+        return closest
+
+    def query(self, x_min: float, y_min: float, x_max: float, y_max: float) -> list[str]:
+        """
+        Finds the nodes inside a rectangle.
+
+        :return: List of node names.
+        """
+        (column_min, row_min), (column_max, row_max) = self.cell(x_min, y_min), self.cell(x_max, y_max)
+
+        # A rectangle that covers more cells than there are occupied cells is answered by a scan
+        if (column_max - column_min + 1) * (row_max - row_min + 1) > len(self.cells):
+            cells = (nodes for (column, row), nodes in self.cells.items()
+                     if column_min <= column <= column_max and row_min <= row <= row_max)
+        else:
+            cells = (self.cells[(column, row)] for column in range(column_min, column_max + 1)
+                     for row in range(row_min, row_max + 1) if (column, row) in self.cells)
+
+        return [node for nodes in cells for node in nodes
+                if x_min <= self.positions[node][0] <= x_max and y_min <= self.positions[node][1] <= y_max]
@@ -0,0 +1,255 @@
+import time
+from collections import Counter
+
+from utils.deadlock_resolver import ReductionResult, reduce_allocation_graph
+from utils.online_detector import reduce_region
+from utils.resource_allocation_graph_builder import ResourceAllocationGraph
+
+
+class VictimSolution:
+    def __init__(self, victims: list[str], cost: float, lower_bound: float, greedy_cost: float, optimal: bool, nodes: int, elapsed: float):
+        """
+        Best victim set found by the solver.
+
+        :param victims: Processes to remove, sorted by process id.
+        :param cost: Total cost of the victims.
+        :param lower_bound: Proven lower bound of the minimum cost.
+        :param greedy_cost: Cost of the greedy victims (the initial upper bound).
+        :param optimal: True if the search finished, so the victims have the minimum cost.
+        :param nodes: Number of search nodes expanded.
+        :param elapsed: Search time in seconds.
+        """
+        self.victims = victims
+        self.cost = cost
+        self.lower_bound = lower_bound
+        self.greedy_cost = greedy_cost
+        self.optimal = optimal
+        self.nodes = nodes
+        self.elapsed = elapsed
+
+    @property
+    def gap(self) -> float:
+        """Relative distance between the cost of the victims and the lower bound (0 when optimal)."""
+        return (self.cost - self.lower_bound) / self.cost if self.cost else 0.0
+
+    def to_dict(self) -> dict:
+        return {"victims": self.victims, "cost": self.cost, "lower_bound": self.lower_bound, "gap": self.gap,
+                "greedy_cost": self.greedy_cost, "optimal": self.optimal, "nodes": self.nodes, "seconds": round(self.elapsed, 6)}
+
+    def __repr__(self):
+        return (f"VictimSolution(victims={self.victims}, cost={self.cost}, lower_bound={self.lower_bound}, "
+                f"gap={self.gap:.3f}, optimal={self.optimal})")
+
+
+def split_components(processes, allocation: dict[str, Counter], request: dict[str, Counter]) -> list[set[str]]:
+    """
+    Groups processes that share a requested or allocated resource (weakly connected components).
+
+    :param processes: Process names.
+    :param allocation: Dictionary of processes with the allocated quantity of each resource.
+    :param request: Dictionary of processes with the requested quantity of each resource.
+    :return: List of sets of process names.
+    """
+    parent = {process: process for process in processes}
+    owner = {}
+
+    def find(process):
+        while parent[process] != process:
+            parent[process] = parent[parent[process]]
+            process = parent[process]
+        return process
+
+    for process in processes:
+        for resource in list(allocation[process]) + list(request[process]):
+            if resource in owner:
+                parent[find(process)] = find(owner[resource])
+            else:
+                owner[resource] = process
+
+    components = {}
+    for process in processes:
+        components.setdefault(find(process), set()).add(process)
+
+    return list(components.values())
+
+
+class ComponentSearch:
+    def __init__(self, processes: set[str], allocation: dict[str, Counter], request: dict[str, Counter],
+                 available: dict[str, int], costs: dict[str, float]):
+        """
+        Branch and bound over the victim sets of an independent group of deadlocked processes.
+        Each node keeps the victims and the processes that were kept alive. The lower bound of a node is the
+        cost of its victims plus the cheapest candidate of each group of processes still blocked, since
+        groups that share no resource need at least one victim each.
+
+        :param processes: Deadlocked processes of the group.
+        :param allocation: Dictionary of processes with the allocated quantity of each resource.
+        :param request: Dictionary of processes with the requested quantity of each resource.
+        :param available: Units of each resource the group can count on.
+        :param costs: Cost of removing each process.
+        """
+        self.processes = processes
+        self.allocation = allocation
+        self.request = request
+        self.available = available
+        self.costs = costs
+
+        self.best = None
+        self.best_cost = float('inf')
+        self.lower_bound = 0.0
+        self.optimal = False
+        self.nodes = 0
+
+    def blocked(self, victims: set[str]) -> set[str]:
+        """Processes that are still blocked after removing the victims."""
+        available = dict(self.available)
+        for victim in victims:
+            for resource, quantity in self.allocation[victim].items():
+                available[resource] += quantity
+
+        region = self.processes - victims
+        return region - reduce_region(region, self.allocation, self.request, available)
+
+    def bound(self, victims: set[str], kept: set[str], blocked: set[str]) -> tuple[float, list[str]]:
+        """
+        Computes the lower bound of a node and the candidates of its most constrained group.
+
+        :return: (lower bound, candidates to branch on sorted by cost), the bound is infinite if a group has no candidate.
+        """
+        lower_bound = sum(self.costs[victim] for victim in victims)
+        branch = None
+
+        for component in split_components(blocked, self.allocation, self.request):
+            candidates = component - kept
+            if not candidates:
+                return float('inf'), []
+
+            lower_bound += min(self.costs[candidate] for candidate in candidates)
+            if branch is None or len(candidates) < len(branch):
+                branch = candidates
+
+        return lower_bound, sorted(branch, key=lambda p: (self.costs[p], -sum(self.allocation[p].values()), p))
+
+    def minimize(self, victims: set[str], deadline: float) -> set[str]:
+        """Drops victims that are not needed, the most expensive first, until the deadline passes."""
+        victims = set(victims)
+        for victim in sorted(victims, key=lambda p: self.costs[p], reverse=True):
+            if time.perf_counter() > deadline:
+                break
+            if not self.blocked(victims - {victim}):
+                victims.discard(victim)
+        return victims
+
+    def search(self, greedy: set[str], deadline: float) -> None:
+        """
+        Runs the depth-first branch and bound until it finishes or the deadline passes.
+
+        :param greedy: Feasible victim set used as the initial upper bound.
+        :param deadline: time.perf_counter() value when the search must stop.
+        """
+        self.best = set(greedy)
+        self.best_cost = sum(self.costs[victim] for victim in self.best)
+
+        root_bound, _ = self.bound(set(), set(), self.processes)
+        self.lower_bound = min(root_bound, self.best_cost)
+
+        self.best = self.minimize(self.best, deadline)
+        self.best_cost = sum(self.costs[victim] for victim in self.best)
+
+        # Each node carries the lower bound of its parent, which holds for its whole subtree
+        stack = [(frozenset(), frozenset(), root_bound)]
+        while stack:
+            if time.perf_counter() > deadline:
+                self.lower_bound = min([self.best_cost] + [node[2] for node in stack])
+                return
+
+            victims, kept, _ = stack.pop()
+            self.nodes += 1
+
+            blocked = self.blocked(victims)
+            if not blocked:
+                cost = sum(self.costs[victim] for victim in victims)
+                if cost < self.best_cost:
+                    self.best, self.best_cost = set(victims), cost
+                continue
+
+            lower_bound, candidates = self.bound(victims, kept, blocked)
+            if lower_bound >= self.best_cost:
+                continue
+
+            # Either the candidate is removed or it is kept for the rest of the subtree (explored second)
+            candidate = candidates[0]
+            stack.append((victims, kept | {candidate}, lower_bound))
+            stack.append((victims | {candidate}, kept, lower_bound))
+
+        self.lower_bound = self.best_cost
+        self.optimal = True
+
+
+def solve_minimum_victims(rag: ResourceAllocationGraph, process_costs: dict[str, float] = None, time_budget: float = 1.0) -> VictimSolution:
+    """
+    Finds a minimum-cost set of processes whose removal makes the graph fully reducible.
+    Only deadlocked processes can be victims, and deadlocked processes that share no resource are solved
+    independently. The greedy victims are the initial upper bound of a branch and bound that stops when the
+    time budget runs out, returning the best set found and the lower bound proven so far.
+
+    :param rag: ResourceAllocationGraph instance.
+    :param process_costs: Cost of removing each process (1 for processes without a cost).
+    :param time_budget: Wall-clock budget of the search in seconds, shared by the groups.
+    :return: VictimSolution instance.
+    """
+    start = time.perf_counter()
+    costs = {process: 1 for process in rag.processes}
+    costs.update(process_costs or {})
+
+    deadlocked = reduce_allocation_graph(rag).deadlocked_processes
+
+    # The cheapest of the greedy heuristics is the initial upper bound
+    greedy = min((set(reduce_allocation_graph(rag, True, cost_model=cost_model, process_costs=costs).removed_processes)
+                  for cost_model in ("cost", "most_unblocked", "most_freed")), key=lambda victims: sum(costs[victim] for victim in victims))
+
+    allocation, request = {}, {}
+    available = dict(zip(rag.resources, rag.capacity))
+    for process in deadlocked:
+        process_id = rag.process_ids[process]
+        allocation[process] = Counter({rag.resources[r]: quantity for r, quantity in rag.allocation_quantities(process_id)})
+        request[process] = Counter({rag.resources[r]: quantity for r, quantity in rag.request_quantities(process_id)})
+
+        # Units of the reducible processes are released in the end, only deadlocked holders keep them
+        for resource, quantity in allocation[process].items():
+            available[resource] -= quantity
+
+    # Small groups first, each one gets an even share of the time left
+    components = sorted(split_components(deadlocked, allocation, request), key=len)
+    victims, cost, lower_bound, greedy_cost, nodes, optimal = [], 0, 0, 0, 0, True
+
+    for index, component in enumerate(components):
+        deadline = time.perf_counter() + max(0.0, start + time_budget - time.perf_counter()) / (len(components) - index)
+        resources = {resource for process in component for resource in list(allocation[process]) + list(request[process])}
+        search = ComponentSearch(component, allocation, request, {resource: available[resource] for resource in resources}, costs)
+        search.search(greedy & component, deadline)
+
+        victims.extend(search.best)
+        cost += search.best_cost
+        lower_bound += search.lower_bound
+        greedy_cost += sum(costs[victim] for victim in greedy & component)
+        nodes += search.nodes
+        optimal = optimal and search.optimal
+
+    victims.sort(key=rag.process_ids.__getitem__)
+    return VictimSolution(victims, cost, lower_bound, greedy_cost, optimal, nodes, time.perf_counter() - start)
+
+def resolve_deadlock_minimum_cost(rag: ResourceAllocationGraph, process_costs: dict[str, float] = None, time_budget: float = 1.0) -> ReductionResult:
+    """
+    Resolves the deadlocks of a graph with the victims of solve_minimum_victims instead of the greedy ones.
+
+    :param rag: ResourceAllocationGraph instance.
+    :param process_costs: Cost of removing each process (1 for processes without a cost).
+    :param time_budget: Wall-clock budget of the search in seconds.
+    :return: ReductionResult where the victims are reduced first.
+    """
+    deadlocked = reduce_allocation_graph(rag).deadlocked_processes
+    solution = solve_minimum_victims(rag, process_costs, time_budget)
+
+    result = reduce_allocation_graph(rag, reduced_processes=[rag.process_ids[victim] for victim in solution.victims])
+    return ReductionResult(solution.victims + result.reduction_order, deadlocked, solution.victims)
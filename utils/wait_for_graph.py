@@ -0,0 +1,138 @@
+from array import array
+
+from utils.resource_allocation_graph_builder import ResourceAllocationGraph
+
+
+def build_wait_for_graph(rag: ResourceAllocationGraph) -> tuple[array, array]:
+    """
+    Collapses the RAG into a process wait-for graph: P -> Q if P requests a resource held by Q.
+    With single-unit resources each resource has at most one holder, so the graph has at most one edge per request.
+
+    :param rag: ResourceAllocationGraph instance.
+    :return: (offsets, targets) CSR of the wait-for graph over the process ids.
+    """
+    offsets = array('q', [0])
+    targets = array('i')
+
+    for process in range(len(rag.processes)):
+        for resource in rag.request_view(process):
+            targets.extend(rag.holder_view(resource))
+        offsets.append(len(targets))
+
+    return offsets, targets
+
+def build_bipartite_graph(rag: ResourceAllocationGraph) -> tuple[array, array]:
+    """
+    Joins the request and holder CSR arrays into a single graph. Process ids are kept and
+    resource ids are shifted by the number of processes.
+
+    :param rag: ResourceAllocationGraph instance.
+    :return: (offsets, targets) CSR over the P + R nodes of the RAG.
+    """
+    process_count = len(rag.processes)
+    request_count = len(rag.request_targets)
+
+    offsets = array('q', rag.request_offsets)
+    offsets.extend(offset + request_count for offset in rag.holder_offsets[1:])
+
+    targets = array('i', (resource + process_count for resource in rag.request_targets))
+    targets.extend(rag.holder_targets)
+
+    return offsets, targets
+
+def strongly_connected_components(node_count: int, offsets: array, targets: array) -> list[list[int]]:
+    """
+    Finds the strongly connected components with an iterative version of Tarjan's algorithm, in O(V + E).
+    Components are returned in reverse topological order: a component comes after every component it reaches.
+
+    :param node_count: Number of nodes.
+    :param offsets: CSR offsets array.
+    :param targets: CSR targets array.
+    :return: List of components (lists of node ids).
+    """
+    index = [-1] * node_count
+    low_link = [0] * node_count
+    on_stack = bytearray(node_count)
+    stack = []
+    components = []
+    counter = 0
+
+    for root in range(node_count):
+        if index[root] != -1:
+            continue
+
+        # Each frame keeps the node and the position of the next edge to be visited
+        call_stack = [(root, offsets[root])]
+        index[root] = low_link[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = 1
+
+        while call_stack:
+            node, edge = call_stack[-1]
+
+            if edge < offsets[node + 1]:
+                call_stack[-1] = (node, edge + 1)
+                target = targets[edge]
+
+                if index[target] == -1:
+                    index[target] = low_link[target] = counter
+                    counter += 1
+                    stack.append(target)
+                    on_stack[target] = 1
+                    call_stack.append((target, offsets[target]))
+                elif on_stack[target] and index[target] < low_link[node]:
+                    low_link[node] = index[target]
+                continue
+
+            call_stack.pop()
+            if call_stack:
+                parent = call_stack[-1][0]
+                if low_link[node] < low_link[parent]:
+                    low_link[parent] = low_link[node]
+
+            if low_link[node] == index[node]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack[member] = 0
+                    component.append(member)
+                    if member == node:
+                        break
+                components.append(component)
+
+    return components
+
+def find_blocked_nodes(node_count: int, offsets: array, targets: array, stuck: bytearray) -> tuple[bytearray, list[int]]:
+    """
+    Marks the nodes that are on a cycle, or that reach a cycle or a stuck node.
+    Every other node can be reduced, in the returned order.
+
+    :param node_count: Number of nodes.
+    :param offsets: CSR offsets array.
+    :param targets: CSR targets array.
+    :param stuck: Nodes that can never be reduced by themselves (e.g. requests above the capacity).
+    :return: (blocked, order) where blocked marks the blocked nodes and order lists the other nodes, sinks first.
+    """
+    blocked = bytearray(node_count)
+    order = []
+
+    for component in strongly_connected_components(node_count, offsets, targets):
+        is_blocked = len(component) > 1
+        for node in component:
+            if is_blocked:
+                break
+            for edge in range(offsets[node], offsets[node + 1]):
+                target = targets[edge]
+                if blocked[target] or target == node:
+                    is_blocked = True
+                    break
+            is_blocked = is_blocked or stuck[node]
+
+        if is_blocked:
+            for node in component:
+                blocked[node] = 1
+        else:
+            order.extend(component)
+
+    return blocked, order
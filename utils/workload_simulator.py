@@ -0,0 +1,311 @@
+import argparse
+import heapq
+import json
+import random
+import time
+
+from utils.detection_service import percentile
+from utils.online_detector import OnlineDeadlockDetector
+
+SCHEDULES = ("periodic", "events", "on_block")
+
+ARRIVAL, STEP, DETECTION = 0, 1, 2
+
+
+def parse_schedule(schedule: str) -> tuple[str, float]:
+    """
+    Parses a detection schedule: "periodic:SECONDS", "events:N" or "on_block".
+
+    :param schedule: Schedule string.
+    :return: (kind, parameter), the parameter is None for "on_block".
+    """
+    kind, _, parameter = schedule.partition(':')
+    if kind not in SCHEDULES or (kind == "on_block") != (parameter == ""):
+        raise ValueError(f"Unknown schedule {schedule}, use periodic:SECONDS, events:N or on_block")
+
+    if kind == "on_block":
+        return kind, None
+    value = float(parameter)
+    if value <= 0:
+        raise ValueError(f"The parameter of {schedule} must be positive")
+    return kind, value
+
+
+class WorkloadSimulator:
+    def __init__(self, schedule: str, duration: float = 3600.0, arrival_rate: float = 10.0, hold_time: float = 0.05,
+                 resources: int = 32, max_capacity: int = 2, max_steps: int = 4, max_quantity: int = 2,
+                 max_processes: int = 500, exact_delays: bool = True, seed: int = 0):
+        """
+        Discrete-event simulation of processes acquiring and releasing multi-unit resources, with the
+        deadlock detection run on a schedule. Processes arrive as a Poisson process and acquire a few
+        distinct resources one after the other, in random order, holding each one for an exponential time
+        before the next request; after the last one they release everything and exit. A request that
+        doesn't fit the available units blocks, and released units go to the first waiters that fit.
+
+        The schedule runs full reductions of the live graph (OnlineDeadlockDetector.detect), and each
+        deadlock it finds is resolved by removing the deadlocked process with the fewest held units (as the
+        "fewest_held" cost model) until none is left. The detection time includes that resolution.
+        With exact_delays the detector is also incremental, which gives the exact moment each process
+        becomes deadlocked; that reference is not counted as detection work but slows the simulation down
+        on crowded graphs. Without it, the delay is measured from the moment each process blocked, an upper bound.
+
+        :param schedule: "periodic:SECONDS" (simulated time), "events:N" or "on_block" (see parse_schedule).
+        :param duration: Simulated seconds.
+        :param arrival_rate: Processes arriving per simulated second.
+        :param hold_time: Mean simulated seconds a process holds a resource before its next step.
+        :param resources: Number of resources, named like "R1 (2)".
+        :param max_capacity: Maximum capacity of a resource (the capacities are drawn from 1 to max_capacity).
+        :param max_steps: Maximum number of resources acquired by a process.
+        :param max_quantity: Maximum units of each request.
+        :param max_processes: Maximum number of live processes, arrivals above it are rejected (as an admission
+                              limit would), which bounds the graph when deadlocks pile up waiters.
+        :param exact_delays: Tracks the moment each process becomes deadlocked with an incremental detector.
+        :param seed: Random seed.
+        """
+        self.schedule = schedule
+        self.kind, self.parameter = parse_schedule(schedule)
+        self.duration = duration
+        self.arrival_rate = arrival_rate
+        self.hold_time = hold_time
+        self.max_steps = max_steps
+        self.max_quantity = max_quantity
+        self.max_processes = max_processes
+        self.exact_delays = exact_delays
+        self.random = random.Random(seed)
+
+        self.detector = OnlineDeadlockDetector(incremental=exact_delays)
+        self.resources = []
+        for index in range(1, resources + 1):
+            capacity = self.random.randint(1, max_capacity)
+            self.resources.append(f"R{index} ({capacity})")
+            self.detector.add_resource(self.resources[-1], capacity)
+
+        self.queue = []
+        self.sequence = 0
+        self.now = 0.0
+        self.plans = {}
+        self.blocked_since = {}
+        self.deadlocked_since = {}
+        self.waiting = {resource: [] for resource in self.resources}
+        self.arrivals = 0
+
+        self.events = 0
+        self.completed = 0
+        self.rejected = 0
+        self.detections = 0
+        self.detection_seconds = 0.0
+        self.deadlocked = 0
+        self.delays = []
+        self.victims = 0
+        self.elapsed = 0.0
+
+    def schedule_event(self, delay: float, kind: int, process: str = None) -> None:
+        self.sequence += 1
+        heapq.heappush(self.queue, (self.now + delay, self.sequence, kind, process))
+
+    def run(self) -> dict:
+        """
+        Runs the simulation.
+
+        :return: Summary dictionary (see summary).
+        """
+        start = time.perf_counter()
+        self.schedule_event(self.random.expovariate(self.arrival_rate), ARRIVAL)
+        if self.kind == "periodic":
+            self.schedule_event(self.parameter, DETECTION)
+        next_detection = self.parameter if self.kind == "events" else None
+
+        queue = self.queue
+        while queue:
+            moment, _, kind, process = heapq.heappop(queue)
+            if moment > self.duration:
+                break
+            self.now = moment
+
+            if kind == ARRIVAL:
+                self.arrive()
+                self.schedule_event(self.random.expovariate(self.arrival_rate), ARRIVAL)
+            elif kind == STEP:
+                self.step(process)
+            else:
+                self.detect()
+                self.schedule_event(self.parameter, DETECTION)
+
+            if next_detection is not None and self.events >= next_detection:
+                self.detect()
+                next_detection = self.events + self.parameter
+
+        self.elapsed = time.perf_counter() - start
+        return self.summary()
+
+    def arrive(self) -> None:
+        """Adds a process with a random plan of (resource, quantity) requests, unless the limit is reached."""
+        if len(self.plans) >= self.max_processes:
+            self.rejected += 1
+            self.events += 1
+            return
+
+        self.arrivals += 1
+        process = f"P{self.arrivals}"
+        rnd = self.random
+        detector = self.detector
+
+        plan = []
+        for resource in rnd.sample(self.resources, rnd.randint(1, self.max_steps)):
+            plan.append((resource, rnd.randint(1, min(self.max_quantity, detector.capacity[resource]))))
+        plan.reverse()
+
+        self.plans[process] = plan
+        detector.add_process(process)
+        self.events += 1
+        self.step(process)
+
+    def step(self, process: str) -> None:
+        """Requests the next resource of a process, or releases everything when its plan is done."""
+        plan = self.plans.get(process)
+        if plan is None:
+            return
+
+        detector = self.detector
+        if not plan:
+            freed = list(detector.allocations[process])
+            del self.plans[process]
+            detector.remove_process(process)
+            self.events += 1 + len(freed)
+            self.completed += 1
+            for resource in freed:
+                self.wake(resource)
+            return
+
+        resource, quantity = plan.pop()
+        self.events += 1
+        if detector.available[resource] >= quantity:
+            detector.grant(process, resource, quantity)
+            self.schedule_event(self.random.expovariate(1 / self.hold_time), STEP, process)
+            return
+
+        detector.request(process, resource, quantity)
+        self.waiting[resource].append((process, quantity))
+        self.blocked_since[process] = self.now
+        if self.exact_delays:
+            self.track_deadlocks(process)
+
+        if self.kind == "on_block":
+            self.detect()
+
+    def track_deadlocks(self, process: str) -> None:
+        """Records the moment the processes found deadlocked by the incremental detector became deadlocked."""
+        detector = self.detector
+        # Only a blocked request can deadlock processes here, and they stay deadlocked until a victim is removed.
+        # Usually the only new one is the process that blocked, on resources held by deadlocked processes
+        new_deadlocked = len(detector.deadlocked) - len(self.deadlocked_since)
+        if new_deadlocked == 1 and process in detector.deadlocked and process not in self.deadlocked_since:
+            self.deadlocked_since[process] = self.now
+        elif new_deadlocked:
+            for deadlocked in detector.deadlocked - self.deadlocked_since.keys():
+                self.deadlocked_since[deadlocked] = self.now
+
+    def wake(self, resource: str) -> None:
+        """Grants released units to the waiters that fit, in the order they blocked."""
+        waiting = self.waiting[resource]
+        detector = self.detector
+        index = 0
+        while index < len(waiting) and detector.available[resource]:
+            process, quantity = waiting[index]
+            if quantity > detector.available[resource]:
+                index += 1
+                continue
+
+            del waiting[index]
+            del self.blocked_since[process]
+            detector.grant(process, resource, quantity)
+            self.events += 1
+            self.schedule_event(self.random.expovariate(1 / self.hold_time), STEP, process)
+
+    def detect(self) -> None:
+        """Runs a full detection and removes victims until no process is deadlocked."""
+        start = time.perf_counter()
+        self.detections += 1
+        detector = self.detector
+        deadlocked = detector.detect()
+        if not deadlocked:
+            self.detection_seconds += time.perf_counter() - start
+            return
+
+        since = self.deadlocked_since if self.exact_delays else self.blocked_since
+        for process in deadlocked:
+            self.delays.append(self.now - since[process])
+        self.deadlocked += len(deadlocked)
+
+        freed = set()
+        while detector.deadlocked:
+            # A deadlocked process that holds nothing only waits on the others, removing it frees nothing
+            victim = min((process for process in detector.deadlocked if detector.allocations[process]),
+                         key=lambda process: (sum(detector.allocations[process].values()), int(process[1:])))
+            freed.update(detector.allocations[victim])
+            for resource in detector.requests[victim]:
+                self.waiting[resource] = [waiter for waiter in self.waiting[resource] if waiter[0] != victim]
+
+            # The incremental detector re-examines the processes waiting on the freed units by itself
+            detector.remove_process(victim)
+            if not self.exact_delays:
+                detector.reexamine(set(detector.deadlocked))
+            del self.plans[victim], self.blocked_since[victim]
+            self.victims += 1
+            self.events += 1
+
+        self.deadlocked_since.clear()
+        self.detection_seconds += time.perf_counter() - start
+        for resource in freed:
+            self.wake(resource)
+
+    def summary(self) -> dict:
+        """
+        Results of the simulation. "events" counts the changes to the graph and the rejected arrivals, and
+        "events_per_minute" is the simulation throughput without the detection time, which depends on the
+        schedule. "deadlocked" counts the deadlocked processes found by each detection (a process freed by
+        the victims of one deadlock can be found again in a later one), and the delays are the simulated
+        seconds from the moment each of them became deadlocked (or blocked, without exact_delays) to its detection.
+        """
+        simulation_seconds = self.elapsed - self.detection_seconds
+        hours = self.duration / 3600
+        return {
+            "schedule": self.schedule,
+            "simulated_seconds": self.duration,
+            "events": self.events,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "detections": self.detections,
+            "detection_seconds": round(self.detection_seconds, 6),
+            "detection_seconds_per_hour": round(self.detection_seconds / hours, 6),
+            "deadlocked": self.deadlocked,
+            "mean_delay": round(sum(self.delays) / len(self.delays), 6) if self.delays else 0.0,
+            "p99_delay": round(percentile(self.delays, 0.99), 6),
+            "victims": self.victims,
+            "victims_per_hour": round(self.victims / hours, 2),
+            "deadlocked_at_end": len(self.detector.detect()),
+            "seconds": round(self.elapsed, 6),
+            "events_per_minute": round(self.events / simulation_seconds * 60) if simulation_seconds > 0 else 0,
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulates a workload and compares deadlock detection schedules.")
+    parser.add_argument("schedules", nargs="+", help="periodic:SECONDS, events:N or on_block")
+    parser.add_argument("--duration", type=float, default=3600.0, help="Simulated seconds")
+    parser.add_argument("--arrival-rate", type=float, default=10.0, help="Processes per simulated second")
+    parser.add_argument("--hold-time", type=float, default=0.05, help="Mean simulated seconds a resource is held before the next step")
+    parser.add_argument("--resources", type=int, default=32)
+    parser.add_argument("--max-capacity", type=int, default=2)
+    parser.add_argument("--max-steps", type=int, default=4, help="Maximum resources acquired by a process")
+    parser.add_argument("--max-quantity", type=int, default=2, help="Maximum units of each request")
+    parser.add_argument("--max-processes", type=int, default=500, help="Live processes above which arrivals are rejected")
+    parser.add_argument("--estimate-delays", action="store_true", help="Measures the delays from the moment processes blocked, without the incremental reference")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for schedule in args.schedules:
+        simulator = WorkloadSimulator(schedule, args.duration, args.arrival_rate, args.hold_time, args.resources,
+                                      args.max_capacity, args.max_steps, args.max_quantity, args.max_processes,
+                                      not args.estimate_delays, args.seed)
+        print(json.dumps(simulator.run()), flush=True)